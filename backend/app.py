@@ -1,31 +1,160 @@
 # app.py
 # Main Flask application for Music Discovery API
 
-from flask import Flask, jsonify, request
+import hmac
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask, Response, has_request_context, jsonify, request, g
 from flask_cors import CORS
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from config import DB_CONFIG, SERVER_HOST, SERVER_PORT
+from config import (DB_CONFIG, POOL_CONFIG, FEATURE_STORE_CONFIG, RESPONSE_CACHE_CONFIG,
+                    SEARCH_INDEX_CONFIG, MIX_CONFIG, STREAMING_CONFIG, PREPARED_STATEMENTS_CONFIG,
+                    SLOW_QUERY_CONFIG, RADIO_INDEX_CONFIG, BATCH_CONFIG, COMPRESSION_CONFIG,
+                    ADMIN_CONFIG, SERVER_HOST, SERVER_PORT)
+from db_pool import ConnectionPool, PoolError
+from response_cache import ResponseCache, cached_response
+from feature_store import FeatureStore
+from artist_index import ArtistIndexStore
+from range_index import RangeIndexStore
+from track_radio import RadioStore
+from search_index import SearchStore
+from playlist_mix import build_mix, check_mix_counts, parse_mix_spec
+from batch import parse_batch, render_batch, run_batch, server_timing
+from streaming import ListingRequest, stream_response
+from prepared import StatementRegistry
+from metrics import MetricsRegistry, TimedCursor, TimedRealDictCursor
+from serialization import FastJSONProvider, column_names, compress_response, rows_response
+from slow_queries import SlowQueryLog
+import metrics
+import feature_store as features
+import range_index as ranges
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = FastJSONProvider(app)  # orjson when installed; jsonify() time shows up as the 'serialize' phase
 CORS(app)  # Allow frontend to connect
 
+# Shared connection pool - every route checks connections out of here
+db_pool = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+
+# In-memory audio features, loaded at startup; routes use SQL until it is ready
+feature_store = FeatureStore(fetch_size=FEATURE_STORE_CONFIG['fetch_size'])
+
+# Artist centroid KD-tree, rebuilt from the feature store on every load
+artist_index = ArtistIndexStore()
+feature_store.on_load(artist_index.rebuild)
+
+# Sorted per-column permutations of the features, for range filters ordered by a feature
+range_index = RangeIndexStore()
+feature_store.on_load(range_index.rebuild)
+
+# IVF nearest-neighbour index for track radio, loaded from its offline file on every load
+radio_store = RadioStore(db_pool, RADIO_INDEX_CONFIG['path'], RADIO_INDEX_CONFIG['n_lists'])
+feature_store.on_load(radio_store.rebuild)
+
+# Trigram name index for track/artist search; SQL ILIKE until it is built
+search_store = SearchStore()
+
+# Cache for read-only routes; cleared by /api/admin/reload after a data reload
+response_cache = ResponseCache(**RESPONSE_CACHE_CONFIG)
+
+# Route queries run as prepared statements, PREPAREd once per pooled connection
+statements = StatementRegistry(pool=db_pool, **PREPARED_STATEMENTS_CONFIG)
+
+# Threads that run the parts of a playlist mix side by side, one pooled connection each
+mix_executor = ThreadPoolExecutor(max_workers=MIX_CONFIG['workers'], thread_name_prefix='mix')
+
+# Threads that dispatch the sub-requests of an /api/batch call
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_CONFIG['workers'], thread_name_prefix='batch')
+
+# Per-route latency histograms and phase breakdown, served at /metrics
+request_metrics = MetricsRegistry()
+request_metrics.add_collector('db_pool_connections', 'Pooled connections by state.', lambda: {
+    (('state', state),): value for state, value in db_pool.stats().items() if state in ('in_use', 'idle', 'waiters')
+})
+request_metrics.add_collector('response_cache_entries', 'Entries in the response cache.',
+                              lambda: {None: response_cache.stats()['entries']})
+
+# Statements over the threshold, with sampled EXPLAIN plans, browsable under /api/admin/slow-queries
+slow_query_log = SlowQueryLog(db_pool, **SLOW_QUERY_CONFIG)
+
+def log_slow_query(cursor, query, params, seconds):
+    if seconds < slow_query_log.threshold:
+        return
+    try:
+        route = request.url_rule.rule if has_request_context() and request.url_rule is not None else None
+        # Prepared route statements are logged (and explained) as the query they stand for
+        if isinstance(query, str) and query.startswith('EXECUTE '):
+            source = statements.source(query)
+        else:
+            source = None
+        slow_query_log.observe(route, query, params, cursor.rowcount, seconds, explain_query=source)
+    except Exception as e:
+        print(f"Slow query log failed: {e}")
+
+metrics.set_query_observer(log_slow_query)
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    metrics.start_request()
+
+# Registered after the metrics hook, so refused admin calls are still counted
+@app.before_request
+def require_admin_token():
+    """Refuse /api/admin/* unless X-Admin-Token matches ADMIN_CONFIG['token']"""
+    if not request.path.startswith('/api/admin/') or request.method == 'OPTIONS':
+        return None
+    expected = ADMIN_CONFIG['token']
+    if not expected:
+        return jsonify({'error': 'Admin endpoints are disabled; set ADMIN_TOKEN to enable them'}), 403
+    supplied = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(supplied.encode('utf-8'), expected.encode('utf-8')):
+        return jsonify({'error': 'Missing or invalid X-Admin-Token'}), 401
+    return None
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        request_metrics.observe(route, request.method, response.status_code,
+                                time.perf_counter() - started, metrics.finish_request())
+    return response
+
+# Registered after the metrics hook so it runs first, and its time counts toward the request
+@app.after_request
+def compress(response):
+    return compress_response(response, request.headers.get('Accept-Encoding'), **COMPRESSION_CONFIG)
+
 # Database connection function
 def get_db_connection():
-    """Create and return a database connection"""
-    try:
-        conn = psycopg2.connect(
-            host=DB_CONFIG['host'],
-            database=DB_CONFIG['database'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password'],
-            port=DB_CONFIG['port']
-        )
+    """Check a connection out of the pool for the current request"""
+    conn = g.get('db_conn')
+    if conn is not None:
         return conn
-    except Exception as e:
+    try:
+        with metrics.phase('connect'):
+            conn = db_pool.getconn()
+    except PoolError as e:
         print(f"Database connection error: {e}")
         return None
+    g.db_conn = conn
+    return conn
+
+def release_db_connection(conn):
+    """Hand the request's connection back to the pool"""
+    if g.get('db_conn') is conn:
+        g.pop('db_conn')
+    db_pool.putconn(conn)
+
+@app.teardown_appcontext
+def return_db_connection(exc):
+    """Return any connection a route did not release (error paths, early returns)"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        db_pool.putconn(conn, discard=conn.closed)
 
 # Test route to check if server is running
 @app.route('/')
@@ -48,11 +177,11 @@ def test_db():
         }), 500
     
     try:
-        cursor = conn.cursor()
+        cursor = conn.cursor(cursor_factory=TimedCursor)
         cursor.execute('SELECT COUNT(*) FROM tracks')
         count = cursor.fetchone()[0]
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
         return jsonify({
             'status': 'success',
@@ -74,12 +203,17 @@ def playlist_by_artist(artist_name):
     # Get optional limit parameter (default to 20)
     limit = request.args.get('limit', default=20, type=int)
     
+    # Answer from the in-memory feature store when it is loaded
+    data = feature_store.data
+    if data is not None:
+        return jsonify(features.playlist_by_artist(data, artist_name, limit))
+    
     conn = get_db_connection()
     if conn is None:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor(cursor_factory=TimedCursor)
         
         # SQL query from Milestone 3, now with parameters
         query = """
@@ -117,20 +251,22 @@ def playlist_by_artist(artist_name):
         """
         
         # Execute query with parameters
-        cursor.execute(query, (artist_name, artist_name, limit))
+        statements.execute(cursor, 'playlist_artist', query, (artist_name, artist_name, limit))
         results = cursor.fetchall()
+        columns = column_names(cursor)
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
         # Return results as JSON
-        return jsonify(results)
+        return rows_response(columns, results)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Route 2: Generate Playlist by Genre and Tempo Range
 @app.route('/api/playlist/genre')
+@cached_response(response_cache)
 def playlist_by_genre():
     """
     Generate a playlist based on genre and tempo range
@@ -139,21 +275,23 @@ def playlist_by_genre():
     genre = request.args.get('genre', type=str)
     tempo_min = request.args.get('tempo_min', default=120, type=int)
     tempo_max = request.args.get('tempo_max', default=140, type=int)
-    limit = request.args.get('limit', default=25, type=int)
     
     # Validate required parameter
     if not genre:
         return jsonify({'error': 'genre parameter is required'}), 400
     
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        listing = ListingRequest(request.args, default_limit=25, config=STREAMING_CONFIG)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        after_sql, after_params = listing.keyset('t.popularity', 't.spotify_id')
         
-        query = """
+        # spotify_id breaks popularity ties, so the order (and the page tokens) are stable
+        query = f"""
         SELECT 
+            t.spotify_id,
             t.track_name,
             a.artist_name,
             g.genre_name,
@@ -168,69 +306,90 @@ def playlist_by_genre():
         JOIN genres g ON tg.genre_id = g.genre_id
         WHERE g.genre_name = %s
             AND af.tempo BETWEEN %s AND %s
-        ORDER BY t.popularity DESC
+            {after_sql}
+        ORDER BY t.popularity DESC, t.spotify_id DESC
         LIMIT %s;
         """
+        params = (genre, tempo_min, tempo_max, *after_params, listing.sql_limit)
+        
+        if listing.stream:
+            return stream_response(db_pool, query, params, listing.stream, app.json.dumps,
+                                   STREAMING_CONFIG['fetch_size'])
         
-        cursor.execute(query, (genre, tempo_min, tempo_max, limit))
+        conn = get_db_connection()
+        if conn is None:
+            return jsonify({'error': 'Database connection failed'}), 500
+        cursor = conn.cursor(cursor_factory=TimedCursor)
+        statements.execute(cursor, 'playlist_genre', query, params)
         results = cursor.fetchall()
+        columns = column_names(cursor)
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
-        return jsonify(results)
+        return rows_response(columns, results, listing.format, listing.page_size)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Route 3: Chart Hits Playlist for Selected Genre
 @app.route('/api/playlist/chart-hits')
+@cached_response(response_cache)
 def playlist_chart_hits():
     """
     Generate a playlist of Billboard chart hits from a specific genre
     """
     genre = request.args.get('genre', type=str)
     max_rank = request.args.get('max_rank', default=50, type=int)
-    limit = request.args.get('limit', default=30, type=int)
     
     if not genre:
         return jsonify({'error': 'genre parameter is required'}), 400
     
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        listing = ListingRequest(request.args, default_limit=30, config=STREAMING_CONFIG, pageable=False)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
+        # track_chart_summary holds each track's best rank, so no per-request song_join x billboard_charts join
         query = """
         SELECT 
             t.track_name,
             a.artist_name,
             g.genre_name,
-            MIN(bc.chart_rank) AS best_chart_position,
-            MAX(bc.weeks_on_board) AS weeks_on_chart,
+            MIN(cs.best_rank) AS best_chart_position,
+            MAX(cs.max_weeks_on_board) AS weeks_on_chart,
             t.popularity
-        FROM tracks t
+        FROM track_chart_summary cs
+        JOIN tracks t ON cs.spotify_id = t.spotify_id
         JOIN artists a ON t.artist_id = a.artist_id
         JOIN track_genres tg ON t.spotify_id = tg.spotify_id
         JOIN genres g ON tg.genre_id = g.genre_id
-        JOIN song_join sj ON t.spotify_id = sj.spotify_id
-        JOIN billboard_charts bc ON sj.chart_id = bc.chart_id
         WHERE g.genre_name = %s
-            AND bc.chart_rank <= %s
+            AND cs.best_rank <= %s
         GROUP BY t.track_name, a.artist_name, g.genre_name, t.popularity
         ORDER BY best_chart_position ASC
         LIMIT %s;
         """
         
-        cursor.execute(query, (genre, max_rank, limit))
+        params = (genre, max_rank, listing.sql_limit)
+        
+        if listing.stream:
+            return stream_response(db_pool, query, params, listing.stream, app.json.dumps,
+                                   STREAMING_CONFIG['fetch_size'])
+        
+        conn = get_db_connection()
+        if conn is None:
+            return jsonify({'error': 'Database connection failed'}), 500
+        cursor = conn.cursor(cursor_factory=TimedCursor)
+        statements.execute(cursor, 'playlist_chart_hits', query, params)
         results = cursor.fetchall()
+        columns = column_names(cursor)
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
-        return jsonify(results)
+        return rows_response(columns, results, listing.format, listing.page_size)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -238,26 +397,28 @@ def playlist_chart_hits():
 
 # Route 4: Hidden Gems Playlist by Genre
 @app.route('/api/playlist/hidden-gems')
+@cached_response(response_cache)
 def playlist_hidden_gems():
     """
     Discover highly popular Spotify tracks that never appeared on Billboard charts
     """
     genre = request.args.get('genre', type=str)
     min_popularity = request.args.get('min_popularity', default=50, type=int)
-    limit = request.args.get('limit', default=25, type=int)
     
     if not genre:
         return jsonify({'error': 'genre parameter is required'}), 400
     
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        listing = ListingRequest(request.args, default_limit=25, config=STREAMING_CONFIG)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        after_sql, after_params = listing.keyset('t.popularity', 't.spotify_id')
         
-        query = """
+        query = f"""
         SELECT 
+            t.spotify_id,
             t.track_name,
             a.artist_name,
             g.genre_name,
@@ -277,17 +438,28 @@ def playlist_hidden_gems():
                 FROM song_join sj 
                 WHERE sj.spotify_id = t.spotify_id
             )
-        ORDER BY t.popularity DESC
+            {after_sql}
+        ORDER BY t.popularity DESC, t.spotify_id DESC
         LIMIT %s;
         """
+        params = (genre, min_popularity, *after_params, listing.sql_limit)
         
-        cursor.execute(query, (genre, min_popularity, limit))
+        if listing.stream:
+            return stream_response(db_pool, query, params, listing.stream, app.json.dumps,
+                                   STREAMING_CONFIG['fetch_size'])
+        
+        conn = get_db_connection()
+        if conn is None:
+            return jsonify({'error': 'Database connection failed'}), 500
+        cursor = conn.cursor(cursor_factory=TimedCursor)
+        statements.execute(cursor, 'playlist_hidden_gems', query, params)
         results = cursor.fetchall()
+        columns = column_names(cursor)
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
-        return jsonify(results)
+        return rows_response(columns, results, listing.format, listing.page_size)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -295,6 +467,7 @@ def playlist_hidden_gems():
 
 # Route 5: Workout Playlist Generator
 @app.route('/api/playlist/workout')
+@cached_response(response_cache)
 def playlist_workout():
     """
     Build a high-energy workout playlist
@@ -303,15 +476,19 @@ def playlist_workout():
     min_danceability = request.args.get('min_danceability', default=0.65, type=float)
     tempo_min = request.args.get('tempo_min', default=130, type=int)
     tempo_max = request.args.get('tempo_max', default=180, type=int)
-    limit = request.args.get('limit', default=30, type=int)
     
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        listing = ListingRequest(request.args, default_limit=30, config=STREAMING_CONFIG, pageable=False)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Streams come from SQL; the range index serves buffered top-N lists
+    index = range_index.index
+    if index is not None and not listing.stream:
+        return jsonify(listing.body(ranges.playlist_workout(index, min_energy, min_danceability,
+                                                            tempo_min, tempo_max, listing.limit)))
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
         query = """
         SELECT 
             t.track_name,
@@ -330,13 +507,24 @@ def playlist_workout():
         LIMIT %s;
         """
         
-        cursor.execute(query, (min_energy, min_danceability, tempo_min, tempo_max, limit))
+        params = (min_energy, min_danceability, tempo_min, tempo_max, listing.sql_limit)
+        
+        if listing.stream:
+            return stream_response(db_pool, query, params, listing.stream, app.json.dumps,
+                                   STREAMING_CONFIG['fetch_size'])
+        
+        conn = get_db_connection()
+        if conn is None:
+            return jsonify({'error': 'Database connection failed'}), 500
+        cursor = conn.cursor(cursor_factory=TimedCursor)
+        statements.execute(cursor, 'playlist_workout', query, params)
         results = cursor.fetchall()
+        columns = column_names(cursor)
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
-        return jsonify(results)
+        return rows_response(columns, results, listing.format, listing.page_size)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -344,21 +532,25 @@ def playlist_workout():
 
 # Route 6: Mood-Based Playlist - Happy Songs
 @app.route('/api/playlist/mood/happy')
+@cached_response(response_cache)
 def playlist_happy():
     """
     Create an upbeat, positive playlist with high valence scores
     """
     min_valence = request.args.get('min_valence', default=0.7, type=float)
     min_energy = request.args.get('min_energy', default=0.6, type=float)
-    limit = request.args.get('limit', default=25, type=int)
     
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        listing = ListingRequest(request.args, default_limit=25, config=STREAMING_CONFIG, pageable=False)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Streams come from SQL; the range index serves buffered top-N lists
+    index = range_index.index
+    if index is not None and not listing.stream:
+        return jsonify(listing.body(ranges.playlist_happy(index, min_valence, min_energy, listing.limit)))
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
         query = """
         SELECT 
             t.track_name,
@@ -378,13 +570,24 @@ def playlist_happy():
         LIMIT %s;
         """
         
-        cursor.execute(query, (min_valence, min_energy, limit))
+        params = (min_valence, min_energy, listing.sql_limit)
+        
+        if listing.stream:
+            return stream_response(db_pool, query, params, listing.stream, app.json.dumps,
+                                   STREAMING_CONFIG['fetch_size'])
+        
+        conn = get_db_connection()
+        if conn is None:
+            return jsonify({'error': 'Database connection failed'}), 500
+        cursor = conn.cursor(cursor_factory=TimedCursor)
+        statements.execute(cursor, 'playlist_happy', query, params)
         results = cursor.fetchall()
+        columns = column_names(cursor)
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
-        return jsonify(results)
+        return rows_response(columns, results, listing.format, listing.page_size)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -392,6 +595,7 @@ def playlist_happy():
 
 # Route 7: Decade Throwback Playlist
 @app.route('/api/playlist/decade')
+@cached_response(response_cache)
 def playlist_decade():
     """
     Create a nostalgic playlist from a specific decade
@@ -400,57 +604,55 @@ def playlist_decade():
     end_year = request.args.get('end_year', type=int)
     min_energy = request.args.get('min_energy', default=0.5, type=float)
     max_energy = request.args.get('max_energy', default=0.8, type=float)
-    limit = request.args.get('limit', default=30, type=int)
     
     if not start_year or not end_year:
         return jsonify({'error': 'start_year and end_year parameters are required'}), 400
     
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        listing = ListingRequest(request.args, default_limit=30, config=STREAMING_CONFIG, pageable=False)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
+        # One row per track and chart year; the range scan on (chart_year, best_rank) replaces
+        # EXTRACT(YEAR FROM chart_date), which could not use idx_billboard_date
         query = """
-        WITH decade_songs AS (
-            SELECT 
-                t.track_name,
-                a.artist_name,
-                af.tempo,
-                af.energy,
-                af.danceability,
-                bc.chart_date,
-                MIN(bc.chart_rank) AS best_rank
-            FROM tracks t
-            JOIN artists a ON t.artist_id = a.artist_id
-            JOIN audio_features af ON t.spotify_id = af.spotify_id
-            JOIN song_join sj ON t.spotify_id = sj.spotify_id
-            JOIN billboard_charts bc ON sj.chart_id = bc.chart_id
-            WHERE EXTRACT(YEAR FROM bc.chart_date) BETWEEN %s AND %s
-                AND af.energy BETWEEN %s AND %s
-            GROUP BY t.track_name, a.artist_name, af.tempo, af.energy, af.danceability, bc.chart_date
-        )
         SELECT 
-            track_name,
-            artist_name,
-            tempo,
-            energy,
-            danceability,
-            EXTRACT(YEAR FROM chart_date) AS year,
-            best_rank
-        FROM decade_songs
-        ORDER BY best_rank ASC
+            t.track_name,
+            a.artist_name,
+            af.tempo,
+            af.energy,
+            af.danceability,
+            cy.chart_year AS year,
+            cy.best_rank
+        FROM track_chart_years cy
+        JOIN tracks t ON cy.spotify_id = t.spotify_id
+        JOIN artists a ON t.artist_id = a.artist_id
+        JOIN audio_features af ON t.spotify_id = af.spotify_id
+        WHERE cy.chart_year BETWEEN %s AND %s
+            AND af.energy BETWEEN %s AND %s
+        ORDER BY cy.best_rank ASC
         LIMIT %s;
         """
         
-        cursor.execute(query, (start_year, end_year, min_energy, max_energy, limit))
+        params = (start_year, end_year, min_energy, max_energy, listing.sql_limit)
+        
+        if listing.stream:
+            return stream_response(db_pool, query, params, listing.stream, app.json.dumps,
+                                   STREAMING_CONFIG['fetch_size'])
+        
+        conn = get_db_connection()
+        if conn is None:
+            return jsonify({'error': 'Database connection failed'}), 500
+        cursor = conn.cursor(cursor_factory=TimedCursor)
+        statements.execute(cursor, 'playlist_decade', query, params)
         results = cursor.fetchall()
+        columns = column_names(cursor)
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
-        return jsonify(results)
+        return rows_response(columns, results, listing.format, listing.page_size)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -458,83 +660,46 @@ def playlist_decade():
 
 # Route 8: Mix Playlist - Chart Hits and Hidden Gems
 @app.route('/api/playlist/mix')
+@cached_response(response_cache)
 def playlist_mix():
     """
-    Create a balanced playlist mixing chart hits with hidden gems
+    Create a balanced playlist mixing chart hits with hidden gems.
+    mix=hits:10,gems:10,workout:5,happy:5 picks any components and counts
+    (proportions when size is given); each component runs concurrently on
+    its own pooled connection, so latency follows the slowest one.
     """
     genre = request.args.get('genre', type=str)
-    max_chart_rank = request.args.get('max_chart_rank', default=30, type=int)
-    min_popularity = request.args.get('min_popularity', default=55, type=int)
     hits_limit = request.args.get('hits_limit', default=15, type=int)
     gems_limit = request.args.get('gems_limit', default=15, type=int)
+    spec = request.args.get('mix', type=str)
+    size = request.args.get('size', type=int)
     
     if not genre:
         return jsonify({'error': 'genre parameter is required'}), 400
     
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'error': 'Database connection failed'}), 500
+    # Component queries buffer their rows, so the whole mix stays under the buffered limit
+    try:
+        if spec:
+            parts = parse_mix_spec(spec, size, max_tracks=STREAMING_CONFIG['max_buffered_limit'])
+        else:
+            parts = check_mix_counts([('hits', hits_limit), ('gems', gems_limit)],
+                                     max_tracks=STREAMING_CONFIG['max_buffered_limit'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        query = """
-        WITH chart_hits AS (
-            SELECT DISTINCT
-                t.spotify_id,
-                t.track_name,
-                a.artist_name,
-                g.genre_name,
-                'Chart Hit' AS track_type,
-                t.popularity
-            FROM tracks t
-            JOIN artists a ON t.artist_id = a.artist_id
-            JOIN track_genres tg ON t.spotify_id = tg.spotify_id
-            JOIN genres g ON tg.genre_id = g.genre_id
-            JOIN song_join sj ON t.spotify_id = sj.spotify_id
-            JOIN billboard_charts bc ON sj.chart_id = bc.chart_id
-            WHERE g.genre_name = %s AND bc.chart_rank <= %s
-            ORDER BY t.popularity DESC
-            LIMIT %s
-        ),
-        hidden_gems AS (
-            SELECT DISTINCT
-                t.spotify_id,
-                t.track_name,
-                a.artist_name,
-                g.genre_name,
-                'Hidden Gem' AS track_type,
-                t.popularity
-            FROM tracks t
-            JOIN artists a ON t.artist_id = a.artist_id
-            JOIN track_genres tg ON t.spotify_id = tg.spotify_id
-            JOIN genres g ON tg.genre_id = g.genre_id
-            WHERE g.genre_name = %s
-                AND t.popularity > %s
-                AND NOT EXISTS (
-                    SELECT 1 FROM song_join sj WHERE sj.spotify_id = t.spotify_id
-                )
-            ORDER BY t.popularity DESC
-            LIMIT %s
-        )
-        SELECT spotify_id, track_name, artist_name, genre_name, track_type, popularity 
-        FROM chart_hits
-        UNION ALL
-        SELECT spotify_id, track_name, artist_name, genre_name, track_type, popularity 
-        FROM hidden_gems
-        ORDER BY track_type, popularity DESC;
-        """
-        
-        cursor.execute(query, (genre, max_chart_rank, hits_limit, genre, min_popularity, gems_limit))
-        results = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify(results)
-        
+        results, timings = build_mix(db_pool, mix_executor, parts, genre, request.args,
+                                     timeout=MIX_CONFIG['timeout'], statements=statements)
+    except PoolError as e:
+        print(f"Database connection error: {e}")
+        return jsonify({'error': 'Database connection failed'}), 500
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    response = jsonify(results)
+    response.headers['Server-Timing'] = ', '.join(
+        f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.items())
+    return response
 
 
 # Route 9: Similar Artists Recommendation
@@ -547,13 +712,26 @@ def similar_artists(artist_name):
     feature_range = request.args.get('feature_range', default=0.25, type=float)
     min_tracks = request.args.get('min_tracks', default=5, type=int)
     limit = request.args.get('limit', default=10, type=int)
+    # 'box' keeps the range filter ordered by popularity, 'nearest' ranks by distance
+    mode = request.args.get('mode', default='box', type=str)
+    
+    if mode not in ('box', 'nearest'):
+        return jsonify({'error': "mode must be 'box' or 'nearest'"}), 400
+    
+    index = artist_index.index
+    if index is not None:
+        if mode == 'nearest':
+            return jsonify(index.similar_knn(artist_name, min_tracks, limit))
+        return jsonify(index.similar_box(artist_name, tempo_range, feature_range, min_tracks, limit))
+    if mode == 'nearest':
+        return jsonify({'error': 'Artist index is still loading, try again shortly'}), 503
     
     conn = get_db_connection()
     if conn is None:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor(cursor_factory=TimedCursor)
         
         query = """
         WITH artist_profile AS (
@@ -593,64 +771,97 @@ def similar_artists(artist_name):
         LIMIT %s;
         """
         
-        cursor.execute(query, (artist_name, artist_name, tempo_range, tempo_range, 
-                              feature_range, feature_range, feature_range, feature_range,
-                              min_tracks, limit))
+        statements.execute(cursor, 'similar_artists', query, (artist_name, artist_name, tempo_range, tempo_range, 
+                                                             feature_range, feature_range, feature_range, feature_range,
+                                                             min_tracks, limit))
         results = cursor.fetchall()
+        columns = column_names(cursor)
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
-        return jsonify(results)
+        return rows_response(columns, results)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# Summary statistics of a set of tracks; {tracks} is either an id array or a saved playlist
+PLAYLIST_STATS_QUERY = """
+SELECT 
+    COUNT(*) AS total_tracks,
+    COUNT(DISTINCT a.artist_name) AS unique_artists,
+    ROUND(AVG(af.tempo)::numeric, 2) AS avg_tempo,
+    ROUND(AVG(af.energy)::numeric, 2) AS avg_energy,
+    ROUND(AVG(af.danceability)::numeric, 2) AS avg_danceability,
+    ROUND(AVG(af.valence)::numeric, 2) AS avg_valence,
+    ROUND((AVG(t.duration_ms) / 60000.0)::numeric, 2) AS avg_duration_minutes
+FROM tracks t
+JOIN artists a ON t.artist_id = a.artist_id
+JOIN audio_features af ON t.spotify_id = af.spotify_id
+WHERE t.spotify_id {tracks};
+"""
+
 # Route 10: Playlist Statistics Summary
-@app.route('/api/playlist/stats')
+@app.route('/api/playlist/stats', methods=['GET', 'POST'])
 def playlist_stats():
     """
-    Provide summary statistics for a playlist
+    Provide summary statistics for a playlist.
+    GET takes comma-separated spotify_ids (or playlist_id); POST takes a JSON
+    body {"spotify_ids": [...]} or {"playlist_id": N} for playlists too long
+    for a URL. source=cache|db|auto picks the in-memory feature store or SQL.
     """
-    spotify_ids = request.args.get('spotify_ids', type=str)
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        ids_list = body.get('spotify_ids')
+        playlist_id = body.get('playlist_id')
+        source = body.get('source', 'auto')
+        if ids_list is not None and (not isinstance(ids_list, list)
+                                     or not all(isinstance(sid, str) for sid in ids_list)):
+            return jsonify({'error': 'spotify_ids must be a list of strings'}), 400
+        if playlist_id is not None and (not isinstance(playlist_id, int) or isinstance(playlist_id, bool)):
+            return jsonify({'error': 'playlist_id must be an integer'}), 400
+    else:
+        spotify_ids = request.args.get('spotify_ids', type=str)
+        ids_list = spotify_ids.split(',') if spotify_ids else None
+        playlist_id = request.args.get('playlist_id', type=int)
+        source = request.args.get('source', default='auto', type=str)
     
-    if not spotify_ids:
-        return jsonify({'error': 'spotify_ids parameter is required'}), 400
+    if not ids_list and playlist_id is None:
+        return jsonify({'error': 'spotify_ids or playlist_id parameter is required'}), 400
+    if source not in ('auto', 'cache', 'db'):
+        return jsonify({'error': "source must be 'auto', 'cache' or 'db'"}), 400
     
-    # Convert comma-separated string to list
-    ids_list = spotify_ids.split(',')
+    # Explicit id lists can be answered from memory; saved playlists always need the database
+    data = feature_store.data
+    if ids_list and source != 'db':
+        if data is not None:
+            result = features.playlist_stats(data, ids_list)
+            result['source'] = 'cache'
+            return jsonify(result)
+        if source == 'cache':
+            return jsonify({'error': 'Feature store is still loading, retry shortly'}), 503
     
     conn = get_db_connection()
     if conn is None:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Create placeholder string for IN clause
-        placeholders = ','.join(['%s'] * len(ids_list))
+        cursor = conn.cursor(cursor_factory=TimedRealDictCursor)
         
-        query = f"""
-        SELECT 
-            COUNT(*) AS total_tracks,
-            COUNT(DISTINCT a.artist_name) AS unique_artists,
-            ROUND(AVG(af.tempo)::numeric, 2) AS avg_tempo,
-            ROUND(AVG(af.energy)::numeric, 2) AS avg_energy,
-            ROUND(AVG(af.danceability)::numeric, 2) AS avg_danceability,
-            ROUND(AVG(af.valence)::numeric, 2) AS avg_valence,
-            ROUND((AVG(t.duration_ms) / 60000.0)::numeric, 2) AS avg_duration_minutes
-        FROM tracks t
-        JOIN artists a ON t.artist_id = a.artist_id
-        JOIN audio_features af ON t.spotify_id = af.spotify_id
-        WHERE t.spotify_id IN ({placeholders});
-        """
-        
-        cursor.execute(query, ids_list)
+        # One array parameter keeps a single statement shape whatever the playlist size
+        if ids_list:
+            query = PLAYLIST_STATS_QUERY.format(tracks='= ANY(%s)')
+            statements.execute(cursor, 'playlist_stats_ids', query, (ids_list,))
+        else:
+            query = PLAYLIST_STATS_QUERY.format(
+                tracks='IN (SELECT spotify_id FROM playlist_tracks WHERE playlist_id = %s)')
+            statements.execute(cursor, 'playlist_stats_saved', query, (playlist_id,))
         result = cursor.fetchone()
+        result['source'] = 'db'
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
         return jsonify(result)
         
@@ -663,6 +874,7 @@ def playlist_stats():
 
 # Route 11: Get All Genres
 @app.route('/api/genres')
+@cached_response(response_cache)
 def get_genres():
     """
     Return a list of all available genres
@@ -672,7 +884,7 @@ def get_genres():
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor(cursor_factory=TimedCursor)
         
         query = """
         SELECT genre_id, genre_name 
@@ -682,11 +894,12 @@ def get_genres():
         
         cursor.execute(query)
         results = cursor.fetchall()
+        columns = column_names(cursor)
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
-        return jsonify(results)
+        return rows_response(columns, results)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -699,13 +912,19 @@ def get_artists():
     Return a list of all artists, optionally filtered by search term
     """
     search = request.args.get('search', type=str)
+    # prefix=true switches to autocomplete (names starting with the term)
+    prefix = request.args.get('prefix', default='false', type=str).lower() == 'true'
+    
+    index = search_store.index
+    if search and index is not None:
+        return jsonify(index.search_artists(search, 50, prefix=prefix))
     
     conn = get_db_connection()
     if conn is None:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor(cursor_factory=TimedCursor)
         
         if search:
             query = """
@@ -715,7 +934,8 @@ def get_artists():
             ORDER BY artist_name
             LIMIT 50;
             """
-            cursor.execute(query, (f'%{search}%',))
+            pattern = f'{search}%' if prefix else f'%{search}%'
+            cursor.execute(query, (pattern,))
         else:
             query = """
             SELECT artist_id, artist_name 
@@ -726,11 +946,12 @@ def get_artists():
             cursor.execute(query)
         
         results = cursor.fetchall()
+        columns = column_names(cursor)
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
-        return jsonify(results)
+        return rows_response(columns, results)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -747,7 +968,7 @@ def get_user(user_id):
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor(cursor_factory=TimedRealDictCursor)
         
         query = """
         SELECT user_id, username, email 
@@ -759,7 +980,7 @@ def get_user(user_id):
         result = cursor.fetchone()
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
         if result:
             return jsonify(result)
@@ -790,7 +1011,7 @@ def create_or_update_user():
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor(cursor_factory=TimedRealDictCursor)
         
         if user_id:
             # Update existing user
@@ -814,7 +1035,7 @@ def create_or_update_user():
         conn.commit()
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
         return jsonify({
             'success': True,
@@ -826,6 +1047,25 @@ def create_or_update_user():
         return jsonify({'error': str(e)}), 500
 
 
+# Inserts one playlist plus all of its tracks: two statements no matter how long the playlist is
+def insert_playlist(conn, user_id, playlist_name, spotify_ids):
+    """Insert a playlist and its tracks (in list order); returns the new playlist_id"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO playlists (user_id, name, created_at) 
+            VALUES (%s, %s, NOW()) 
+            RETURNING playlist_id;
+        """, (user_id, playlist_name))
+        playlist_id = cursor.fetchone()[0]
+        
+        # The whole id list travels as one array parameter; WITH ORDINALITY gives the positions
+        cursor.execute("""
+            INSERT INTO playlist_tracks (playlist_id, spotify_id, position, added_at)
+            SELECT %s, ids.spotify_id, ids.position, NOW()
+            FROM unnest(%s::text[]) WITH ORDINALITY AS ids(spotify_id, position);
+        """, (playlist_id, list(spotify_ids)))
+    return playlist_id
+
 # Route 15: Save Playlist
 @app.route('/api/playlist/save', methods=['POST'])
 def save_playlist():
@@ -841,40 +1081,95 @@ def save_playlist():
     playlist_name = data.get('playlist_name')
     spotify_ids = data.get('spotify_ids')
     
+    # A string would otherwise be saved one character per track
+    if not isinstance(spotify_ids, list):
+        return jsonify({'error': 'spotify_ids must be a list'}), 400
+    
     conn = get_db_connection()
     if conn is None:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        started = time.perf_counter()
+        playlist_id = insert_playlist(conn, user_id, playlist_name, spotify_ids)
+        conn.commit()
+        elapsed = time.perf_counter() - started
         
-        # Insert playlist
-        query = """
-        INSERT INTO playlists (user_id, name, created_at) 
-        VALUES (%s, %s, NOW()) 
-        RETURNING playlist_id;
-        """
-        cursor.execute(query, (user_id, playlist_name))
-        result = cursor.fetchone()
-        playlist_id = result['playlist_id']
+        release_db_connection(conn)
         
-        # Insert tracks
-        for position, spotify_id in enumerate(spotify_ids, start=1):
-            query = """
-            INSERT INTO playlist_tracks (playlist_id, spotify_id, position, added_at) 
-            VALUES (%s, %s, %s, NOW());
-            """
-            cursor.execute(query, (playlist_id, spotify_id, position))
+        return jsonify({
+            'success': True,
+            'playlist_id': playlist_id,
+            'tracks_saved': len(spotify_ids),
+            'elapsed_ms': round(elapsed * 1000, 2),
+            'rows_per_second': round(len(spotify_ids) / elapsed, 1) if elapsed else None,
+            'message': 'Playlist saved successfully'
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Route 15b: Bulk Save Playlists
+@app.route('/api/playlists/bulk', methods=['POST'])
+def save_playlists_bulk():
+    """
+    Save many playlists (for any number of users) in one transaction.
+    Each playlist runs under its own savepoint, so one bad playlist is
+    reported in its result without discarding the others.
+    """
+    data = request.get_json()
+    
+    if not data or not isinstance(data.get('playlists'), list):
+        return jsonify({'error': 'playlists (a list of {user_id, playlist_name, spotify_ids}) is required'}), 400
+    
+    playlists = data['playlists']
+    
+    conn = get_db_connection()
+    if conn is None:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        started = time.perf_counter()
+        cursor = conn.cursor()
+        results = []
+        tracks_saved = 0
+        
+        for index, playlist in enumerate(playlists):
+            if (not isinstance(playlist, dict) or 'user_id' not in playlist
+                    or 'playlist_name' not in playlist or not isinstance(playlist.get('spotify_ids'), list)):
+                results.append({'index': index, 'success': False,
+                                'error': 'user_id, playlist_name, and spotify_ids are required'})
+                continue
+            
+            cursor.execute('SAVEPOINT bulk_playlist;')
+            try:
+                playlist_id = insert_playlist(conn, playlist['user_id'], playlist['playlist_name'],
+                                              playlist['spotify_ids'])
+            except psycopg2.Error as e:
+                cursor.execute('ROLLBACK TO SAVEPOINT bulk_playlist;')
+                results.append({'index': index, 'success': False, 'error': str(e).strip()})
+                continue
+            cursor.execute('RELEASE SAVEPOINT bulk_playlist;')
+            tracks_saved += len(playlist['spotify_ids'])
+            results.append({'index': index, 'success': True, 'playlist_id': playlist_id,
+                            'tracks_saved': len(playlist['spotify_ids'])})
         
         conn.commit()
+        elapsed = time.perf_counter() - started
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
+        saved = sum(1 for r in results if r['success'])
         return jsonify({
-            'success': True,
-            'playlist_id': playlist_id,
-            'message': 'Playlist saved successfully'
+            'success': saved == len(playlists),
+            'saved': saved,
+            'failed': len(playlists) - saved,
+            'tracks_saved': tracks_saved,
+            'elapsed_ms': round(elapsed * 1000, 2),
+            'rows_per_second': round(tracks_saved / elapsed, 1) if elapsed else None,
+            'results': results
         })
         
     except Exception as e:
@@ -892,7 +1187,7 @@ def get_user_playlists(user_id):
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor(cursor_factory=TimedCursor)
         
         query = """
         SELECT 
@@ -909,11 +1204,12 @@ def get_user_playlists(user_id):
         
         cursor.execute(query, (user_id,))
         results = cursor.fetchall()
+        columns = column_names(cursor)
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
-        return jsonify(results)
+        return rows_response(columns, results)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -943,7 +1239,7 @@ def delete_playlist(playlist_id):
         conn.commit()
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
         return jsonify({
             'success': True,
@@ -961,44 +1257,270 @@ def search_tracks():
     Search for tracks by name
     """
     query_param = request.args.get('query', type=str)
-    limit = request.args.get('limit', default=20, type=int)
+    prefix = request.args.get('prefix', default='false', type=str).lower() == 'true'
     
     if not query_param:
         return jsonify({'error': 'query parameter is required'}), 400
     
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        listing = ListingRequest(request.args, default_limit=20, config=STREAMING_CONFIG)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Streams and pages come from SQL; the in-memory index serves plain top-N lookups
+    index = search_store.index
+    if index is not None and not listing.stream and listing.page_size is None:
+        return jsonify(listing.body(index.search_tracks(query_param, listing.limit, prefix=prefix)))
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        after_sql, after_params = listing.keyset('t.popularity', 't.spotify_id')
         
-        query = """
+        query = f"""
         SELECT 
             t.track_name, 
             t.spotify_id, 
             a.artist_name, 
-            t.popularity, 
-            t.album_name
+            t.popularity
         FROM tracks t
         JOIN artists a ON t.artist_id = a.artist_id
         WHERE t.track_name ILIKE %s
-        ORDER BY t.popularity DESC
+            {after_sql}
+        ORDER BY t.popularity DESC, t.spotify_id DESC
         LIMIT %s;
         """
         
-        cursor.execute(query, (f'%{query_param}%', limit))
+        pattern = f'{query_param}%' if prefix else f'%{query_param}%'
+        params = (pattern, *after_params, listing.sql_limit)
+        
+        if listing.stream:
+            return stream_response(db_pool, query, params, listing.stream, app.json.dumps,
+                                   STREAMING_CONFIG['fetch_size'])
+        
+        conn = get_db_connection()
+        if conn is None:
+            return jsonify({'error': 'Database connection failed'}), 500
+        cursor = conn.cursor(cursor_factory=TimedCursor)
+        cursor.execute(query, params)
         results = cursor.fetchall()
+        columns = column_names(cursor)
         
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
         
-        return jsonify(results)
+        return rows_response(columns, results, listing.format, listing.page_size)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Route 19: Filter Tracks by Audio Feature Ranges
+@app.route('/api/tracks/filter')
+@cached_response(response_cache)
+def filter_tracks():
+    """
+    Tracks inside min_<feature>/max_<feature> bounds on any of the nine
+    features, ordered by order_by (comma-separated, '-' for descending)
+    """
+    predicates = []
+    for column in features.FEATURE_COLUMNS:
+        low = request.args.get(f'min_{column}', type=float)
+        high = request.args.get(f'max_{column}', type=float)
+        if low is not None:
+            predicates.append((column, '>=', low))
+        if high is not None:
+            predicates.append((column, '<=', high))
+    order_by = []
+    for key in request.args.get('order_by', default='-popularity', type=str).split(','):
+        key = key.strip()
+        if key:
+            order_by.append((key.lstrip('-'), key.startswith('-')))
+    genre = request.args.get('genre', type=str)
+    limit = request.args.get('limit', default=25, type=int)
+
+    if limit > STREAMING_CONFIG['max_buffered_limit']:
+        return jsonify({'error': f"limit must be at most {STREAMING_CONFIG['max_buffered_limit']}"}), 400
+
+    index = range_index.index
+    if index is None:
+        return jsonify({'error': 'Feature store is still loading, try again shortly'}), 503
+    try:
+        return jsonify(ranges.feature_search(index, predicates, order_by, limit, genre))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+# Route 20: Track Radio - nearest tracks to one or more seed tracks
+@app.route('/api/tracks/radio')
+@cached_response(response_cache)
+def track_radio():
+    """
+    Tracks that sound like the seed track(s): nearest neighbours of the seeds'
+    mean in z-scored audio-feature space, optionally within a genre and
+    charted=true|false. n_probe trades latency for recall.
+    """
+    seeds = [sid.strip() for value in request.args.getlist('seed') for sid in value.split(',') if sid.strip()]
+    k = request.args.get('k', default=25, type=int)
+    n_probe = request.args.get('n_probe', default=RADIO_INDEX_CONFIG['n_probe'], type=int)
+    genre = request.args.get('genre', type=str)
+    charted = request.args.get('charted', type=str)
+
+    if not seeds:
+        return jsonify({'error': 'at least one seed spotify_id is required'}), 400
+    if len(seeds) > RADIO_INDEX_CONFIG['max_seeds']:
+        return jsonify({'error': f"at most {RADIO_INDEX_CONFIG['max_seeds']} seeds"}), 400
+    if not 1 <= k <= RADIO_INDEX_CONFIG['max_k']:
+        return jsonify({'error': f"k must be between 1 and {RADIO_INDEX_CONFIG['max_k']}"}), 400
+    if not 1 <= n_probe <= RADIO_INDEX_CONFIG['max_n_probe']:
+        return jsonify({'error': f"n_probe must be between 1 and {RADIO_INDEX_CONFIG['max_n_probe']}"}), 400
+    if charted is not None:
+        if charted.lower() not in ('true', 'false'):
+            return jsonify({'error': "charted must be 'true' or 'false'"}), 400
+        charted = charted.lower() == 'true'
+
+    index = radio_store.index
+    if index is None:
+        return jsonify({'error': 'Radio index is still loading, try again shortly'}), 503
+
+    data = index.data
+    seed_rows = [data.row_of[sid] for sid in seeds if sid in data.row_of]
+    if not seed_rows:
+        return jsonify({'error': 'None of the seed tracks were found'}), 404
+    genre_code = None
+    if genre is not None:
+        genre_code = data.genre_code_of.get(genre)
+        if genre_code is None:
+            return jsonify({'error': f"Unknown genre '{genre}'"}), 404
+
+    rows, distances, search = index.search(seed_rows, k, n_probe, genre_code, charted)
+    return jsonify({
+        'seeds': [index.track(row) for row in seed_rows],
+        'missing_seeds': [sid for sid in seeds if sid not in data.row_of],
+        'n_probe': n_probe,
+        'lists_probed': search['lists_probed'],
+        'candidates': search['candidates'],
+        'tracks': [index.track(row, distance) for row, distance in zip(rows.tolist(), distances.tolist())],
+    })
+
+# Route 21: Batch - several read-only API calls in one round trip
+@app.route('/api/batch', methods=['POST'])
+def batch_requests():
+    """
+    Run a list of GET sub-requests concurrently, each through its normal route
+    (pooled connection, response cache, metrics), and return every result
+    with its own status and timing.
+    Body: {"requests": [{"id": "genres", "route": "/api/genres", "params": {...}}, ...]}
+    """
+    try:
+        items = parse_batch(request.get_json(silent=True), BATCH_CONFIG['max_requests'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    started = time.perf_counter()
+    results = run_batch(app, batch_executor, items, timeout=BATCH_CONFIG['timeout'])
+    total = time.perf_counter() - started
+    
+    response = Response(render_batch(results, app.json.dumps, total), mimetype='application/json')
+    response.headers['Server-Timing'] = server_timing(results)
+    return response
+
+# Prometheus scrape endpoint
+@app.route('/metrics')
+def prometheus_metrics():
+    """Per-route request counts, errors, latency histograms and phase times"""
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# The same numbers with p50/p95/p99 worked out, for a quick look without Prometheus
+@app.route('/api/metrics/summary')
+def metrics_summary():
+    """Return per-route latency percentiles and average phase times"""
+    return jsonify(request_metrics.summary())
+
+# Pool statistics, for sizing POOL_CONFIG against the server thread count
+@app.route('/api/pool/stats')
+def pool_stats():
+    """Return connection pool usage counters"""
+    return jsonify(db_pool.stats())
+
+# Feature store status
+@app.route('/api/feature-store/status')
+def feature_store_status():
+    """Return whether the in-memory feature store is loaded and how big it is"""
+    status = feature_store.status()
+    status['artist_index_size'] = len(artist_index.index) if artist_index.index is not None else 0
+    status['search_index'] = search_store.status()
+    status['range_index'] = range_index.index.status() if range_index.index is not None else None
+    status['radio_index'] = radio_store.status()
+    return jsonify(status)
+
+# Cache statistics
+@app.route('/api/cache/stats')
+def cache_stats():
+    """Return response cache hit/miss/eviction counters"""
+    return jsonify(response_cache.stats())
+
+# Prepared statement statistics - prepare vs execute time per route statement
+@app.route('/api/statements/stats')
+def statement_stats():
+    """Return prepared statement counters and sampled planning/execution times"""
+    return jsonify(statements.stats())
+
+# Switch between generic and custom plans for the prepared route statements
+@app.route('/api/admin/plan-cache-mode', methods=['POST'])
+def set_plan_cache_mode():
+    """Set plan_cache_mode (auto, force_generic_plan, force_custom_plan) for all pooled connections"""
+    data = request.get_json(silent=True) or {}
+    try:
+        statements.set_plan_cache_mode(data.get('mode'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'success': True, 'plan_cache_mode': statements.plan_cache_mode})
+
+# Recent slow statements, newest first (plans via /api/admin/slow-queries/<id>)
+@app.route('/api/admin/slow-queries')
+def slow_queries():
+    """Return logged slow statements, optionally filtered by route and minimum duration"""
+    limit = request.args.get('limit', default=50, type=int)
+    route = request.args.get('route', type=str)
+    min_ms = request.args.get('min_ms', type=float)
+    return jsonify({
+        'stats': slow_query_log.stats(),
+        'queries': slow_query_log.entries(limit=limit, route=route, min_ms=min_ms)
+    })
+
+# One slow statement with its captured EXPLAIN (ANALYZE, BUFFERS) plan, if it was sampled
+@app.route('/api/admin/slow-queries/<int:entry_id>')
+def slow_query_detail(entry_id):
+    """Return a logged slow statement including its plan"""
+    entry = slow_query_log.get(entry_id)
+    if entry is None:
+        return jsonify({'error': 'Slow query not found'}), 404
+    return jsonify(entry)
+
+# Reload hook - call after schema.sql/setup.sql (or any ETL load) changes the data
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_data():
+    """Rebuild the in-memory stores and drop every cached response"""
+    try:
+        feature_store.load(db_pool)
+        search_store.load(db_pool)
+    except Exception as e:
+        response_cache.clear()
+        return jsonify({'error': f'Feature store reload failed: {str(e)}'}), 500
+    response_cache.clear()
+    return jsonify({
+        'success': True,
+        'feature_store': feature_store.status(),
+        'cache': response_cache.stats()
+    })
+
 # Run the server
 if __name__ == '__main__':
+    # Open min_size connections before the first request instead of on it
+    try:
+        db_pool.prefill()
+    except Exception as e:
+        print(f"Connection pool prefill failed: {e}")
+    if FEATURE_STORE_CONFIG['preload']:
+        feature_store.load_async(db_pool)
+    if SEARCH_INDEX_CONFIG['preload']:
+        search_store.load_async(db_pool)
     print(f"Starting server on {SERVER_HOST}:{SERVER_PORT}")
     app.run(host=SERVER_HOST, port=SERVER_PORT, debug=True)
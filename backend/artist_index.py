@@ -0,0 +1,225 @@
+# artist_index.py
+# Precomputed artist centroids held in a KD-tree for the similar-artists route
+
+import heapq
+
+import numpy as np
+
+from feature_store import FEATURE_INDEX
+
+# Dimensions the similar-artists route compares on
+PROFILE_COLUMNS = ['tempo', 'energy', 'danceability', 'valence']
+
+
+class KDTree:
+    """
+    Static KD-tree over a small point set (one point per artist).
+    Supports axis-aligned box queries and k-nearest-neighbour search.
+    """
+
+    def __init__(self, points, leaf_size=32):
+        self.points = np.ascontiguousarray(points, dtype=np.float64)
+        self.leaf_size = leaf_size
+        n = len(self.points)
+        self.perm = np.arange(n)
+
+        # Flat node arrays: children are -1 for leaves
+        self.node_start = []
+        self.node_end = []
+        self.node_left = []
+        self.node_right = []
+        self.node_lo = []
+        self.node_hi = []
+        if n:
+            self._build(0, n)
+        self.node_lo = np.array(self.node_lo)
+        self.node_hi = np.array(self.node_hi)
+
+    def _build(self, start, end):
+        node = len(self.node_start)
+        pts = self.points[self.perm[start:end]]
+        self.node_start.append(start)
+        self.node_end.append(end)
+        self.node_left.append(-1)
+        self.node_right.append(-1)
+        self.node_lo.append(pts.min(axis=0))
+        self.node_hi.append(pts.max(axis=0))
+
+        if end - start > self.leaf_size:
+            # Split on the widest dimension at the median
+            dim = int(np.argmax(self.node_hi[node] - self.node_lo[node]))
+            mid = (end - start) // 2
+            order = np.argpartition(pts[:, dim], mid)
+            self.perm[start:end] = self.perm[start:end][order]
+            self.node_left[node] = self._build(start, start + mid)
+            self.node_right[node] = self._build(start + mid, end)
+        return node
+
+    def query_box(self, lo, hi):
+        """Indices of all points p with lo <= p <= hi in every dimension"""
+        if not self.node_start:
+            return np.empty(0, dtype=np.int64)
+        found = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            node_lo, node_hi = self.node_lo[node], self.node_hi[node]
+            if np.any(node_hi < lo) or np.any(node_lo > hi):
+                continue
+            start, end = self.node_start[node], self.node_end[node]
+            if np.all(node_lo >= lo) and np.all(node_hi <= hi):
+                found.append(self.perm[start:end])
+            elif self.node_left[node] < 0:
+                idx = self.perm[start:end]
+                pts = self.points[idx]
+                found.append(idx[np.all((pts >= lo) & (pts <= hi), axis=1)])
+            else:
+                stack.append(self.node_left[node])
+                stack.append(self.node_right[node])
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def query_knn(self, point, k, eligible=None):
+        """
+        The k nearest points to `point` as (distances, indices), nearest first.
+        `eligible` is an optional boolean mask; ineligible points are skipped
+        during the search rather than filtered afterwards.
+        """
+        if k <= 0 or not self.node_start:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        point = np.asarray(point, dtype=np.float64)
+        best = []  # max-heap of (-dist, index)
+
+        def bound(node):
+            gap = np.maximum(self.node_lo[node] - point, 0) + np.maximum(point - self.node_hi[node], 0)
+            return float(np.sqrt(np.dot(gap, gap)))
+
+        frontier = [(bound(0), 0)]
+        while frontier:
+            dist, node = heapq.heappop(frontier)
+            if len(best) == k and dist > -best[0][0]:
+                break
+            start, end = self.node_start[node], self.node_end[node]
+            if self.node_left[node] < 0:
+                idx = self.perm[start:end]
+                if eligible is not None:
+                    idx = idx[eligible[idx]]
+                if len(idx) == 0:
+                    continue
+                diff = self.points[idx] - point
+                dists = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+                for d, i in zip(dists.tolist(), idx.tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, i))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, i))
+            else:
+                for child in (self.node_left[node], self.node_right[node]):
+                    heapq.heappush(frontier, (bound(child), child))
+
+        best.sort(reverse=True)
+        return (np.array([-d for d, _ in best]),
+                np.array([i for _, i in best], dtype=np.int64))
+
+
+class ArtistIndex:
+    """Per-artist mean features, track count and popularity, plus a KD-tree over them"""
+
+    def __init__(self, data):
+        ranges = sorted(data.artist_ranges.items(), key=lambda item: item[1][0])
+        self.artist_ids = np.array([artist_id for artist_id, _ in ranges], dtype=np.int32)
+        self.names = [data.artist_names[artist_id] for artist_id in self.artist_ids.tolist()]
+        starts = np.array([r[0] for _, r in ranges], dtype=np.int64)
+        ends = np.array([r[1] for _, r in ranges], dtype=np.int64)
+
+        self.track_counts = ends - starts
+        cols = [FEATURE_INDEX[c] for c in PROFILE_COLUMNS]
+        if len(starts):
+            sums = np.add.reduceat(data.features[:, cols].astype(np.float64), starts, axis=0)
+            pop_sums = np.add.reduceat(data.popularity.astype(np.float64), starts)
+        else:
+            sums = np.empty((0, len(cols)))
+            pop_sums = np.empty(0)
+        self.centroids = sums / self.track_counts[:, None]
+        self.avg_popularity = pop_sums / self.track_counts
+
+        # z-score each dimension so tempo (BPM) does not swamp the 0-1 features
+        self.mean = self.centroids.mean(axis=0) if len(starts) else np.zeros(len(cols))
+        self.scale = self.centroids.std(axis=0) if len(starts) else np.ones(len(cols))
+        self.scale[self.scale == 0] = 1.0
+        self.tree = KDTree((self.centroids - self.mean) / self.scale)
+
+        self.positions_by_name = {}
+        for pos, name in enumerate(self.names):
+            self.positions_by_name.setdefault(name, []).append(pos)
+
+    def __len__(self):
+        return len(self.names)
+
+    def normalize(self, values):
+        return (np.asarray(values, dtype=np.float64) - self.mean) / self.scale
+
+    def _result(self, pos, distance=None):
+        dims = {c: i for i, c in enumerate(PROFILE_COLUMNS)}
+        result = {
+            'artist_name': self.names[pos],
+            'track_count': int(self.track_counts[pos]),
+            'avg_popularity': round(float(self.avg_popularity[pos]), 2),
+            'avg_tempo': round(float(self.centroids[pos, dims['tempo']]), 2),
+            'avg_energy': round(float(self.centroids[pos, dims['energy']]), 2),
+        }
+        if distance is not None:
+            result['avg_danceability'] = round(float(self.centroids[pos, dims['danceability']]), 2)
+            result['avg_valence'] = round(float(self.centroids[pos, dims['valence']]), 2)
+            result['distance'] = round(float(distance), 4)
+        return result
+
+    def similar_box(self, artist_name, tempo_range, feature_range, min_tracks, limit):
+        """
+        Same semantics as the SQL route: artists whose average tempo, energy and
+        danceability sit inside a box around the target, ordered by popularity.
+        """
+        targets = self.positions_by_name.get(artist_name, [])
+        if not targets:
+            return []
+        dims = {c: i for i, c in enumerate(PROFILE_COLUMNS)}
+        half = np.full(len(PROFILE_COLUMNS), np.inf)
+        half[dims['tempo']] = tempo_range
+        half[dims['energy']] = feature_range
+        half[dims['danceability']] = feature_range
+
+        candidates = set()
+        for target in targets:
+            centre = self.centroids[target]
+            lo = self.normalize(centre - half)
+            hi = self.normalize(centre + half)
+            candidates.update(self.tree.query_box(lo, hi).tolist())
+
+        picked = [pos for pos in candidates
+                  if self.names[pos] != artist_name and self.track_counts[pos] >= min_tracks]
+        picked.sort(key=lambda pos: -self.avg_popularity[pos])
+        return [self._result(pos) for pos in picked[:max(limit, 0)]]
+
+    def similar_knn(self, artist_name, min_tracks, limit):
+        """The `limit` artists closest to the target in normalized feature space"""
+        targets = self.positions_by_name.get(artist_name, [])
+        if not targets:
+            return []
+        eligible = self.track_counts >= min_tracks
+        for pos in targets:
+            eligible[pos] = False
+        # Several artists can share a name; use their pooled centroid
+        weights = self.track_counts[targets]
+        centre = np.average(self.centroids[targets], axis=0, weights=weights)
+        distances, positions = self.tree.query_knn(self.normalize(centre), limit, eligible)
+        return [self._result(pos, dist) for dist, pos in zip(distances.tolist(), positions.tolist())]
+
+
+class ArtistIndexStore:
+    """Holds the current ArtistIndex; rebuilt whenever the feature store reloads"""
+
+    def __init__(self):
+        self.index = None
+
+    def rebuild(self, data):
+        self.index = ArtistIndex(data)
+        return self.index
@@ -0,0 +1,144 @@
+# batch.py
+# Several read-only API calls in one round trip: each sub-request is dispatched
+# through the app's own routes on a worker thread, so it gets its own request
+# context, pooled connection, response-cache lookup and per-route metrics
+
+import time
+from concurrent.futures import wait
+from urllib.parse import parse_qsl, urlsplit
+
+# Routes a batch may not call: itself (no nesting) and anything administrative
+BLOCKED_PREFIXES = ('/api/batch', '/api/admin/')
+
+
+def _param_values(value):
+    """Query-string values for one JSON param; lists repeat the key"""
+    values = value if isinstance(value, list) else [value]
+    out = []
+    for item in values:
+        if item is None:
+            continue
+        if isinstance(item, bool):
+            out.append('true' if item else 'false')
+        elif isinstance(item, (str, int, float)):
+            out.append(str(item))
+        else:
+            raise ValueError('param values must be strings, numbers, booleans or lists of them')
+    return out
+
+
+def parse_batch(payload, max_requests):
+    """
+    Validate a batch body, {"requests": [{"id": ..., "route": ..., "params": {...}}, ...]}.
+    route may carry its own query string; params are added to it.
+    Returns [(id, path, [(key, value), ...])]; raises ValueError when malformed.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('requests'), list):
+        raise ValueError("body must be a JSON object with a 'requests' list")
+    items = payload['requests']
+    if not items:
+        raise ValueError('requests must not be empty')
+    if len(items) > max_requests:
+        raise ValueError(f'at most {max_requests} requests per batch')
+
+    parsed = []
+    for position, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('route'), str):
+            raise ValueError(f"requests[{position}] needs a 'route' string")
+        split = urlsplit(item['route'])
+        path = split.path
+        if not path.startswith('/api/') or path.startswith(BLOCKED_PREFIXES):
+            raise ValueError(f"requests[{position}]: '{path}' cannot be batched")
+        params = item.get('params') or {}
+        if not isinstance(params, dict):
+            raise ValueError(f"requests[{position}]: params must be an object")
+        query = parse_qsl(split.query, keep_blank_values=True)
+        try:
+            for key, value in params.items():
+                query.extend((key, v) for v in _param_values(value))
+        except ValueError as e:
+            raise ValueError(f'requests[{position}]: {e}')
+        # A streamed body would outlive the sub-request's context
+        if any(key == 'stream' for key, _ in query):
+            raise ValueError(f'requests[{position}]: streamed responses cannot be batched')
+        parsed.append((item.get('id', position), path, query))
+    return parsed
+
+
+def _dispatch(app, path, query, submitted):
+    """Run one GET sub-request through the full Flask stack; returns its outcome"""
+    started = time.perf_counter()
+    with app.test_request_context(path, method='GET', query_string=query):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            response = app.make_response(app.handle_exception(e))
+        body = response.get_data()
+        is_json = response.is_json
+    if is_json:
+        text = None
+    elif response.status_code >= 400:
+        # Werkzeug's HTML error pages reduce to their status line
+        text = response.status
+    else:
+        text = body.decode('utf-8', 'replace')
+    return {
+        'status': response.status_code,
+        'ms': round((time.perf_counter() - started) * 1000, 2),
+        'queued_ms': round((started - submitted) * 1000, 2),
+        'cache': response.headers.get('X-Cache'),
+        'body': body if is_json else None,
+        'text': text,
+    }
+
+
+def run_batch(app, executor, items, timeout=None):
+    """
+    Dispatch every parsed item concurrently on executor and wait for all of
+    them. Items still running after timeout get status 504. Returns one
+    outcome per item, in request order; 'body' holds the raw JSON bytes.
+    """
+    submitted = time.perf_counter()
+    futures = [executor.submit(_dispatch, app, path, query, submitted) for _, path, query in items]
+    _, not_done = wait(futures, timeout=timeout)
+
+    results = []
+    for (item_id, path, _), future in zip(items, futures):
+        if future in not_done:
+            future.cancel()
+            outcome = {'status': 504, 'ms': None, 'queued_ms': None, 'cache': None, 'body': None,
+                       'text': f'did not finish within {timeout}s'}
+        else:
+            outcome = future.result()
+        results.append(dict(outcome, id=item_id, route=path))
+    return results
+
+
+def _quoted(text):
+    """text as an HTTP quoted-string: printable ASCII only, with \\ and " escaped"""
+    text = ''.join(ch if ' ' <= ch <= '~' else '?' for ch in str(text))
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def server_timing(results):
+    """Server-Timing value with one entry per sub-request; the caller-supplied routes are quoted"""
+    return ', '.join(f"item{index};desc={_quoted(result['route'])};dur={result['ms'] or 0:.1f}"
+                     for index, result in enumerate(results))
+
+
+def render_batch(results, dumps, total_seconds):
+    """
+    The batch response body. Each sub-response's JSON is spliced in as-is
+    rather than parsed and encoded a second time.
+    """
+    parts = []
+    for result in results:
+        meta = {key: result[key] for key in ('id', 'route', 'status', 'ms', 'queued_ms', 'cache')}
+        if result['body'] is not None:
+            body = result['body'].decode('utf-8')
+        elif result['status'] >= 400:
+            body = dumps({'error': result['text']})
+        else:
+            body = dumps(result['text'])
+        parts.append(dumps(meta)[:-1] + ', "body": ' + body + '}')
+    return '{"total_ms": ' + f'{total_seconds * 1000:.2f}' + ', "results": [' + ', '.join(parts) + ']}'
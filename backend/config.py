@@ -1,6 +1,8 @@
 # config.py
 # Database configuration
 
+import os
+
 DB_CONFIG = {
     'host': 'group19-db.cwd78xnahkgd.us-east-1.rds.amazonaws.com',
     'database': 'group19_db',
@@ -12,3 +14,98 @@ DB_CONFIG = {
 # Server configuration
 SERVER_HOST = 'localhost'
 SERVER_PORT = 8080
+
+# Connection pool configuration
+# max_size should be at least the number of server threads handling requests
+POOL_CONFIG = {
+    'min_size': 2,
+    'max_size': 20,
+    'timeout': 5.0,       # seconds to wait for a free connection
+    'max_idle': 300.0,    # close connections idle longer than this (above min_size)
+    'ping_after': 30.0,   # ping connections idle longer than this before reuse
+    'reap_interval': 60.0  # seconds between background sweeps for idle connections (0 = only on checkin)
+}
+
+# In-memory audio feature store (used by the artist playlist route)
+FEATURE_STORE_CONFIG = {
+    'preload': True,      # load in the background when the server starts
+    'fetch_size': 20000   # rows per round trip while loading
+}
+
+# Response cache for read-only routes (writes are never cached)
+RESPONSE_CACHE_CONFIG = {
+    'max_entries': 2048,
+    'max_bytes': 64 * 1024 * 1024,   # total size of cached response bodies
+    'ttl': 600.0                     # seconds
+}
+
+# Trigram search index for /api/search/tracks and /api/artists?search=
+SEARCH_INDEX_CONFIG = {
+    'preload': True       # build in the background when the server starts
+}
+
+# Concurrent component queries for /api/playlist/mix
+# Each running component holds a pooled connection, so keep workers below POOL_CONFIG['max_size']
+MIX_CONFIG = {
+    'workers': 8,
+    'timeout': 15.0       # seconds to wait for all components of one mix
+}
+
+# /api/batch: sub-requests run side by side, each holding a pooled connection while it queries,
+# so keep workers (plus MIX_CONFIG['workers']) below POOL_CONFIG['max_size']
+BATCH_CONFIG = {
+    'workers': 8,
+    'max_requests': 20,
+    'timeout': 15.0       # seconds to wait for every sub-request of one batch
+}
+
+# Streaming (stream=ndjson|json) and keyset pagination (page_size/after) for list routes
+STREAMING_CONFIG = {
+    'fetch_size': 2000,           # rows per server-side cursor round trip while streaming
+    'max_page_size': 1000,
+    'max_buffered_limit': 5000    # larger limits must stream or paginate
+}
+
+# gzip/brotli for responses the client accepts them for (brotli only if the package is installed)
+COMPRESSION_CONFIG = {
+    'min_bytes': 1024,    # smaller bodies go out as they are
+    'gzip_level': 3,      # higher levels cost much more CPU for a few % smaller bodies (serialization_benchmark.py)
+    'brotli_quality': 4
+}
+
+# Server-side prepared statements for the route queries
+PREPARED_STATEMENTS_CONFIG = {
+    'enabled': True,
+    'plan_cache_mode': 'auto',    # or force_generic_plan / force_custom_plan (PostgreSQL 12+)
+    'explain_every': 200,         # EXPLAIN ANALYZE every Nth execution per statement, off the request thread (0 = never)
+    'max_per_connection': 64
+}
+
+# Slow-query log: statements slower than threshold_ms are written to directory,
+# and a sample of them re-run under EXPLAIN (ANALYZE, BUFFERS) for their plans
+SLOW_QUERY_CONFIG = {
+    'enabled': True,
+    'threshold_ms': 250,
+    'explain_sample_rate': 0.2,   # fraction of slow SELECTs that get a captured plan
+    'directory': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'slow_queries'),
+    'max_file_bytes': 5 * 1024 * 1024,   # rotate the log file at this size
+    'max_files': 5,                      # rotated files kept
+    'memory_entries': 500,               # most recent entries browsable through the admin endpoint
+    'log_params': 'select'               # bound parameters kept for: 'select' statements only, 'all' or 'none'
+}
+
+# /api/admin/* routes need this token in an X-Admin-Token header; with none set they are refused
+ADMIN_CONFIG = {
+    'token': os.environ.get('ADMIN_TOKEN')
+}
+
+# Track radio: IVF index over the z-scored audio features, trained offline with
+# track_radio.py and loaded with the feature store (trained in memory if the file is missing)
+RADIO_INDEX_CONFIG = {
+    'path': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'radio_index.npz'),
+    'n_lists': None,      # lists when training in memory (default about 4 * sqrt(tracks))
+    'n_probe': 8,         # lists searched per request unless n_probe= is given; more = better recall
+    'max_n_probe': 256,
+    'max_k': 200,
+    'max_seeds': 20
+}
@@ -0,0 +1,265 @@
+# db_pool.py
+# Thread-safe PostgreSQL connection pool used by every route in app.py
+
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolError(Exception):
+    """Raised when a connection cannot be checked out of the pool"""
+
+
+class PoolTimeout(PoolError):
+    """Raised when no connection became free within the checkout timeout"""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of psycopg2 connections.
+
+    Connections are opened lazily up to max_size (prefill() opens min_size up
+    front), pinged on checkout when they have been idle longer than ping_after
+    seconds, and closed again once they sit idle longer than max_idle seconds
+    (never dropping below min_size). Reaping runs on every checkin and, so
+    that a quiet server lets go of its connections too, on a background
+    thread every reap_interval seconds (0 disables the thread).
+    """
+
+    def __init__(self, dsn_kwargs, min_size=1, max_size=10, timeout=5.0,
+                 max_idle=300.0, ping_after=30.0, reap_interval=60.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('pool sizes must satisfy 0 <= min_size <= max_size, max_size >= 1')
+
+        self.dsn_kwargs = dict(dsn_kwargs)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.ping_after = ping_after
+        self.reap_interval = reap_interval
+
+        self._lock = threading.Condition()
+        self._idle = []          # list of (conn, last_used) - most recent at the end
+        self._in_use = set()
+        self._opening = 0
+        self._waiters = 0
+        self._closed = False
+
+        # Counters exposed through stats()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._reaped = 0
+        self._failed_pings = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        self._stop = threading.Event()
+        self._reaper = None
+        if reap_interval > 0:
+            self._reaper = threading.Thread(target=self._reap_periodically, name='pool-reaper', daemon=True)
+            self._reaper.start()
+
+    # ---- connection lifecycle -------------------------------------------
+
+    def _connect(self):
+        return psycopg2.connect(**self.dsn_kwargs)
+
+    def _is_alive(self, conn):
+        """Cheap liveness check - a round trip with SELECT 1"""
+        if conn.closed:
+            return False
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    # ---- checkout / checkin ---------------------------------------------
+
+    def getconn(self, timeout=None):
+        """Check a connection out of the pool, waiting up to timeout seconds"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            conn, idle_since, must_open = None, None, False
+
+            with self._lock:
+                self._waiters += 1
+                try:
+                    while True:
+                        if self._closed:
+                            raise PoolError('Connection pool is closed')
+                        if self._idle:
+                            conn, idle_since = self._idle.pop()
+                            break
+                        if len(self._in_use) + self._opening < self.max_size:
+                            self._opening += 1
+                            must_open = True
+                            break
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeout(
+                                f'No database connection available after {timeout:.1f}s '
+                                f'({len(self._in_use)} in use, max_size={self.max_size})'
+                            )
+                        self._lock.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
+            if must_open:
+                try:
+                    conn = self._connect()
+                except Exception as e:
+                    with self._lock:
+                        self._opening -= 1
+                        self._lock.notify()
+                    raise PoolError(str(e).strip()) from e
+                with self._lock:
+                    self._opening -= 1
+                    self._created += 1
+            elif time.monotonic() - idle_since > self.ping_after and not self._is_alive(conn):
+                # Stale connection (RDS restart, idle timeout...) - drop it and retry
+                self._close_quietly(conn)
+                with self._lock:
+                    self._failed_pings += 1
+                    self._discarded += 1
+                    self._lock.notify()
+                continue
+
+            waited = time.monotonic() - started
+            with self._lock:
+                self._in_use.add(conn)
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, rolling back any open transaction"""
+        if not discard and not conn.closed:
+            try:
+                status = conn.get_transaction_status()
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    discard = True
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._lock:
+            self._in_use.discard(conn)
+            if discard or conn.closed or self._closed:
+                self._discarded += 1
+                self._close_quietly(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._reap_locked()
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager that always hands the connection back, even on errors"""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        except BaseException:
+            self.putconn(conn, discard=conn.closed)
+            raise
+        else:
+            self.putconn(conn)
+
+    # ---- maintenance ----------------------------------------------------
+
+    def _reap_locked(self):
+        """Close connections idle for longer than max_idle, keeping min_size open"""
+        if not self._idle:
+            return
+        now = time.monotonic()
+        total = len(self._idle) + len(self._in_use)
+        keep = []
+        # Oldest connections sit at the front of the idle list
+        for conn, last_used in self._idle:
+            if total > self.min_size and now - last_used > self.max_idle:
+                self._close_quietly(conn)
+                self._reaped += 1
+                total -= 1
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+
+    def reap(self):
+        """Run idle reaping now (it also runs on every checkin and on the reaper thread)"""
+        with self._lock:
+            self._reap_locked()
+
+    def _reap_periodically(self):
+        while not self._stop.wait(self.reap_interval):
+            self.reap()
+
+    def prefill(self):
+        """Open connections until min_size are available"""
+        while True:
+            with self._lock:
+                if len(self._idle) + len(self._in_use) + self._opening >= self.min_size:
+                    return
+                self._opening += 1
+            try:
+                conn = self._connect()
+            finally:
+                with self._lock:
+                    self._opening -= 1
+            with self._lock:
+                self._created += 1
+                self._idle.append((conn, time.monotonic()))
+                self._lock.notify()
+
+    def close(self):
+        """Close all idle connections and refuse further checkouts"""
+        self._stop.set()
+        with self._lock:
+            self._closed = True
+            for conn, _ in self._idle:
+                self._close_quietly(conn)
+            self._idle = []
+            self._lock.notify_all()
+
+    def stats(self):
+        """Snapshot of pool usage, for sizing min/max against the server thread count"""
+        with self._lock:
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'opening': self._opening,
+                'waiters': self._waiters,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'discarded': self._discarded,
+                'reaped': self._reaped,
+                'failed_pings': self._failed_pings,
+                'wait_time_total_s': round(self._wait_total, 6),
+                'wait_time_avg_ms': round(1000 * self._wait_total / self._checkouts, 3) if self._checkouts else 0.0,
+                'wait_time_max_ms': round(1000 * self._wait_max, 3),
+            }
@@ -0,0 +1,265 @@
+# feature_store.py
+# In-memory copy of the audio_features table as a contiguous float32 matrix
+
+import threading
+import time
+
+import numpy as np
+
+# Column order of the feature matrix - matches the audio_features table
+FEATURE_COLUMNS = ['tempo', 'danceability', 'energy', 'loudness', 'valence',
+                   'acousticness', 'speechiness', 'instrumentalness', 'liveness']
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+
+# One row per track, sorted by artist_id so each artist owns a contiguous row range.
+# Tracks only carry one genre in the ETL output; DISTINCT ON keeps the lowest genre_id
+# in case a reload ever links more than one.
+LOAD_QUERY = """
+SELECT
+    t.spotify_id,
+    t.track_name,
+    t.artist_id,
+    a.artist_name,
+    COALESCE(t.popularity, 0) AS popularity,
+    COALESCE(t.duration_ms, 0) AS duration_ms,
+    tg.genre_id,
+    af.tempo, af.danceability, af.energy, af.loudness, af.valence,
+    af.acousticness, af.speechiness, af.instrumentalness, af.liveness
+FROM tracks t
+JOIN artists a ON t.artist_id = a.artist_id
+JOIN audio_features af ON t.spotify_id = af.spotify_id
+LEFT JOIN (
+    SELECT DISTINCT ON (spotify_id) spotify_id, genre_id
+    FROM track_genres
+    ORDER BY spotify_id, genre_id
+) tg ON t.spotify_id = tg.spotify_id
+ORDER BY t.artist_id, t.spotify_id;
+"""
+
+GENRE_QUERY = "SELECT genre_id, genre_name FROM genres;"
+
+
+def to_json_float(value):
+    """float32 -> Python float using the shortest repr, like Postgres prints REAL"""
+    return float(str(value))
+
+
+class FeatureData:
+    """Immutable snapshot of the track/feature arrays built by FeatureStore.load()"""
+
+    def __init__(self, rows, genre_names):
+        n = len(rows)
+        self.size = n
+        self.spotify_ids = np.array([r[0] for r in rows], dtype=object)
+        self.track_names = np.array([r[1] for r in rows], dtype=object)
+        self.artist_ids = np.fromiter((r[2] for r in rows), dtype=np.int32, count=n)
+        self.popularity = np.fromiter((r[4] for r in rows), dtype=np.int16, count=n)
+        self.duration_ms = np.fromiter((r[5] for r in rows), dtype=np.int32, count=n)
+
+        # Genre codes index into self.genre_names; -1 means no genre
+        genre_ids = sorted(genre_names)
+        self.genre_names = [genre_names[gid] for gid in genre_ids]
+        code_of = {gid: code for code, gid in enumerate(genre_ids)}
+        self.genre_codes = np.fromiter((code_of.get(r[6], -1) for r in rows),
+                                       dtype=np.int16, count=n)
+        self.genre_code_of = {name: code for code, name in enumerate(self.genre_names)}
+
+        # n x 9 float32, C-contiguous so each column slice is a strided view
+        self.features = np.ascontiguousarray(
+            np.array([r[7:16] for r in rows], dtype=np.float32).reshape(n, len(FEATURE_COLUMNS))
+        )
+
+        # Per-artist row ranges (rows are sorted by artist_id)
+        self.artist_names = {}
+        self.artist_ranges = {}
+        self.artist_rows_by_name = {}
+        if n:
+            boundaries = np.flatnonzero(np.diff(self.artist_ids)) + 1
+            starts = np.concatenate(([0], boundaries))
+            ends = np.concatenate((boundaries, [n]))
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                artist_id = int(self.artist_ids[start])
+                name = rows[start][3]
+                self.artist_names[artist_id] = name
+                self.artist_ranges[artist_id] = (start, end)
+                self.artist_rows_by_name.setdefault(name, []).append((start, end))
+
+        self.row_of = {sid: i for i, sid in enumerate(self.spotify_ids.tolist())}
+
+    def column(self, name):
+        """View of one feature column"""
+        return self.features[:, FEATURE_INDEX[name]]
+
+    def artist_rows(self, artist_name):
+        """Row indices of every track by artists with this exact name"""
+        ranges = self.artist_rows_by_name.get(artist_name)
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(start, end) for start, end in ranges])
+
+    def genre_name(self, row):
+        code = self.genre_codes[row]
+        return self.genre_names[code] if code >= 0 else None
+
+    def top_k(self, rows, k, *sort_keys):
+        """
+        Pick the k best rows, ordering by the given keys (descending).
+        Partitioning on the first key keeps this O(n) for small k.
+        """
+        if k <= 0 or len(rows) == 0:
+            return rows[:0]
+        primary = sort_keys[0][rows]
+        if len(rows) > k:
+            # Keep every row tied with the k-th value so secondary keys can break ties
+            kth = np.partition(-primary, k - 1)[k - 1]
+            rows = rows[-primary <= kth]
+        order = np.lexsort(tuple(-key[rows] for key in reversed(sort_keys)))
+        return rows[order[:k]]
+
+
+class FeatureStore:
+    """Holds the current FeatureData snapshot; readers fall back to SQL while it is cold"""
+
+    def __init__(self, fetch_size=20000):
+        self.fetch_size = fetch_size
+        self.data = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.last_error = None
+        self._load_lock = threading.Lock()
+        self._listeners = []
+
+    @property
+    def ready(self):
+        return self.data is not None
+
+    def on_load(self, callback):
+        """Register callback(data) to rebuild derived indexes after every load"""
+        self._listeners.append(callback)
+
+    def load(self, pool):
+        """(Re)build the snapshot from the database and swap it in atomically"""
+        with self._load_lock:
+            started = time.perf_counter()
+            with pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(GENRE_QUERY)
+                genre_names = dict(cursor.fetchall())
+                cursor.close()
+
+                # Named (server-side) cursor so the result streams in fetch_size batches
+                cursor = conn.cursor(name='feature_store_load')
+                cursor.itersize = self.fetch_size
+                cursor.execute(LOAD_QUERY)
+                rows = []
+                while True:
+                    batch = cursor.fetchmany(self.fetch_size)
+                    if not batch:
+                        break
+                    rows.extend(batch)
+                cursor.close()
+                conn.commit()
+
+            data = FeatureData(rows, genre_names)
+            del rows
+            # Derived indexes are built before the swap so readers never see a mix
+            for callback in self._listeners:
+                callback(data)
+            self.data = data
+            self.loaded_at = time.time()
+            self.load_seconds = time.perf_counter() - started
+            self.last_error = None
+            return data
+
+    def load_async(self, pool):
+        """Load in a daemon thread so the server can start answering (via SQL) right away"""
+        def run():
+            try:
+                self.load(pool)
+                print(f"Feature store loaded {self.data.size} tracks in {self.load_seconds:.2f}s")
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Feature store load failed: {e}")
+
+        thread = threading.Thread(target=run, name='feature-store-load', daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        data = self.data
+        return {
+            'ready': data is not None,
+            'tracks': data.size if data is not None else 0,
+            'artists': len(data.artist_ranges) if data is not None else 0,
+            'loaded_at': self.loaded_at,
+            'load_seconds': round(self.load_seconds, 3) if self.load_seconds else None,
+            'matrix_bytes': int(data.features.nbytes) if data is not None else 0,
+            'last_error': self.last_error,
+        }
+
+
+def playlist_by_artist(data, artist_name, limit, tempo_window=20.0, feature_window=0.2):
+    """
+    In-memory version of Route 1: tracks by other artists whose tempo, danceability
+    and energy fall within a window around the favourite artist's averages.
+    Returns a list of result dicts shaped like the SQL route.
+    """
+    own_rows = data.artist_rows(artist_name)
+    if len(own_rows) == 0:
+        # Same as SQL: the profile CTE is all NULLs so nothing matches
+        return []
+
+    tempo = data.column('tempo')
+    danceability = data.column('danceability')
+    energy = data.column('energy')
+
+    profile = data.features[own_rows].mean(axis=0, dtype=np.float64)
+    avg_tempo = profile[FEATURE_INDEX['tempo']]
+    avg_danceability = profile[FEATURE_INDEX['danceability']]
+    avg_energy = profile[FEATURE_INDEX['energy']]
+
+    mask = (np.abs(tempo - avg_tempo) <= tempo_window)
+    mask &= (np.abs(danceability - avg_danceability) <= feature_window)
+    mask &= (np.abs(energy - avg_energy) <= feature_window)
+    for start, end in data.artist_rows_by_name[artist_name]:
+        mask[start:end] = False
+
+    rows = data.top_k(np.flatnonzero(mask), limit, data.popularity)
+    return [
+        {
+            'track_name': data.track_names[i],
+            'artist_name': data.artist_names[int(data.artist_ids[i])],
+            'genre_name': data.genre_name(i),
+            'tempo': to_json_float(tempo[i]),
+            'danceability': to_json_float(danceability[i]),
+            'energy': to_json_float(energy[i]),
+            'popularity': int(data.popularity[i]),
+        }
+        for i in rows.tolist()
+    ]
+
+
+def playlist_stats(data, spotify_ids):
+    """
+    In-memory version of the playlist stats query: summary of the distinct
+    tracks among spotify_ids that have audio features. Unknown ids are ignored,
+    just as the SQL join drops them.
+    """
+    rows = sorted({data.row_of[sid] for sid in spotify_ids if sid in data.row_of})
+    if not rows:
+        return {
+            'total_tracks': 0, 'unique_artists': 0, 'avg_tempo': None, 'avg_energy': None,
+            'avg_danceability': None, 'avg_valence': None, 'avg_duration_minutes': None,
+        }
+    rows = np.array(rows, dtype=np.int64)
+    means = data.features[rows].mean(axis=0, dtype=np.float64)
+    artist_names = {data.artist_names[int(artist_id)] for artist_id in np.unique(data.artist_ids[rows])}
+    return {
+        'total_tracks': len(rows),
+        'unique_artists': len(artist_names),
+        'avg_tempo': round(float(means[FEATURE_INDEX['tempo']]), 2),
+        'avg_energy': round(float(means[FEATURE_INDEX['energy']]), 2),
+        'avg_danceability': round(float(means[FEATURE_INDEX['danceability']]), 2),
+        'avg_valence': round(float(means[FEATURE_INDEX['valence']]), 2),
+        'avg_duration_minutes': round(float(data.duration_ms[rows].mean(dtype=np.float64)) / 60000.0, 2),
+    }
@@ -0,0 +1,584 @@
+# index_advisor.py
+# Replays the route queries of app.py against a database, proposes composite,
+# covering (INCLUDE) and partial indexes from their plans, measures each
+# candidate, and writes the best set as a migration.
+#
+#   python3 index_advisor.py --dsn "dbname=bench" --samples 300 \
+#       --output-sql index_migration.sql --report index_advisor.json
+#
+# 1. Workload: the routes are called in-process through Flask's test client,
+#    with parameters drawn like load_test.py (same route weights), and every
+#    SELECT they run is captured with its bound parameters.
+# 2. Baseline: each distinct query is timed with EXPLAIN (ANALYZE, VERBOSE)
+#    over a sample of its parameter sets; the plans show which columns every
+#    table access filters, joins and sorts on.
+# 3. Candidates: equality-then-range composites, sort-order composites,
+#    covering versions that INCLUDE the other filtered/returned columns, and
+#    partial indexes for predicates whose constant never changes. Indexes the
+#    schema already has are skipped. With the hypopg extension installed the
+#    candidates are screened by planner cost first.
+# 4. Trials: each remaining candidate is really built inside a transaction,
+#    the queries on its table are re-timed, and the transaction is rolled
+#    back. The final set is picked greedily by latency saved per MB, then
+#    built together once more to confirm the combined gain.
+#
+# Trials take locks and build real indexes: run it against a benchmark copy
+# (e.g. synthetic data from synth_data.py), not production.
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import statistics
+import time
+from datetime import datetime
+
+import psycopg2
+from psycopg2.extensions import parse_dsn
+
+# Comparison operators in plan conditions, and how they read in SQL
+EQUALITY_OPS = {'='}
+RANGE_OPS = {'>', '>=', '<', '<='}
+_CONDITION = re.compile(
+    r"(?:(\w+)\.)?(\w+)\s*(=|<>|>=|<=|>|<)\s*"
+    r"(ANY\s*\((?:[^()]|\([^()]*\))*\)|'(?:[^']|'')*'(?:::[a-z ]+(?:\[\])?)?|[\w.$-]+(?:::[a-z ]+)?)"
+)
+_QUALIFIED = re.compile(r'^\w+\.\w+$')
+_SORT_KEY = re.compile(r'^(?:(\w+)\.)?(\w+)(?:\s+(DESC|ASC))?(?:\s+NULLS\s+(?:FIRST|LAST))?$')
+
+MAX_INCLUDE_COLUMNS = 6
+
+
+class Query:
+    """One distinct route query with the parameter sets it was called with"""
+
+    def __init__(self, text):
+        self.text = text
+        self.routes = set()
+        self.executions = 0
+        self.param_sets = []
+        self.baseline_ms = None
+        self.accesses = {}
+
+    def add(self, route, params, keep, rng):
+        self.routes.add(route)
+        self.executions += 1
+        # Reservoir sample of the parameter sets
+        if len(self.param_sets) < keep:
+            self.param_sets.append(params)
+        else:
+            slot = rng.randrange(self.executions)
+            if slot < keep:
+                self.param_sets[slot] = params
+
+    def to_dict(self):
+        return {
+            'routes': sorted(self.routes),
+            'executions': self.executions,
+            'baseline_ms': _round(self.baseline_ms),
+            'query': ' '.join(self.text.split()),
+        }
+
+
+class Access:
+    """How one query touches one table, merged over all of its sampled plans"""
+
+    def __init__(self, table):
+        self.table = table
+        self.equality = []
+        self.ranges = []
+        self.sort = []
+        self.output = []
+        self.constants = {}     # (column, op) -> set of constant values seen
+        self.samples = 0
+
+    def note(self, target, column):
+        if column not in target:
+            target.append(column)
+
+
+class Candidate:
+    def __init__(self, table, columns, include=(), predicate=None, kind='composite'):
+        self.table = table
+        self.columns = tuple(columns)
+        keys = {column.split()[0] for column in columns}
+        self.include = tuple(c for c in dict.fromkeys(include) if c not in keys)
+        self.predicate = predicate
+        self.kind = kind
+        self.queries = set()
+        self.estimated_gain = None
+        self.trial = None
+
+    @property
+    def key(self):
+        return self.table, self.columns, self.include, self.predicate
+
+    @property
+    def name(self):
+        bare = [column.split()[0] for column in self.columns]
+        name = f"idx_adv_{self.table}_{'_'.join(bare)}"
+        if self.include:
+            name += '_cov'
+        if self.predicate:
+            name += '_part'
+        if len(name) > 55 or self.predicate:
+            digest = hashlib.sha1(repr(self.key).encode()).hexdigest()[:6]
+            name = f'{name[:55]}_{digest}'
+        return name
+
+    def ddl(self, concurrently=False):
+        sql = f"CREATE INDEX {'CONCURRENTLY IF NOT EXISTS ' if concurrently else ''}{self.name} " \
+              f"ON {self.table} ({', '.join(self.columns)})"
+        if self.include:
+            sql += f" INCLUDE ({', '.join(self.include)})"
+        if self.predicate:
+            sql += f' WHERE {self.predicate}'
+        return sql
+
+
+def _round(value, digits=3):
+    return round(value, digits) if value is not None else None
+
+
+# ---- 1. workload capture ------------------------------------------------
+
+def capture_workload(dsn, samples, keep, seed):
+    """Call the routes in-process and collect {query text: Query}"""
+    import config
+    config.DB_CONFIG.clear()
+    config.DB_CONFIG.update(parse_dsn(dsn))
+    config.SLOW_QUERY_CONFIG['enabled'] = False
+    config.PREPARED_STATEMENTS_CONFIG['explain_every'] = 0
+
+    import app as api
+    import load_test
+    import metrics
+
+    client = api.app.test_client()
+    genres = [row['genre_name'] for row in client.get('/api/genres').get_json()]
+    artists, track_ids = set(), set()
+    for term in load_test.SEARCH_TERMS:
+        artists.update(row['artist_name'] for row in client.get('/api/artists', query_string={'search': term}).get_json())
+        track_ids.update(row['spotify_id'] for row in
+                         client.get('/api/search/tracks', query_string={'query': term, 'limit': 200}).get_json())
+    if not genres or not artists or not track_ids:
+        raise SystemExit('The database has no genres, artists or tracks to draw parameters from')
+    target = load_test.Target(genres, sorted(artists), sorted(track_ids))
+
+    rng = random.Random(seed)
+    workload = {}
+    current = {'route': None}
+
+    def capture(cursor, query, params, seconds):
+        if isinstance(query, bytes):
+            query = query.decode()
+        if query.startswith('EXECUTE '):
+            query = api.statements.source(query)
+            if query is None:
+                return
+        if current['route'] is None or not query.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return
+        entry = workload.get(query)
+        if entry is None:
+            entry = workload[query] = Query(query)
+        entry.add(current['route'], list(params) if params is not None else None, keep, rng)
+
+    metrics.set_query_observer(capture)
+    routes = [route for route, _, _ in load_test.READ_SCENARIOS]
+    weights = [weight for _, weight, _ in load_test.READ_SCENARIOS]
+    builders = {route: build for route, _, build in load_test.READ_SCENARIOS}
+    failures = 0
+    try:
+        for _ in range(samples):
+            route = rng.choices(routes, weights)[0]
+            method, path, body = builders[route](target, rng)
+            api.response_cache.clear()
+            current['route'] = route
+            response = client.open(path, method=method, json=body)
+            current['route'] = None
+            if response.status_code >= 500:
+                failures += 1
+    finally:
+        metrics.set_query_observer(None)
+        api.mix_executor.shutdown()
+        api.db_pool.close()
+    return workload, failures
+
+
+# ---- 2. plans -----------------------------------------------------------
+
+def explain(cursor, query, params, analyze=True):
+    options = 'ANALYZE, BUFFERS, VERBOSE, FORMAT JSON' if analyze else 'VERBOSE, FORMAT JSON'
+    cursor.execute(f'EXPLAIN ({options}) {query}', params)
+    plan = cursor.fetchone()[0]
+    return json.loads(plan)[0] if isinstance(plan, str) else plan[0]
+
+
+def time_query(cursor, query, param_sets, repeats):
+    """Mean over param_sets of the median planning + execution time (ms), and the last plans"""
+    per_set, plans = [], []
+    for params in param_sets:
+        explain(cursor, query, params)      # warm the cache
+        runs = []
+        for _ in range(repeats):
+            plan = explain(cursor, query, params)
+            runs.append(plan.get('Planning Time', 0.0) + plan.get('Execution Time', 0.0))
+        per_set.append(statistics.median(runs))
+        plans.append(plan)
+    return statistics.mean(per_set), plans
+
+
+def plan_cost(cursor, query, param_sets):
+    return statistics.mean(explain(cursor, query, params, analyze=False)['Plan']['Total Cost']
+                           for params in param_sets)
+
+
+def _walk(node, parents=()):
+    yield node, parents
+    for child in node.get('Plans', []):
+        yield from _walk(child, parents + (node,))
+
+
+def _conditions(node):
+    for field in ('Index Cond', 'Filter', 'Recheck Cond'):
+        text = node.get(field)
+        if text:
+            yield from _CONDITION.finditer(text)
+
+
+def record_accesses(query, plans, columns_of):
+    """Fill query.accesses from its plans: filtered, joined, sorted and returned columns per table"""
+    for plan in plans:
+        aliases = {}
+        for node, _ in _walk(plan['Plan']):
+            if 'Relation Name' in node:
+                aliases[node.get('Alias', node['Relation Name'])] = node['Relation Name']
+        for node, parents in _walk(plan['Plan']):
+            table = node.get('Relation Name')
+            if table is None or table not in columns_of:
+                continue
+            alias = node.get('Alias', table)
+            access = query.accesses.get(table)
+            if access is None:
+                access = query.accesses[table] = Access(table)
+            access.samples += 1
+            for match in _conditions(node):
+                qualifier, column, op, value = match.groups()
+                if (qualifier and qualifier != alias) or column not in columns_of[table]:
+                    continue
+                value = value.strip()
+                if op in EQUALITY_OPS:
+                    access.note(access.equality, column)
+                elif op in RANGE_OPS:
+                    access.note(access.ranges, column)
+                else:
+                    continue
+                if not _QUALIFIED.match(value) and not value.startswith('ANY'):
+                    access.constants.setdefault((column, op), set()).add(value)
+            for output in node.get('Output', []):
+                column = output.split('.')[-1]
+                if output.startswith(f'{alias}.') and column in columns_of[table]:
+                    access.note(access.output, column)
+            # A Sort above this scan whose keys all belong to it could be served by an index
+            for parent in reversed(parents):
+                if parent.get('Node Type') not in ('Sort', 'Incremental Sort'):
+                    continue
+                keys = [_SORT_KEY.match(key.strip()) for key in parent.get('Sort Key', [])]
+                if keys and all(k and (k.group(1) or alias) == alias and k.group(2) in columns_of[table]
+                                for k in keys):
+                    for k in keys:
+                        access.note(access.sort, f'{k.group(2)} DESC' if k.group(3) == 'DESC' else k.group(2))
+                break
+
+
+# ---- 3. candidates ------------------------------------------------------
+
+def existing_indexes(cursor):
+    """{table: [(key columns, include columns, predicate or None)]}"""
+    cursor.execute("""
+        SELECT t.relname,
+               array(SELECT a.attname FROM unnest(ix.indkey[:ix.indnkeyatts - 1]) WITH ORDINALITY k(attnum, n)
+                     JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum ORDER BY k.n),
+               array(SELECT a.attname FROM unnest(ix.indkey[ix.indnkeyatts:]) WITH ORDINALITY k(attnum, n)
+                     JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum ORDER BY k.n),
+               pg_get_expr(ix.indpred, ix.indrelid)
+        FROM pg_index ix
+        JOIN pg_class t ON t.oid = ix.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        WHERE n.nspname = 'public';
+    """)
+    indexes = {}
+    for table, keys, include, predicate in cursor.fetchall():
+        indexes.setdefault(table, []).append((list(keys), list(include), predicate))
+    return indexes
+
+
+def table_columns(cursor):
+    cursor.execute("""
+        SELECT table_name, array_agg(column_name::text)
+        FROM information_schema.columns
+        WHERE table_schema = 'public'
+        GROUP BY table_name;
+    """)
+    return {table: set(columns) for table, columns in cursor.fetchall()}
+
+
+def _covered(candidate, existing):
+    """True when an existing index already has these leading key columns (and covers the INCLUDE part)"""
+    keys = [column.split()[0] for column in candidate.columns]
+    for index_keys, index_include, predicate in existing.get(candidate.table, []):
+        if predicate is not None and predicate != candidate.predicate:
+            continue
+        if index_keys[:len(keys)] == keys and set(candidate.include) <= set(index_keys + index_include) \
+                and (candidate.predicate is None or predicate == candidate.predicate):
+            return True
+    return False
+
+
+def generate_candidates(workload, existing):
+    candidates = {}
+
+    def add(query, candidate):
+        if not candidate.columns or _covered(candidate, existing):
+            return
+        candidate = candidates.setdefault(candidate.key, candidate)
+        candidate.queries.add(query.text)
+
+    for query in workload.values():
+        for access in query.accesses.values():
+            equality = list(access.equality)
+            # Predicates with the same constant in every sampled run can become a partial index
+            fixed = [(column, op, next(iter(values))) for (column, op), values in sorted(access.constants.items())
+                     if len(values) == 1 and access.samples >= 3]
+            fixed_columns = {column for column, _, _ in fixed}
+            varying = [column for column in access.ranges if column not in fixed_columns]
+            filtered = equality + [column for column in access.ranges if column not in equality]
+
+            for column in access.ranges:
+                keys = equality + [column]
+                add(query, Candidate(access.table, keys, kind='composite'))
+                others = [c for c in filtered + access.output if c not in keys]
+                if others and len(others) <= MAX_INCLUDE_COLUMNS:
+                    add(query, Candidate(access.table, keys, include=others, kind='covering'))
+            if access.sort:
+                sort_keys = [c for c in equality if c not in access.sort] + access.sort
+                add(query, Candidate(access.table, sort_keys, kind='sort'))
+                others = [c for c in filtered + access.output if c not in {k.split()[0] for k in sort_keys}]
+                if others and len(others) <= MAX_INCLUDE_COLUMNS:
+                    add(query, Candidate(access.table, sort_keys, include=others, kind='covering'))
+            if fixed:
+                predicate = ' AND '.join(f'{column} {op} {value}' for column, op, value in fixed)
+                keys = equality + varying or access.sort or [fixed[0][0]]
+                add(query, Candidate(access.table, keys, predicate=predicate, kind='partial'))
+            if len(equality) > 1 and not access.ranges:
+                add(query, Candidate(access.table, equality, kind='composite'))
+    return list(candidates.values())
+
+
+def screen_with_hypopg(cursor, candidates, workload, keep):
+    """Planner-cost gain of each candidate as a hypothetical index; None if hypopg is unavailable"""
+    try:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS hypopg;')
+        cursor.connection.commit()
+    except psycopg2.Error:
+        cursor.connection.rollback()
+        return None
+    base_costs = {text: plan_cost(cursor, text, workload[text].param_sets) for text in
+                  {q for c in candidates for q in c.queries}}
+    for candidate in candidates:
+        cursor.execute('SELECT * FROM hypopg_create_index(%s);', (candidate.ddl(),))
+        gain = 0.0
+        for text in candidate.queries:
+            cost = plan_cost(cursor, text, workload[text].param_sets)
+            gain += workload[text].executions * max(0.0, base_costs[text] - cost) / max(base_costs[text], 1e-9)
+        candidate.estimated_gain = gain
+        cursor.execute('SELECT hypopg_reset();')
+    cursor.connection.commit()
+    return sorted(candidates, key=lambda c: -c.estimated_gain)[:keep]
+
+
+# ---- 4. trials ----------------------------------------------------------
+
+def trial(conn, candidates, workload, queries, repeats):
+    """Build candidates in a transaction, time queries, roll back; returns (build s, size bytes, {query: ms})"""
+    cursor = conn.cursor()
+    try:
+        started = time.perf_counter()
+        for candidate in candidates:
+            cursor.execute(candidate.ddl())
+        build_seconds = time.perf_counter() - started
+        size = 0
+        for candidate in candidates:
+            cursor.execute('SELECT pg_relation_size(%s::regclass);', (candidate.name,))
+            size += cursor.fetchone()[0]
+        cursor.execute(f"ANALYZE {', '.join(sorted({c.table for c in candidates}))};")
+        latencies, used = {}, set()
+        for text in queries:
+            latency, plans = time_query(cursor, text, workload[text].param_sets, repeats)
+            latencies[text] = latency
+            for plan in plans:
+                for node, _ in _walk(plan['Plan']):
+                    if node.get('Index Name') in {c.name for c in candidates}:
+                        used.add(node['Index Name'])
+        return build_seconds, size, latencies, used
+    finally:
+        cursor.close()
+        conn.rollback()
+
+
+def select(candidates, workload, min_gain, max_indexes, max_storage_mb):
+    """Greedy pick by weighted latency saved per MB, given the indexes picked before"""
+    best = {text: query.baseline_ms for text, query in workload.items()}
+    chosen, storage = [], 0.0
+    pool = [c for c in candidates if c.trial and c.trial['used']]
+    while pool and len(chosen) < max_indexes:
+        def marginal(candidate):
+            return sum(workload[text].executions * max(0.0, best[text] - ms)
+                       for text, ms in candidate.trial['latency_ms'].items())
+        scored = [(marginal(c) / (c.trial['size_mb'] + 1.0), marginal(c), c) for c in pool]
+        score, gain, candidate = max(scored, key=lambda item: item[0])
+        if gain < min_gain or (max_storage_mb is not None and storage + candidate.trial['size_mb'] > max_storage_mb):
+            break
+        chosen.append(candidate)
+        storage += candidate.trial['size_mb']
+        for text, ms in candidate.trial['latency_ms'].items():
+            best[text] = min(best[text], ms)
+        pool.remove(candidate)
+    return chosen
+
+
+def write_migration(path, chosen, final, generated_at):
+    lines = [
+        '-- Index migration generated by backend/index_advisor.py',
+        f'-- {generated_at}',
+        f"-- Weighted workload latency: {final['baseline_total_ms']:.1f} ms -> {final['with_indexes_total_ms']:.1f} ms "
+        f"({final['improvement_pct']:.1f}% faster), {final['size_mb']:.1f} MB of new indexes",
+        '-- CONCURRENTLY cannot run inside a transaction: apply with psql -f, without --single-transaction',
+        '',
+    ]
+    for candidate in chosen:
+        t = candidate.trial
+        lines.append(f'-- {candidate.kind}: {t["size_mb"]:.1f} MB, built in {t["build_seconds"]:.1f}s; '
+                     f'serves {", ".join(sorted(t["routes"]))}')
+        lines.append(candidate.ddl(concurrently=True) + ';')
+        lines.append('')
+    lines.append(f"ANALYZE {', '.join(sorted({c.table for c in chosen}))};" if chosen else '-- Nothing to apply')
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def run(args):
+    print(f"Capturing the route workload ({args.samples} requests) ...")
+    workload, failures = capture_workload(args.dsn, args.samples, args.params_per_query, args.seed)
+    print(f"  {len(workload)} distinct queries, {sum(q.executions for q in workload.values())} executions, "
+          f"{failures} failed requests")
+
+    conn = psycopg2.connect(args.dsn)
+    cursor = conn.cursor()
+    columns_of = table_columns(cursor)
+    existing = existing_indexes(cursor)
+    conn.rollback()
+
+    print("Timing the baseline ...")
+    for query in workload.values():
+        query.baseline_ms, plans = time_query(cursor, query.text, query.param_sets, args.repeats)
+        record_accesses(query, plans, columns_of)
+    conn.rollback()
+    baseline_total = sum(q.executions * q.baseline_ms for q in workload.values())
+
+    candidates = generate_candidates(workload, existing)
+    print(f"  {len(candidates)} candidate indexes")
+    screened = screen_with_hypopg(cursor, candidates, workload, args.max_trials)
+    if screened is None:
+        print("  hypopg not available - trial-building the candidates on the slowest queries first")
+        screened = sorted(candidates, key=lambda c: -sum(workload[q].executions * workload[q].baseline_ms
+                                                          for q in c.queries))[:args.max_trials]
+    else:
+        print(f"  screened to {len(screened)} with hypothetical indexes")
+
+    for i, candidate in enumerate(screened, 1):
+        print(f"Trial {i}/{len(screened)}: {candidate.ddl()}")
+        try:
+            build, size, latencies, used = trial(conn, [candidate], workload, sorted(candidate.queries), args.repeats)
+        except psycopg2.Error as e:
+            print(f"  failed: {str(e).strip()}")
+            continue
+        candidate.trial = {
+            'build_seconds': round(build, 3),
+            'size_mb': round(size / 2 ** 20, 2),
+            'latency_ms': latencies,
+            'used': bool(used),
+            'routes': sorted({route for text in candidate.queries for route in workload[text].routes}),
+        }
+        gain = sum(workload[text].executions * (workload[text].baseline_ms - ms) for text, ms in latencies.items())
+        print(f"  {candidate.trial['size_mb']} MB, {'used' if used else 'not used'}, "
+              f"weighted gain {gain:.1f} ms")
+
+    chosen = select(screened, workload, args.min_gain_pct / 100 * baseline_total, args.max_indexes,
+                    args.max_storage_mb)
+    final = {'baseline_total_ms': baseline_total, 'with_indexes_total_ms': baseline_total, 'size_mb': 0.0,
+             'improvement_pct': 0.0, 'queries': {}}
+    if chosen:
+        print(f"Confirming the {len(chosen)} chosen indexes together ...")
+        build, size, latencies, _ = trial(conn, chosen, workload, sorted(workload), args.repeats)
+        total = sum(workload[text].executions * ms for text, ms in latencies.items())
+        final.update({
+            'with_indexes_total_ms': total,
+            'size_mb': size / 2 ** 20,
+            'build_seconds': build,
+            'improvement_pct': 100 * (baseline_total - total) / baseline_total if baseline_total else 0.0,
+            'queries': {text: {'before_ms': _round(workload[text].baseline_ms), 'after_ms': _round(ms)}
+                        for text, ms in latencies.items()},
+        })
+    conn.close()
+
+    generated_at = datetime.now().isoformat(timespec='seconds')
+    write_migration(args.output_sql, chosen, final, generated_at)
+    report = {
+        'generated_at': generated_at,
+        'samples': args.samples,
+        'queries': [query.to_dict() for query in sorted(workload.values(), key=lambda q: -q.executions * q.baseline_ms)],
+        'candidates': [{
+            'ddl': c.ddl(), 'kind': c.kind, 'estimated_gain': _round(c.estimated_gain),
+            'trial': None if c.trial is None else {
+                **{k: v for k, v in c.trial.items() if k != 'latency_ms'},
+                'latency_ms': {' '.join(text.split())[:120]: _round(ms) for text, ms in c.trial['latency_ms'].items()},
+            },
+        } for c in candidates],
+        'chosen': [c.ddl(concurrently=True) for c in chosen],
+        'result': {**{k: (_round(v) if isinstance(v, float) else v) for k, v in final.items() if k != 'queries'},
+                   'queries': [{'query': ' '.join(text.split())[:200], **times}
+                               for text, times in final['queries'].items()]},
+    }
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\nWeighted workload latency {baseline_total:.1f} ms -> {final['with_indexes_total_ms']:.1f} ms "
+          f"({final['improvement_pct']:.1f}%), {final['size_mb']:.1f} MB")
+    for candidate in chosen:
+        print(f"  {candidate.ddl()}")
+    print(f"Migration written to {args.output_sql}, report to {args.report}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Propose and measure indexes for the route queries')
+    parser.add_argument('--dsn', required=True, help='libpq connection string of a benchmark database')
+    parser.add_argument('--samples', type=int, default=300, help='route calls used to capture the workload')
+    parser.add_argument('--params-per-query', type=int, default=5,
+                        help='parameter sets timed per distinct query (default 5)')
+    parser.add_argument('--repeats', type=int, default=3, help='timed runs per parameter set (median is used)')
+    parser.add_argument('--max-trials', type=int, default=25, help='candidates to really build and time')
+    parser.add_argument('--max-indexes', type=int, default=6, help='most indexes to recommend')
+    parser.add_argument('--max-storage-mb', type=float, help='storage budget for the recommended indexes')
+    parser.add_argument('--min-gain-pct', type=float, default=1.0,
+                        help='stop once the next index saves less than this share of the workload time')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output-sql', default='index_migration.sql', help='migration file to write')
+    parser.add_argument('--report', default='index_advisor.json', help='JSON report with every measurement')
+    args = parser.parse_args()
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
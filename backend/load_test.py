@@ -0,0 +1,523 @@
+# load_test.py
+# Load-testing harness for the API in app.py: drives every route with
+# parameters drawn like the client's controls, at a fixed concurrency, and
+# writes req/s, latency percentiles and error rates per route to JSON so
+# builds can be compared.
+#
+#   python3 load_test.py --base-url http://localhost:8080 --concurrency 16 --duration 60 \
+#       --output results/build-a.json [--compare results/build-main.json]
+#
+# Genres, artists and track ids come from the server being tested
+# (/api/genres, /api/artists, /api/search/tracks), so it works against the
+# real dataset or a synthetic one. Write routes (save/bulk save/delete) only
+# run with --include-writes, under a throwaway load-test user.
+
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+from urllib.parse import quote, urlencode, urlsplit
+
+# Words that match plenty of track and artist names in the dataset
+SEARCH_TERMS = ['love', 'the', 'night', 'baby', 'heart', 'girl', 'time', 'dance', 'life', 'world',
+                'dream', 'fire', 'rain', 'sun', 'home', 'blue', 'man', 'day', 'light', 'gold']
+ARTIST_PREFIXES = ['the', 'a', 'b', 'c', 'd', 'j', 'k', 'l', 'm', 'r', 's', 't']
+
+
+class Target:
+    """Parameter pools for the routes, discovered from the server under test"""
+
+    def __init__(self, genres, artists, track_ids):
+        self.genres = genres
+        self.artists = artists
+        self.track_ids = track_ids
+        self.user_id = None
+        self.saved = []
+        self.saved_lock = threading.Lock()
+
+
+class Client:
+    """One keep-alive HTTP connection per worker thread"""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.timeout = timeout
+        self.conn = None
+
+    def _connect(self):
+        kind = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        self.conn = kind(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None):
+        """
+        (status, response bytes). A GET is retried once on a fresh connection if
+        the server closed the kept-alive socket; writes are not, since the server
+        may already have applied them.
+        """
+        headers = {'Accept-Encoding': 'identity'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        for attempt in (0, 1):
+            if self.conn is None:
+                self._connect()
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                if response.will_close:
+                    self.close()
+                return response.status, data
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.close()
+                if attempt or method != 'GET':
+                    raise
+
+    def get_json(self, path):
+        status, data = self.request('GET', path)
+        if status != 200:
+            raise RuntimeError(f'GET {path} returned {status}: {data[:200]!r}')
+        return json.loads(data)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def _path(route, params=None):
+    return route + ('?' + urlencode(params) if params else '')
+
+
+def _tempo_range(rng):
+    # Like the client's tempo sliders (60-220 bpm), usually a 20-40 bpm window
+    low = rng.randrange(60, 180, 5)
+    return low, min(220, low + rng.choice([20, 25, 30, 40]))
+
+
+def _round(value, step=0.05):
+    return round(round(value / step) * step, 2)
+
+
+# Each scenario builds one request: (method, path, JSON body or None), or None
+# to skip a turn. The name is the Flask route it exercises, so results line up with /metrics.
+
+def genre_playlist(target, rng):
+    tempo_min, tempo_max = _tempo_range(rng)
+    return 'GET', _path('/api/playlist/genre', {'genre': rng.choice(target.genres),
+                                                'tempo_min': tempo_min, 'tempo_max': tempo_max}), None
+
+
+def artist_playlist(target, rng):
+    return 'GET', _path('/api/playlist/artist/' + quote(rng.choice(target.artists), safe=''),
+                        {'limit': rng.choice([10, 20, 20, 30, 50])}), None
+
+
+def chart_hits(target, rng):
+    return 'GET', _path('/api/playlist/chart-hits', {'genre': rng.choice(target.genres),
+                                                     'max_rank': rng.choice([10, 20, 50, 100])}), None
+
+
+def hidden_gems(target, rng):
+    return 'GET', _path('/api/playlist/hidden-gems', {'genre': rng.choice(target.genres),
+                                                      'min_popularity': rng.randrange(40, 75, 5)}), None
+
+
+def workout(target, rng):
+    tempo_min, tempo_max = _tempo_range(rng)
+    return 'GET', _path('/api/playlist/workout', {
+        'min_energy': _round(rng.uniform(0.5, 0.9)),
+        'min_danceability': _round(rng.uniform(0.4, 0.8)),
+        'tempo_min': tempo_min, 'tempo_max': tempo_max,
+    }), None
+
+
+def happy(target, rng):
+    return 'GET', _path('/api/playlist/mood/happy', {'min_valence': _round(rng.uniform(0.5, 0.9)),
+                                                     'min_energy': _round(rng.uniform(0.4, 0.8))}), None
+
+
+def decade(target, rng):
+    start = rng.randrange(1960, 2020, 10)
+    low = _round(rng.uniform(0.2, 0.6))
+    return 'GET', _path('/api/playlist/decade', {'start_year': start, 'end_year': start + 9,
+                                                 'min_energy': low,
+                                                 'max_energy': min(1.0, _round(low + rng.uniform(0.2, 0.4)))}), None
+
+
+def mix(target, rng):
+    params = {'genre': rng.choice(target.genres)}
+    if rng.random() < 0.5:
+        # Absolute counts, or proportions scaled to a size
+        spec, scaled = rng.choice([('hits:15,gems:15', False), ('hits:10,gems:10,workout:10', False),
+                                   ('hits:1,gems:1,happy:1', True), ('workout:2,happy:1', True)])
+        params['mix'] = spec
+        if scaled:
+            params['size'] = rng.choice([20, 30, 50])
+    return 'GET', _path('/api/playlist/mix', params), None
+
+
+def similar_artists(target, rng):
+    return 'GET', _path('/api/artists/similar/' + quote(rng.choice(target.artists), safe=''),
+                        {'limit': rng.choice([5, 10, 20])}), None
+
+
+def playlist_stats(target, rng):
+    ids = rng.sample(target.track_ids, min(len(target.track_ids), rng.randrange(5, 40)))
+    if rng.random() < 0.5:
+        return 'GET', _path('/api/playlist/stats', {'spotify_ids': ','.join(ids)}), None
+    return 'POST', '/api/playlist/stats', {'spotify_ids': ids}
+
+
+def genres(target, rng):
+    return 'GET', '/api/genres', None
+
+
+def artists(target, rng):
+    if rng.random() < 0.5:
+        return 'GET', _path('/api/artists', {'search': rng.choice(ARTIST_PREFIXES), 'prefix': 'true'}), None
+    return 'GET', _path('/api/artists', {'search': rng.choice(SEARCH_TERMS)}), None
+
+
+def search_tracks(target, rng):
+    return 'GET', _path('/api/search/tracks', {'query': rng.choice(SEARCH_TERMS),
+                                               'limit': rng.choice([10, 20, 50])}), None
+
+
+def test_db(target, rng):
+    return 'GET', '/api/test-db', None
+
+
+def save_playlist(target, rng):
+    ids = rng.sample(target.track_ids, min(len(target.track_ids), rng.randrange(10, 50)))
+    return 'POST', '/api/playlist/save', {'user_id': target.user_id,
+                                          'playlist_name': f'load test {rng.random():.6f}',
+                                          'spotify_ids': ids}
+
+
+def bulk_save(target, rng):
+    playlists = [{'playlist_name': f'load test bulk {i}',
+                  'spotify_ids': rng.sample(target.track_ids, min(len(target.track_ids), 20))}
+                 for i in range(rng.randrange(2, 6))]
+    return 'POST', '/api/playlists/bulk', {'user_id': target.user_id, 'playlists': playlists}
+
+
+def user_playlists(target, rng):
+    return 'GET', f'/api/user/{target.user_id}/playlists', None
+
+
+def delete_playlist(target, rng):
+    with target.saved_lock:
+        playlist_id = target.saved.pop() if target.saved else None
+    if playlist_id is None:
+        return None
+    return 'DELETE', f'/api/playlist/{playlist_id}', None
+
+
+# (route, weight, builder); weights roughly follow how often the client's screens call each route
+READ_SCENARIOS = [
+    ('/api/playlist/genre', 20, genre_playlist),
+    ('/api/playlist/artist/<artist_name>', 12, artist_playlist),
+    ('/api/playlist/chart-hits', 10, chart_hits),
+    ('/api/playlist/hidden-gems', 10, hidden_gems),
+    ('/api/playlist/workout', 8, workout),
+    ('/api/playlist/mood/happy', 8, happy),
+    ('/api/playlist/decade', 8, decade),
+    ('/api/search/tracks', 6, search_tracks),
+    ('/api/playlist/mix', 5, mix),
+    ('/api/artists/similar/<artist_name>', 5, similar_artists),
+    ('/api/playlist/stats', 4, playlist_stats),
+    ('/api/artists', 4, artists),
+    ('/api/genres', 3, genres),
+    ('/api/test-db', 1, test_db),
+]
+
+WRITE_SCENARIOS = [
+    ('/api/playlist/save', 3, save_playlist),
+    ('/api/playlists/bulk', 1, bulk_save),
+    ('/api/user/<int:user_id>/playlists', 2, user_playlists),
+    ('/api/playlist/<int:playlist_id>', 2, delete_playlist),
+]
+
+
+def discover(base_url, timeout):
+    """Genres, artist names and track ids to draw parameters from"""
+    client = Client(base_url, timeout)
+    try:
+        genres = [row['genre_name'] for row in client.get_json('/api/genres')]
+        artists = set()
+        track_ids = set()
+        for term in SEARCH_TERMS:
+            for row in client.get_json(_path('/api/artists', {'search': term})):
+                artists.add(row['artist_name'])
+            for row in client.get_json(_path('/api/search/tracks', {'query': term, 'limit': 200})):
+                track_ids.add(row['spotify_id'])
+    finally:
+        client.close()
+    if not genres or not artists or not track_ids:
+        raise RuntimeError('the server returned no genres, artists or tracks - is the database loaded?')
+    return Target(genres, sorted(artists), sorted(track_ids))
+
+
+def create_user(base_url, timeout):
+    client = Client(base_url, timeout)
+    try:
+        tag = f'{int(time.time())}_{os.getpid()}'
+        status, data = client.request('POST', '/api/user', {'username': f'loadtest_{tag}',
+                                                             'email': f'loadtest_{tag}@example.com'})
+        if status != 200:
+            raise RuntimeError(f'could not create the load-test user: {status} {data[:200]!r}')
+        return json.loads(data)['user_id']
+    finally:
+        client.close()
+
+
+class Recorder:
+    """Latency samples and outcome counts per route, shared by the workers"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def add(self, route, seconds, status, size):
+        with self.lock:
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = {'latencies': [], 'statuses': {}, 'bytes': 0,
+                                              'exceptions': 0}
+            stats['latencies'].append(seconds)
+            if status is None:
+                stats['exceptions'] += 1
+            else:
+                stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+            stats['bytes'] += size
+
+
+def worker(base_url, timeout, target, scenarios, seed, recorder, warmup_until, stop_at, max_requests, counter):
+    rng = random.Random(seed)
+    routes = [route for route, _, _ in scenarios]
+    weights = [weight for _, weight, _ in scenarios]
+    builders = dict((route, build) for route, _, build in scenarios)
+    client = Client(base_url, timeout)
+    try:
+        while time.perf_counter() < stop_at:
+            route = rng.choices(routes, weights)[0]
+            built = builders[route](target, rng)
+            if built is None:
+                continue
+            method, path, body = built
+            # Warm-up requests are not recorded, so they do not count toward --requests either
+            recorded = time.perf_counter() >= warmup_until
+            if recorded and max_requests is not None:
+                with counter['lock']:
+                    if counter['sent'] >= max_requests:
+                        break
+                    counter['sent'] += 1
+            started = time.perf_counter()
+            try:
+                status, data = client.request(method, path, body)
+            except (OSError, http.client.HTTPException):
+                client.close()
+                status, data = None, b''
+            finished = time.perf_counter()
+            if status == 200 and route == '/api/playlist/save':
+                with target.saved_lock:
+                    target.saved.append(json.loads(data)['playlist_id'])
+            if recorded:
+                recorder.add(route, finished - started, status, len(data))
+    finally:
+        client.close()
+
+
+def percentile(sorted_values, q):
+    """Linear interpolation between closest ranks (numpy's default)"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(latencies, statuses, exceptions, size, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    errors = exceptions + sum(n for status, n in statuses.items() if status >= 500)
+    client_errors = sum(n for status, n in statuses.items() if 400 <= status < 500)
+
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        'requests': count,
+        'requests_per_second': round(count / elapsed, 2) if elapsed else None,
+        'errors': errors,
+        'error_rate': round(errors / count, 4) if count else None,
+        'client_errors': client_errors,
+        'statuses': {str(status): n for status, n in sorted(statuses.items())},
+        'latency_ms': {
+            'min': ms(latencies[0]) if latencies else None,
+            'mean': ms(sum(latencies) / count) if count else None,
+            'p50': ms(percentile(latencies, 0.5)),
+            'p90': ms(percentile(latencies, 0.9)),
+            'p95': ms(percentile(latencies, 0.95)),
+            'p99': ms(percentile(latencies, 0.99)),
+            'max': ms(latencies[-1]) if latencies else None,
+        },
+        'avg_response_bytes': round(size / count) if count else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(args):
+    scenarios = list(READ_SCENARIOS)
+    if args.include_writes:
+        scenarios += WRITE_SCENARIOS
+    if args.routes:
+        wanted = set(args.routes.split(','))
+        scenarios = [s for s in scenarios if s[0] in wanted]
+        missing = wanted - {route for route, _, _ in scenarios}
+        if missing:
+            raise SystemExit(f"Unknown route(s): {', '.join(sorted(missing))}")
+
+    print(f"Discovering parameters from {args.base_url} ...")
+    target = discover(args.base_url, args.timeout)
+    print(f"  {len(target.genres)} genres, {len(target.artists)} artists, {len(target.track_ids)} track ids")
+    if args.include_writes:
+        target.user_id = create_user(args.base_url, args.timeout)
+        print(f"  writes go to user {target.user_id}")
+
+    recorder = Recorder()
+    counter = {'lock': threading.Lock(), 'sent': 0}
+    started = time.perf_counter()
+    warmup_until = started + args.warmup
+    stop_at = warmup_until + args.duration if args.requests is None else float('inf')
+    threads = [threading.Thread(target=worker, daemon=True,
+                                args=(args.base_url, args.timeout, target, scenarios, args.seed * 1000 + i,
+                                      recorder, warmup_until, stop_at, args.requests, counter))
+               for i in range(args.concurrency)]
+    print(f"Running {args.concurrency} workers for "
+          f"{f'{args.requests} requests' if args.requests else f'{args.duration}s'} "
+          f"(after {args.warmup}s warm-up) ...")
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = max(time.perf_counter() - warmup_until, 1e-9)
+
+    routes = {}
+    all_latencies, all_statuses, all_exceptions, all_bytes = [], {}, 0, 0
+    for route, stats in sorted(recorder.routes.items()):
+        routes[route] = summarize(stats['latencies'], stats['statuses'], stats['exceptions'],
+                                  stats['bytes'], elapsed)
+        all_latencies += stats['latencies']
+        for status, n in stats['statuses'].items():
+            all_statuses[status] = all_statuses.get(status, 0) + n
+        all_exceptions += stats['exceptions']
+        all_bytes += stats['bytes']
+
+    report = {
+        'label': args.label,
+        'git_commit': git_commit(),
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'base_url': args.base_url,
+        'concurrency': args.concurrency,
+        'duration_s': round(elapsed, 3),
+        'warmup_s': args.warmup,
+        'seed': args.seed,
+        'include_writes': args.include_writes,
+        'overall': summarize(all_latencies, all_statuses, all_exceptions, all_bytes, elapsed),
+        'routes': routes,
+    }
+    if args.server_metrics:
+        client = Client(args.base_url, args.timeout)
+        try:
+            report['server_metrics'] = client.get_json('/api/metrics/summary')
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"Could not fetch /api/metrics/summary: {e}")
+        finally:
+            client.close()
+    return report
+
+
+def print_report(report, baseline=None):
+    base_routes = baseline['routes'] if baseline else {}
+    header = f"{'route':<38}{'reqs':>8}{'req/s':>9}{'err%':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    if baseline:
+        header += f"{'Δp50':>9}{'Δp95':>9}{'Δreq/s':>9}"
+    print(header)
+    rows = list(report['routes'].items()) + [('TOTAL', report['overall'])]
+    for route, stats in rows:
+        latency = stats['latency_ms']
+        line = (f"{route:<38}{stats['requests']:>8}{stats['requests_per_second'] or 0:>9.1f}"
+                f"{100 * (stats['error_rate'] or 0):>7.2f}{latency['p50'] or 0:>9.1f}"
+                f"{latency['p95'] or 0:>9.1f}{latency['p99'] or 0:>9.1f}")
+        before = baseline['overall'] if route == 'TOTAL' and baseline else base_routes.get(route)
+        if before and before['requests']:
+            line += (f"{_change(before['latency_ms']['p50'], latency['p50']):>9}"
+                     f"{_change(before['latency_ms']['p95'], latency['p95']):>9}"
+                     f"{_change(before['requests_per_second'], stats['requests_per_second']):>9}")
+        print(line)
+
+
+def _change(before, after):
+    if not before or after is None:
+        return '-'
+    return f"{100 * (after - before) / before:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the music API and report per-route latency')
+    parser.add_argument('--base-url', default='http://localhost:8080', help='server to test')
+    parser.add_argument('--concurrency', type=int, default=8, help='parallel client connections')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to measure for')
+    parser.add_argument('--requests', type=int, help='stop after this many recorded requests (warm-up not included) instead of --duration')
+    parser.add_argument('--warmup', type=float, default=5.0, help='seconds of unrecorded traffic first')
+    parser.add_argument('--routes', help='comma-separated route templates to restrict the mix to')
+    parser.add_argument('--include-writes', action='store_true',
+                        help='also save, bulk save and delete playlists (under a new load-test user)')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the parameter draws')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout in seconds')
+    parser.add_argument('--label', help='name for this run in the report, e.g. a branch or build')
+    parser.add_argument('--output', help='write the report here as JSON')
+    parser.add_argument('--compare', metavar='BASELINE_JSON', help='show changes against an earlier report')
+    parser.add_argument('--server-metrics', action='store_true',
+                        help='include the server-side /api/metrics/summary in the report')
+    args = parser.parse_args()
+
+    if args.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
+    if args.requests is not None and args.requests < 1:
+        parser.error('--requests must be at least 1')
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    report = run(args)
+    print_report(report, baseline)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
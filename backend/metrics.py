@@ -0,0 +1,259 @@
+# metrics.py
+# Per-route request metrics in Prometheus text format: request/error counts,
+# latency histograms and a per-phase time breakdown (connection checkout,
+# query execution, row fetch, JSON serialization, response compression)
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask.json.provider import DefaultJSONProvider
+from psycopg2.extensions import cursor as TupleCursor
+from psycopg2.extras import RealDictCursor
+
+# Latency bucket upper bounds in seconds (+Inf is implicit)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+PHASES = ('connect', 'query', 'fetch', 'serialize', 'compress')
+
+# Phase timings of the request running on this thread
+_current = threading.local()
+
+# Called as observer(cursor, query, vars, seconds) after every timed execute()
+_query_observer = None
+
+
+def set_query_observer(func):
+    """Install (or with None, remove) the hook that sees every timed statement"""
+    global _query_observer
+    _query_observer = func
+
+
+def start_request():
+    _current.phases = dict.fromkeys(PHASES, 0.0)
+
+
+def _add(phase, seconds):
+    phases = getattr(_current, 'phases', None)
+    if phases is not None:
+        phases[phase] += seconds
+
+
+def finish_request():
+    phases = getattr(_current, 'phases', None)
+    _current.phases = None
+    return phases
+
+
+@contextmanager
+def phase(name):
+    """Time a block as part of the current request's name phase"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add(name, time.perf_counter() - started)
+
+
+class _TimedCursorMixin:
+    """Charges execute() to 'query' and fetch*() to 'fetch'"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            seconds = time.perf_counter() - started
+            _add('query', seconds)
+            if _query_observer is not None:
+                _query_observer(self, query, vars, seconds)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            _add('fetch', time.perf_counter() - started)
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(size) if size is not None else super().fetchmany()
+        finally:
+            _add('fetch', time.perf_counter() - started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            _add('fetch', time.perf_counter() - started)
+
+
+class TimedRealDictCursor(_TimedCursorMixin, RealDictCursor):
+    """RealDictCursor that charges execute() to 'query' and fetch*() to 'fetch'"""
+
+
+class TimedCursor(_TimedCursorMixin, TupleCursor):
+    """Plain tuple-row cursor, timed like TimedRealDictCursor; see serialization.rows_response"""
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that charges jsonify()/dumps time to 'serialize'"""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            _add('serialize', time.perf_counter() - started)
+
+
+class _RouteStats:
+    __slots__ = ('buckets', 'count', 'sum', 'errors', 'statuses', 'phases')
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+        self.statuses = {}
+        self.phases = dict.fromkeys(PHASES, 0.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _format_le(bound):
+    return repr(float(bound))
+
+
+class MetricsRegistry:
+    """Thread-safe per-(route, method) counters; observe() is a lock and a few additions"""
+
+    def __init__(self, namespace='music_api'):
+        self.namespace = namespace
+        self._routes = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def add_collector(self, name, help_text, func):
+        """Export func() -> {label dict as tuple of pairs or None: value} as a gauge at scrape time"""
+        self._collectors.append((name, help_text, func))
+
+    def observe(self, route, method, status, seconds, phases=None):
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            stats = self._routes.get((route, method))
+            if stats is None:
+                stats = self._routes[(route, method)] = _RouteStats()
+            stats.buckets[index] += 1
+            stats.count += 1
+            stats.sum += seconds
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            if status >= 500:
+                stats.errors += 1
+            if phases:
+                for name, value in phases.items():
+                    stats.phases[name] += value
+
+    @staticmethod
+    def quantile(q, buckets, count):
+        """Estimate a quantile from cumulative bucket counts, like PromQL histogram_quantile()"""
+        if count == 0:
+            return None
+        rank = q * count
+        cumulative = 0
+        for i, n in enumerate(buckets):
+            if cumulative + n >= rank and n:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]
+                lower = BUCKETS[i - 1] if i else 0.0
+                return lower + (BUCKETS[i] - lower) * (rank - cumulative) / n
+            cumulative += n
+        return BUCKETS[-1]
+
+    def snapshot(self):
+        with self._lock:
+            return {key: (list(s.buckets), s.count, s.sum, s.errors, dict(s.statuses), dict(s.phases))
+                    for key, s in self._routes.items()}
+
+    def summary(self):
+        """Per-route counts, p50/p95/p99 and average phase times as plain dicts"""
+        result = []
+        for (route, method), (buckets, count, total, errors, statuses, phases) in sorted(self.snapshot().items()):
+            entry = {'route': route, 'method': method, 'count': count, 'errors': errors,
+                     'avg_ms': round(1000 * total / count, 3) if count else None}
+            for q in QUANTILES:
+                value = self.quantile(q, buckets, count)
+                entry[f'p{int(q * 100)}_ms'] = round(1000 * value, 3) if value is not None else None
+            for name, value in phases.items():
+                entry[f'{name}_ms_avg'] = round(1000 * value / count, 3) if count else None
+            result.append(entry)
+        return result
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        ns = self.namespace
+        snapshot = sorted(self.snapshot().items())
+        out = []
+
+        out.append(f'# HELP {ns}_requests_total Requests by route, method and status.')
+        out.append(f'# TYPE {ns}_requests_total counter')
+        for (route, method), (_, _, _, _, statuses, _) in snapshot:
+            for status, n in sorted(statuses.items()):
+                out.append(f'{ns}_requests_total{_labels(route=route, method=method, status=status)} {n}')
+
+        out.append(f'# HELP {ns}_request_errors_total Requests that ended with a 5xx status.')
+        out.append(f'# TYPE {ns}_request_errors_total counter')
+        for (route, method), (_, _, _, errors, _, _) in snapshot:
+            out.append(f'{ns}_request_errors_total{_labels(route=route, method=method)} {errors}')
+
+        out.append(f'# HELP {ns}_request_duration_seconds Request latency.')
+        out.append(f'# TYPE {ns}_request_duration_seconds histogram')
+        for (route, method), (buckets, count, total, _, _, _) in snapshot:
+            cumulative = 0
+            for bound, n in zip(BUCKETS, buckets):
+                cumulative += n
+                out.append(f'{ns}_request_duration_seconds_bucket'
+                           f'{_labels(route=route, method=method, le=_format_le(bound))} {cumulative}')
+            out.append(f'{ns}_request_duration_seconds_bucket{_labels(route=route, method=method, le="+Inf")} {count}')
+            out.append(f'{ns}_request_duration_seconds_sum{_labels(route=route, method=method)} {total:.6f}')
+            out.append(f'{ns}_request_duration_seconds_count{_labels(route=route, method=method)} {count}')
+
+        out.append(f'# HELP {ns}_request_duration_quantile_seconds Latency quantiles estimated from the histogram.')
+        out.append(f'# TYPE {ns}_request_duration_quantile_seconds gauge')
+        for (route, method), (buckets, count, _, _, _, _) in snapshot:
+            for q in QUANTILES:
+                value = self.quantile(q, buckets, count)
+                if value is not None:
+                    out.append(f'{ns}_request_duration_quantile_seconds'
+                               f'{_labels(route=route, method=method, quantile=q)} {value:.6f}')
+
+        out.append(f'# HELP {ns}_request_phase_seconds_total Time spent per request phase '
+                   '(connect, query, fetch, serialize, compress).')
+        out.append(f'# TYPE {ns}_request_phase_seconds_total counter')
+        for (route, method), (_, _, _, _, _, phases) in snapshot:
+            for name, value in phases.items():
+                out.append(f'{ns}_request_phase_seconds_total'
+                           f'{_labels(route=route, method=method, phase=name)} {value:.6f}')
+
+        for name, help_text, func in self._collectors:
+            out.append(f'# HELP {ns}_{name} {help_text}')
+            out.append(f'# TYPE {ns}_{name} gauge')
+            try:
+                values = func()
+            except Exception as e:
+                print(f"Metrics collector {name} failed: {e}")
+                continue
+            for labels, value in values.items():
+                label_text = _labels(**dict(labels)) if labels else ''
+                out.append(f'{ns}_{name}{label_text} {value}')
+
+        return '\n'.join(out) + '\n'
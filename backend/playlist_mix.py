@@ -0,0 +1,198 @@
+# playlist_mix.py
+# N-way playlist mixes: every component query runs on its own pooled
+# connection at the same time, and the results are merged in Python
+
+import math
+import time
+from concurrent.futures import wait
+
+from metrics import TimedRealDictCursor
+
+
+class MixComponent:
+    """
+    One ingredient of a mix. query takes the genre first, then the values of
+    params (request arg name, type, default) in order, then the row limit.
+    """
+
+    def __init__(self, name, track_type, query, params=()):
+        self.name = name
+        self.track_type = track_type
+        self.query = query
+        self.params = params
+
+    def values(self, args):
+        return [args.get(arg, default=default, type=kind) for arg, kind, default in self.params]
+
+
+_SELECT = """
+SELECT DISTINCT
+    t.spotify_id,
+    t.track_name,
+    a.artist_name,
+    g.genre_name,
+    %s::text AS track_type,
+    t.popularity{extra}
+FROM tracks t
+JOIN artists a ON t.artist_id = a.artist_id
+JOIN track_genres tg ON t.spotify_id = tg.spotify_id
+JOIN genres g ON tg.genre_id = g.genre_id
+"""
+
+COMPONENTS = {
+    'hits': MixComponent('hits', 'Chart Hit', _SELECT.format(extra='') + """
+        JOIN track_chart_summary cs ON t.spotify_id = cs.spotify_id
+        WHERE g.genre_name = %s AND cs.best_rank <= %s
+        ORDER BY t.popularity DESC
+        LIMIT %s;
+        """, [('max_chart_rank', int, 30)]),
+    'gems': MixComponent('gems', 'Hidden Gem', _SELECT.format(extra='') + """
+        WHERE g.genre_name = %s
+            AND t.popularity > %s
+            AND NOT EXISTS (
+                SELECT 1 FROM track_chart_summary cs WHERE cs.spotify_id = t.spotify_id
+            )
+        ORDER BY t.popularity DESC
+        LIMIT %s;
+        """, [('min_popularity', int, 55)]),
+    'workout': MixComponent('workout', 'Workout', _SELECT.format(extra=', af.energy') + """
+        JOIN audio_features af ON t.spotify_id = af.spotify_id
+        WHERE g.genre_name = %s
+            AND af.energy > %s
+            AND af.danceability > %s
+            AND af.tempo BETWEEN %s AND %s
+        ORDER BY af.energy DESC, t.popularity DESC
+        LIMIT %s;
+        """, [('workout_min_energy', float, 0.75), ('workout_min_danceability', float, 0.65),
+              ('workout_tempo_min', int, 130), ('workout_tempo_max', int, 180)]),
+    'happy': MixComponent('happy', 'Happy', _SELECT.format(extra=', af.valence') + """
+        JOIN audio_features af ON t.spotify_id = af.spotify_id
+        WHERE g.genre_name = %s
+            AND af.valence > %s
+            AND af.energy > %s
+        ORDER BY af.valence DESC, t.popularity DESC
+        LIMIT %s;
+        """, [('happy_min_valence', float, 0.7), ('happy_min_energy', float, 0.6)]),
+}
+
+OUTPUT_COLUMNS = ['spotify_id', 'track_name', 'artist_name', 'genre_name', 'track_type', 'popularity']
+
+
+def check_mix_counts(parts, max_tracks=None):
+    """
+    Validate [(component name, count), ...]: counts must be non-negative and,
+    with max_tracks, add up to at most that many. Returns parts; raises ValueError.
+    """
+    for name, count in parts:
+        if count < 0:
+            raise ValueError(f"mix component '{name}' has a negative amount")
+    if max_tracks is not None and sum(count for _, count in parts) > max_tracks:
+        raise ValueError(f'a mix is limited to {max_tracks} tracks')
+    return parts
+
+
+def parse_mix_spec(spec, size=None, max_tracks=None):
+    """
+    Parse "hits:15,gems:15,workout:10" into [(component name, count), ...].
+    With size, the numbers are proportions and are scaled to add up to size
+    (largest remainder rounding). max_tracks caps size and the total count.
+    Raises ValueError on a malformed spec.
+    """
+    if size is not None:
+        if size < 1:
+            raise ValueError('size must be at least 1')
+        if max_tracks is not None and size > max_tracks:
+            raise ValueError(f'size must be at most {max_tracks}')
+
+    parts = []
+    for item in spec.split(','):
+        name, sep, amount = item.strip().partition(':')
+        if name not in COMPONENTS:
+            raise ValueError(f"unknown mix component '{name}' (choose from {', '.join(COMPONENTS)})")
+        if not sep:
+            raise ValueError(f"mix component '{name}' needs an amount, e.g. {name}:10")
+        if any(existing == name for existing, _ in parts):
+            raise ValueError(f"mix component '{name}' is listed twice")
+        try:
+            amount = float(amount)
+        except ValueError:
+            raise ValueError(f"bad amount for mix component '{name}'")
+        if not math.isfinite(amount):
+            raise ValueError(f"mix component '{name}' needs a finite amount")
+        if amount < 0:
+            raise ValueError(f"mix component '{name}' has a negative amount")
+        parts.append((name, amount))
+
+    if size is None:
+        return check_mix_counts([(name, int(amount)) for name, amount in parts], max_tracks)
+
+    total = sum(amount for _, amount in parts)
+    if total <= 0:
+        raise ValueError('mix proportions must add up to more than 0')
+    if not math.isfinite(total):
+        raise ValueError('mix proportions are too large')
+    shares = [amount * size / total for _, amount in parts]
+    counts = [int(share) for share in shares]
+    by_remainder = sorted(range(len(parts)), key=lambda i: counts[i] - shares[i])
+    for i in by_remainder[:size - sum(counts)]:
+        counts[i] += 1
+    return [(name, count) for (name, _), count in zip(parts, counts)]
+
+
+def _run_component(pool, component, genre, values, limit, statements=None):
+    started = time.perf_counter()
+    params = [component.track_type, genre] + values + [limit]
+    with pool.connection() as conn:
+        cursor = conn.cursor(cursor_factory=TimedRealDictCursor)
+        if statements is not None:
+            statements.execute(cursor, f'mix_{component.name}', component.query, params)
+        else:
+            cursor.execute(component.query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        conn.commit()
+    return rows, time.perf_counter() - started
+
+
+def build_mix(pool, executor, parts, genre, args, timeout=None, statements=None):
+    """
+    Run every component of parts concurrently and merge the results.
+
+    Components listed earlier win de-duplication on spotify_id; each one
+    over-fetches by the number of tracks the components before it can take,
+    so it still fills its share after duplicates are dropped. Tracks are
+    returned grouped by component (in spec order), most popular first.
+    statements (a prepared.StatementRegistry) runs the component queries as
+    prepared statements. Returns (tracks, {component name: seconds}).
+    """
+    futures = []
+    taken_before = 0
+    for name, count in parts:
+        component = COMPONENTS[name]
+        futures.append(executor.submit(_run_component, pool, component, genre,
+                                       component.values(args), count + taken_before, statements))
+        taken_before += count
+
+    done, not_done = wait(futures, timeout=timeout)
+    if not_done:
+        for future in not_done:
+            future.cancel()
+        raise TimeoutError(f'playlist mix did not finish within {timeout}s')
+
+    seen = set()
+    tracks = []
+    timings = {}
+    for (name, count), future in zip(parts, futures):
+        rows, seconds = future.result()
+        timings[name] = seconds
+        picked = []
+        for row in rows:
+            if len(picked) == count:
+                break
+            if row['spotify_id'] in seen:
+                continue
+            seen.add(row['spotify_id'])
+            picked.append({column: row[column] for column in OUTPUT_COLUMNS})
+        picked.sort(key=lambda row: -(row['popularity'] or 0))
+        tracks.extend(picked)
+    return tracks, timings
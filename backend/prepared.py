@@ -0,0 +1,238 @@
+# prepared.py
+# Server-side prepared statements for the fixed route queries, prepared lazily
+# once per pooled connection and executed by name
+
+import hashlib
+import json
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2 import errors, extensions
+
+PLAN_CACHE_MODES = ('auto', 'force_generic_plan', 'force_custom_plan')
+
+_PLACEHOLDER = re.compile(r'%%|%s')
+_LABEL = re.compile(r'[^a-z0-9_]')
+_EXECUTE = re.compile(r'EXECUTE (\w+)')
+
+
+def to_positional(query):
+    """psycopg2 %s placeholders -> PREPARE's $1, $2, ... (and %% back to %)"""
+    counter = iter(range(1, 1000))
+    return _PLACEHOLDER.sub(lambda m: '%' if m.group() == '%%' else f'${next(counter)}', query)
+
+
+class _ConnectionState:
+    __slots__ = ('names', 'plan_cache_mode')
+
+    def __init__(self):
+        self.names = set()
+        self.plan_cache_mode = None
+
+
+class _StatementStats:
+    __slots__ = ('prepares', 'prepare_seconds', 'executions', 'execute_seconds', 'execute_max',
+                 'explain_samples', 'planning_ms', 'execution_ms', 'unprepared')
+
+    def __init__(self):
+        self.prepares = 0
+        self.prepare_seconds = 0.0
+        self.executions = 0
+        self.execute_seconds = 0.0
+        self.execute_max = 0.0
+        self.explain_samples = 0
+        self.planning_ms = 0.0
+        self.execution_ms = 0.0
+        self.unprepared = 0
+
+
+class StatementRegistry:
+    """
+    Runs route queries as named prepared statements.
+
+    Each (label, query text) pair is PREPAREd the first time it runs on a
+    connection and then EXECUTEd by name, so Postgres parses it once per
+    connection and can reuse a cached generic plan. plan_cache_mode forces
+    generic or custom plans. enabled=False runs the plain text, for A/B
+    comparisons.
+
+    Every explain_every-th execution of a statement is sampled: the same
+    EXECUTE is re-run under EXPLAIN ANALYZE to split server time into planning
+    and execution. Samples run in the background on their own pooled
+    connection (rolled back afterwards), one at a time, so the sampled request
+    is not slowed down; without a pool nothing is sampled.
+    """
+
+    def __init__(self, enabled=True, plan_cache_mode='auto', explain_every=0, max_per_connection=64, pool=None):
+        if plan_cache_mode not in PLAN_CACHE_MODES:
+            raise ValueError(f"plan_cache_mode must be one of {', '.join(PLAN_CACHE_MODES)}")
+        self.enabled = enabled
+        self.plan_cache_mode = plan_cache_mode
+        self.explain_every = explain_every
+        self.max_per_connection = max_per_connection
+        self.pool = pool
+        self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='explain-sample')
+        self._explain_pending = False
+        self._connections = weakref.WeakKeyDictionary()
+        self._queries = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def set_plan_cache_mode(self, mode):
+        """Switch generic/custom plans; each connection picks it up on its next execution"""
+        if mode not in PLAN_CACHE_MODES:
+            raise ValueError(f"plan_cache_mode must be one of {', '.join(PLAN_CACHE_MODES)}")
+        self.plan_cache_mode = mode
+
+    @staticmethod
+    def statement_name(label, query):
+        digest = hashlib.sha1(query.encode()).hexdigest()[:10]
+        return f"{_LABEL.sub('_', label.lower())}_{digest}"
+
+    def source(self, statement):
+        """The original query text behind an 'EXECUTE name (...)' statement, or None"""
+        match = _EXECUTE.match(statement)
+        return self._queries.get(match.group(1)) if match else None
+
+    def _entry(self, label):
+        stats = self._stats.get(label)
+        if stats is None:
+            stats = self._stats.setdefault(label, _StatementStats())
+        return stats
+
+    def _state(self, conn):
+        with self._lock:
+            state = self._connections.get(conn)
+            if state is None:
+                state = self._connections[conn] = _ConnectionState()
+            return state
+
+    def _prepare(self, conn, state, name, label, query):
+        # Outside a transaction the PREPARE/SET are committed on their own, so a
+        # later rollback of the route's work cannot take them with it
+        idle = conn.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE
+        cursor = conn.cursor()
+        mode = self.plan_cache_mode
+        set_mode = state.plan_cache_mode != mode
+        prepare = name not in state.names
+        if set_mode:
+            cursor.execute('SET plan_cache_mode = %s;', (mode,))
+        if prepare:
+            if len(state.names) >= self.max_per_connection:
+                cursor.execute('DEALLOCATE ALL;')
+                state.names.clear()
+            started = time.perf_counter()
+            cursor.execute(f'PREPARE {name} AS {to_positional(query)}')
+            seconds = time.perf_counter() - started
+        cursor.close()
+        if idle:
+            conn.commit()
+
+        # Only recorded once they succeeded
+        if set_mode:
+            state.plan_cache_mode = mode
+        if prepare:
+            state.names.add(name)
+            with self._lock:
+                stats = self._entry(label)
+                stats.prepares += 1
+                stats.prepare_seconds += seconds
+
+    def execute(self, cursor, label, query, params=()):
+        """cursor.execute(query, params), but through a prepared statement named after label"""
+        params = list(params)
+        if not self.enabled:
+            cursor.execute(query, params)
+            with self._lock:
+                self._entry(label).unprepared += 1
+            return
+
+        conn = cursor.connection
+        name = self.statement_name(label, query)
+        self._queries[name] = query
+        state = self._state(conn)
+        if name not in state.names or state.plan_cache_mode != self.plan_cache_mode:
+            self._prepare(conn, state, name, label, query)
+
+        statement = f"EXECUTE {name} ({', '.join(['%s'] * len(params))})" if params else f'EXECUTE {name}'
+        started = time.perf_counter()
+        try:
+            cursor.execute(statement, params)
+        except errors.InvalidSqlStatementName:
+            # Dropped behind our back (e.g. DISCARD ALL on the server side): prepare again once
+            conn.rollback()
+            state.names.clear()
+            state.plan_cache_mode = None
+            self._prepare(conn, state, name, label, query)
+            started = time.perf_counter()
+            cursor.execute(statement, params)
+        seconds = time.perf_counter() - started
+
+        with self._lock:
+            stats = self._entry(label)
+            stats.executions += 1
+            stats.execute_seconds += seconds
+            stats.execute_max = max(stats.execute_max, seconds)
+            # A sample still running means the next one is skipped rather than queued
+            sample = (self.explain_every and self.pool is not None and not self._explain_pending
+                      and stats.executions % self.explain_every == 0)
+            if sample:
+                self._explain_pending = True
+        if sample:
+            self._explainer.submit(self._explain, label, name, query, statement, params)
+
+    def _explain(self, label, name, query, statement, params):
+        """Server-side planning vs execution time of one run, from EXPLAIN ANALYZE"""
+        try:
+            with self.pool.connection() as conn:
+                try:
+                    state = self._state(conn)
+                    if name not in state.names or state.plan_cache_mode != self.plan_cache_mode:
+                        self._prepare(conn, state, name, label, query)
+                    cursor = conn.cursor()
+                    try:
+                        cursor.execute('EXPLAIN (ANALYZE, SUMMARY, FORMAT JSON) ' + statement, params)
+                        plan = cursor.fetchone()[0]
+                    finally:
+                        cursor.close()
+                finally:
+                    conn.rollback()
+        except Exception as e:
+            print(f"EXPLAIN sample for {name} failed: {str(e).strip()}")
+            return
+        finally:
+            with self._lock:
+                self._explain_pending = False
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        with self._lock:
+            stats = self._entry(label)
+            stats.explain_samples += 1
+            stats.planning_ms += plan[0].get('Planning Time', 0.0)
+            stats.execution_ms += plan[0].get('Execution Time', 0.0)
+
+    def stats(self):
+        with self._lock:
+            statements = {}
+            for label, s in sorted(self._stats.items()):
+                statements[label] = {
+                    'prepares': s.prepares,
+                    'prepare_ms_avg': round(1000 * s.prepare_seconds / s.prepares, 3) if s.prepares else None,
+                    'executions': s.executions,
+                    'execute_ms_avg': round(1000 * s.execute_seconds / s.executions, 3) if s.executions else None,
+                    'execute_ms_max': round(1000 * s.execute_max, 3),
+                    'explain_samples': s.explain_samples,
+                    'server_planning_ms_avg': round(s.planning_ms / s.explain_samples, 3) if s.explain_samples else None,
+                    'server_execution_ms_avg': round(s.execution_ms / s.explain_samples, 3) if s.explain_samples else None,
+                    'unprepared_executions': s.unprepared,
+                }
+            return {
+                'enabled': self.enabled,
+                'plan_cache_mode': self.plan_cache_mode,
+                'explain_every': self.explain_every,
+                'connections': len(self._connections),
+                'statements': statements,
+            }
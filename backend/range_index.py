@@ -0,0 +1,239 @@
+# range_index.py
+# Columnar range index over the nine audio features: range predicates on any
+# combination of columns, intersected in memory, with ordered top-k results
+
+import threading
+
+import numpy as np
+
+from feature_store import FEATURE_COLUMNS, FEATURE_INDEX, to_json_float
+
+OPERATORS = ('>', '>=', '<', '<=', '=')
+ORDER_COLUMNS = FEATURE_COLUMNS + ['popularity']
+
+# Rows examined per step of an ordered walk, as a multiple of the limit (doubles each step)
+WALK_BLOCK_FACTOR = 4
+
+
+class RangeIndex:
+    """
+    Every feature column kept twice: as the row permutation that sorts it and
+    as the sorted values. A predicate on a column is then a contiguous slice
+    of its permutation (two binary searches), so its exact selectivity is
+    known before any row is touched.
+
+    query() uses one of two plans:
+    - slice: take the smallest slice, check the other predicates on just those
+      rows, and pick the top k. Cost follows the most selective predicate.
+    - walk: when the first order-by key is a feature, read its permutation
+      from the best end in growing blocks, keep rows passing every predicate,
+      and stop after k (plus rows tied with the k-th). Cost follows k divided
+      by the combined selectivity of the other predicates.
+    Rows with a NULL feature never match a predicate on it, as in SQL.
+    Values compare as float32, as Postgres compares REAL with a constant.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.order = {}
+        self.sorted = {}
+        for name in FEATURE_COLUMNS:
+            values = data.column(name)
+            order = np.argsort(values, kind='stable').astype(np.int32)
+            # argsort puts NaN last; leaving them out makes every slice NULL-free
+            valid = len(values) - int(np.count_nonzero(np.isnan(values)))
+            self.order[name] = order[:valid]
+            self.sorted[name] = np.ascontiguousarray(values[order[:valid]])
+        self._lock = threading.Lock()
+        self.plans = {'slice': 0, 'walk': 0, 'empty': 0}
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.order.values()) + sum(a.nbytes for a in self.sorted.values())
+
+    def _slice(self, column, conditions):
+        """[start, stop) of the column's sorted order satisfying every (op, value) in conditions"""
+        values = self.sorted[column]
+        start, stop = 0, len(values)
+        for op, value in conditions:
+            value = np.float32(value)
+            if op in ('>', '>='):
+                start = max(start, int(np.searchsorted(values, value, 'right' if op == '>' else 'left')))
+            elif op in ('<', '<='):
+                stop = min(stop, int(np.searchsorted(values, value, 'left' if op == '<' else 'right')))
+            else:
+                start = max(start, int(np.searchsorted(values, value, 'left')))
+                stop = min(stop, int(np.searchsorted(values, value, 'right')))
+        return start, max(start, stop)
+
+    def _mask(self, rows, ranges, skip=None, genre_code=None):
+        """Which of rows fall inside every column range except skip (and are in the genre)"""
+        mask = np.ones(len(rows), dtype=bool)
+        for column, (start, stop) in ranges.items():
+            if column == skip:
+                continue
+            values = self.data.features[rows, FEATURE_INDEX[column]]
+            sorted_values = self.sorted[column]
+            lo = sorted_values[start] if start < len(sorted_values) else np.inf
+            hi = sorted_values[stop - 1] if stop > 0 else -np.inf
+            # The slice bounds are the smallest and largest matching values
+            mask &= (values >= lo) & (values <= hi)
+        if genre_code is not None:
+            mask &= self.data.genre_codes[rows] == genre_code
+        return mask
+
+    def _keys(self, order_by):
+        keys = []
+        for column, descending in order_by:
+            key = self.data.popularity if column == 'popularity' else self.data.column(column)
+            keys.append(key if descending else -key.astype(np.float64))
+        return keys
+
+    def query(self, predicates, order_by, limit, genre_code=None):
+        """
+        Row indices of the best `limit` rows matching every (column, op, value)
+        predicate, ordered by order_by [(column, descending), ...] where column
+        is a feature or 'popularity'. Raises ValueError on unknown columns/ops.
+        """
+        conditions = {}
+        for column, op, value in predicates:
+            if column not in FEATURE_INDEX:
+                raise ValueError(f"unknown feature column '{column}'")
+            if op not in OPERATORS:
+                raise ValueError(f"unsupported operator '{op}'")
+            conditions.setdefault(column, []).append((op, value))
+        for column, _ in order_by:
+            if column not in ORDER_COLUMNS:
+                raise ValueError(f"cannot order by '{column}'")
+
+        ranges = {column: self._slice(column, conds) for column, conds in conditions.items()}
+        if limit <= 0 or any(stop <= start for start, stop in ranges.values()):
+            self._count('empty')
+            return np.empty(0, dtype=np.int64)
+
+        n = max(self.data.size, 1)
+        keys = self._keys(order_by)
+        lead = order_by[0][0] if order_by else None
+        # Rows a walk is expected to read: limit / selectivity of everything but the walked column
+        selectivity = 1.0
+        for column, (start, stop) in ranges.items():
+            if column != lead:
+                selectivity *= (stop - start) / n
+        if genre_code is not None:
+            selectivity /= max(len(self.data.genre_names), 1)
+        smallest = min(ranges, key=lambda c: ranges[c][1] - ranges[c][0]) if ranges else None
+        slice_cost = ranges[smallest][1] - ranges[smallest][0] if smallest else n
+
+        if lead in FEATURE_INDEX and limit / max(selectivity, 1e-9) < slice_cost / 2:
+            self._count('walk')
+            rows = self._walk(lead, order_by[0][1], ranges, limit, genre_code)
+        else:
+            self._count('slice')
+            if smallest is None:
+                rows = np.arange(self.data.size, dtype=np.int64)
+            else:
+                start, stop = ranges[smallest]
+                rows = self.order[smallest][start:stop].astype(np.int64)
+            rows = rows[self._mask(rows, ranges, skip=smallest, genre_code=genre_code)]
+        if not keys:
+            return rows[:limit]
+        return self.data.top_k(rows, limit, *keys)
+
+    def _walk(self, column, descending, ranges, limit, genre_code):
+        start, stop = ranges.get(column, (0, len(self.order[column])))
+        order = self.order[column]
+        values = self.sorted[column]
+        found = []
+        count = 0
+        block = max(limit * WALK_BLOCK_FACTOR, 256)
+        # Walk [start, stop) from the best end; `done` tracks how far it got
+        done = stop if descending else start
+        while (done > start if descending else done < stop) and count < limit:
+            if descending:
+                lo, hi = max(start, done - block), done
+                done = lo
+            else:
+                lo, hi = done, min(stop, done + block)
+                done = hi
+            rows = order[lo:hi].astype(np.int64)
+            rows = rows[self._mask(rows, ranges, skip=column, genre_code=genre_code)]
+            found.append(rows)
+            count += len(rows)
+            block *= 2
+        if count >= limit:
+            # Rows still unread that tie with the worst value read so far can also make the top k
+            if descending and done > start:
+                tie_lo = max(start, int(np.searchsorted(values, values[done], 'left')))
+                rows = order[tie_lo:done].astype(np.int64)
+                found.append(rows[self._mask(rows, ranges, skip=column, genre_code=genre_code)])
+            elif not descending and done < stop:
+                tie_hi = min(stop, int(np.searchsorted(values, values[done - 1], 'right')))
+                rows = order[done:tie_hi].astype(np.int64)
+                found.append(rows[self._mask(rows, ranges, skip=column, genre_code=genre_code)])
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def _count(self, plan):
+        with self._lock:
+            self.plans[plan] += 1
+
+    def status(self):
+        with self._lock:
+            return {'bytes': self.nbytes, 'plans': dict(self.plans)}
+
+
+class RangeIndexStore:
+    """Holds the current RangeIndex; rebuilt whenever the feature store reloads"""
+
+    def __init__(self):
+        self.index = None
+
+    def rebuild(self, data):
+        self.index = RangeIndex(data)
+        return self.index
+
+
+def _track(data, row, columns):
+    result = {
+        'track_name': data.track_names[row],
+        'artist_name': data.artist_names[int(data.artist_ids[row])],
+    }
+    for column in columns:
+        if column == 'genre_name':
+            result[column] = data.genre_name(row)
+        elif column == 'popularity':
+            result[column] = int(data.popularity[row])
+        else:
+            result[column] = to_json_float(data.features[row, FEATURE_INDEX[column]])
+    return result
+
+
+def playlist_workout(index, min_energy, min_danceability, tempo_min, tempo_max, limit):
+    """In-memory version of Route 5, shaped like the SQL rows"""
+    rows = index.query([('energy', '>', min_energy), ('danceability', '>', min_danceability),
+                        ('tempo', '>=', tempo_min), ('tempo', '<=', tempo_max)],
+                       [('energy', True), ('popularity', True)], limit)
+    columns = ['tempo', 'energy', 'danceability', 'popularity']
+    return [_track(index.data, row, columns) for row in rows.tolist()]
+
+
+def playlist_happy(index, min_valence, min_energy, limit):
+    """In-memory version of Route 6, shaped like the SQL rows"""
+    rows = index.query([('valence', '>', min_valence), ('energy', '>', min_energy)],
+                       [('valence', True), ('popularity', True)], limit)
+    columns = ['genre_name', 'valence', 'energy', 'popularity']
+    return [_track(index.data, row, columns) for row in rows.tolist()]
+
+
+def feature_search(index, predicates, order_by, limit, genre=None):
+    """Tracks matching any combination of feature ranges, with the constrained and ordered columns"""
+    genre_code = None
+    if genre is not None:
+        genre_code = index.data.genre_code_of.get(genre)
+        if genre_code is None:
+            return []
+    rows = index.query(predicates, order_by, limit, genre_code)
+    columns = ['genre_name'] + list(dict.fromkeys(
+        [column for column, _, _ in predicates] + [column for column, _ in order_by if column != 'popularity']))
+    columns.append('popularity')
+    data = index.data
+    return [dict(_track(data, row, columns), spotify_id=data.spotify_ids[row]) for row in rows.tolist()]
@@ -0,0 +1,137 @@
+# response_cache.py
+# Bounded LRU cache (entry count, TTL and byte budget) for read-only GET routes
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, make_response
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU of serialized responses.
+
+    An entry is dropped when it is older than ttl seconds, when more than
+    max_entries are stored, or when the stored bodies exceed max_bytes.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expires_at, body, status, headers)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(route, args):
+        """Route + query args sorted by name, so ?a=1&b=2 and ?b=2&a=1 share an entry"""
+        items = sorted((name, value.strip()) for name, values in args.lists() for value in values)
+        return route + '?' + '&'.join(f'{name}={value}' for name, value in items)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1:]
+
+    def put(self, key, body, status, headers, generation=None):
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # A reload happened while this response was being built - do not store stale data
+            if generation is not None and generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, body, status, headers)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry[1])
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def clear(self):
+        """Invalidation hook - call after the dataset is reloaded"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+def cached_response(cache):
+    """
+    Decorator for read-only GET routes. Only successful (200) responses are
+    stored; any other method, or a request sent with Cache-Control: no-cache,
+    goes straight to the handler.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            key = cache.make_key(request.path, request.args)
+            if 'no-cache' not in request.headers.get('Cache-Control', ''):
+                entry = cache.get(key)
+                if entry is not None:
+                    body, status, headers = entry
+                    response = make_response(body, status)
+                    response.headers.update(headers)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+            generation = cache.generation
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                headers = {'Content-Type': response.headers.get('Content-Type', 'application/json')}
+                cache.put(key, response.get_data(), response.status_code, headers, generation)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
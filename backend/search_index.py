@@ -0,0 +1,195 @@
+# search_index.py
+# In-process trigram index for track and artist name search
+
+import bisect
+import heapq
+import threading
+import time
+
+import numpy as np
+
+# Documents are loaded in popularity order, so a document's id doubles as its rank
+TRACK_QUERY = """
+SELECT t.spotify_id, t.track_name, a.artist_name, COALESCE(t.popularity, 0)
+FROM tracks t
+JOIN artists a ON t.artist_id = a.artist_id
+ORDER BY t.popularity DESC NULLS LAST, t.spotify_id;
+"""
+
+ARTIST_QUERY = """
+SELECT a.artist_id, a.artist_name, COALESCE(MAX(t.popularity), 0) AS popularity
+FROM artists a
+LEFT JOIN tracks t ON a.artist_id = t.artist_id
+GROUP BY a.artist_id, a.artist_name
+ORDER BY popularity DESC, a.artist_name;
+"""
+
+
+def fold_case(text):
+    """
+    The raw name lowercased, as ILIKE compares it. The normalized_* columns are
+    not used: they drop parentheticals and "feat." credits, so "remix" or
+    "feat" would stop matching names the SQL fallback finds.
+    """
+    if text is None:
+        return ""
+    return str(text).lower()
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    Inverted index from character trigrams to sorted document ids.
+
+    A substring query intersects the posting lists of its trigrams (shortest
+    first) and then verifies the candidates; since ids are popularity ranks,
+    the first `limit` verified hits are already the most popular ones.
+    """
+
+    def __init__(self, names):
+        self.names = names
+        postings = {}
+        for doc_id, name in enumerate(names):
+            for gram in trigrams(name):
+                postings.setdefault(gram, []).append(doc_id)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+        # (name, doc_id) pairs in name order for prefix (autocomplete) lookups
+        self.sorted_names = sorted((name, doc_id) for doc_id, name in enumerate(names))
+        self._sorted_keys = [name for name, _ in self.sorted_names]
+
+    def __len__(self):
+        return len(self.names)
+
+    def contains(self, term, limit):
+        """Ids of the `limit` most popular names containing term"""
+        if not term or limit <= 0:
+            return []
+        if len(term) < 3:
+            # Too short for trigrams; short terms match so often that a scan stops early
+            hits = []
+            for doc_id, name in enumerate(self.names):
+                if term in name:
+                    hits.append(doc_id)
+                    if len(hits) == limit:
+                        break
+            return hits
+
+        lists = []
+        for gram in trigrams(term):
+            ids = self.postings.get(gram)
+            if ids is None:
+                return []
+            lists.append(ids)
+        lists.sort(key=len)
+        candidates = lists[0]
+        for ids in lists[1:]:
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+            if len(candidates) == 0:
+                return []
+
+        hits = []
+        for doc_id in candidates.tolist():
+            if term in self.names[doc_id]:
+                hits.append(doc_id)
+                if len(hits) == limit:
+                    break
+        return hits
+
+    def prefix(self, term, limit):
+        """Ids of the `limit` most popular names starting with term"""
+        if not term or limit <= 0:
+            return []
+        lo = bisect.bisect_left(self._sorted_keys, term)
+        hi = bisect.bisect_left(self._sorted_keys, term + '\uffff')
+        return heapq.nsmallest(limit, (doc_id for _, doc_id in self.sorted_names[lo:hi]))
+
+
+class SearchIndex:
+    """Track and artist trigram indexes built from one database snapshot"""
+
+    def __init__(self, track_rows, artist_rows):
+        self.track_ids = [r[0] for r in track_rows]
+        self.track_names = [r[1] for r in track_rows]
+        self.track_artists = [r[2] for r in track_rows]
+        self.track_popularity = [r[3] for r in track_rows]
+        self.tracks = TrigramIndex([fold_case(name) for name in self.track_names])
+
+        self.artist_ids = [r[0] for r in artist_rows]
+        self.artist_names = [r[1] for r in artist_rows]
+        self.artists = TrigramIndex([fold_case(name) for name in self.artist_names])
+
+    def search_tracks(self, query, limit, prefix=False):
+        term = fold_case(query)
+        index = self.tracks
+        ids = index.prefix(term, limit) if prefix else index.contains(term, limit)
+        return [
+            {
+                'track_name': self.track_names[i],
+                'spotify_id': self.track_ids[i],
+                'artist_name': self.track_artists[i],
+                'popularity': self.track_popularity[i],
+            }
+            for i in ids
+        ]
+
+    def search_artists(self, query, limit, prefix=False):
+        term = fold_case(query)
+        index = self.artists
+        ids = index.prefix(term, limit) if prefix else index.contains(term, limit)
+        return [{'artist_id': self.artist_ids[i], 'artist_name': self.artist_names[i]} for i in ids]
+
+
+class SearchStore:
+    """Holds the current SearchIndex; routes use ILIKE in SQL until it is ready"""
+
+    def __init__(self):
+        self.index = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.last_error = None
+        self._load_lock = threading.Lock()
+
+    def load(self, pool):
+        with self._load_lock:
+            started = time.perf_counter()
+            with pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(TRACK_QUERY)
+                track_rows = cursor.fetchall()
+                cursor.execute(ARTIST_QUERY)
+                artist_rows = cursor.fetchall()
+                cursor.close()
+                conn.commit()
+            self.index = SearchIndex(track_rows, artist_rows)
+            self.loaded_at = time.time()
+            self.load_seconds = time.perf_counter() - started
+            self.last_error = None
+            return self.index
+
+    def load_async(self, pool):
+        def run():
+            try:
+                self.load(pool)
+                print(f"Search index built over {len(self.index.tracks)} tracks in {self.load_seconds:.2f}s")
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Search index build failed: {e}")
+
+        thread = threading.Thread(target=run, name='search-index-load', daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        index = self.index
+        return {
+            'ready': index is not None,
+            'tracks': len(index.tracks) if index is not None else 0,
+            'artists': len(index.artists) if index is not None else 0,
+            'loaded_at': self.loaded_at,
+            'load_seconds': round(self.load_seconds, 3) if self.load_seconds else None,
+            'last_error': self.last_error,
+        }
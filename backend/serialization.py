@@ -0,0 +1,148 @@
+# serialization.py
+# How responses are written: a JSON provider backed by orjson (when installed), tuple-row
+# responses in object or compact columnar form, and gzip/brotli compression
+# negotiated from Accept-Encoding
+
+import gzip
+import json
+
+from flask import jsonify
+
+from metrics import TimedJSONProvider, phase
+from streaming import ROW_FORMATS, encode_token
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Only these mimetypes are worth compressing
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/html', 'application/x-ndjson')
+
+
+class FastJSONProvider(TimedJSONProvider):
+    """
+    TimedJSONProvider that encodes with orjson and builds responses from its
+    bytes directly. Output matches the default provider: sorted keys, Decimal
+    as a string, dates as HTTP dates. Falls back to the standard library for
+    anything orjson rejects (or when it is not installed).
+    """
+
+    def _orjson_options(self, indent):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def _encode(self, obj, indent=False):
+        """obj as UTF-8 JSON bytes"""
+        with phase('serialize'):
+            if orjson is not None:
+                try:
+                    return orjson.dumps(obj, default=self.default, option=self._orjson_options(indent))
+                except TypeError:
+                    pass
+            kwargs = {'indent': 2} if indent else {'separators': (',', ':')}
+            return json.dumps(obj, default=self.default, sort_keys=self.sort_keys,
+                              ensure_ascii=self.ensure_ascii, **kwargs).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj, indent=bool(kwargs.get('indent'))).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._encode(obj, indent) + b'\n', mimetype=self.mimetype)
+
+
+def row_format(args):
+    """The ?format= of a request; raises ValueError for unknown formats"""
+    fmt = args.get('format', default='objects', type=str)
+    if fmt not in ROW_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(ROW_FORMATS)}")
+    return fmt
+
+
+def column_names(cursor):
+    return [column.name for column in cursor.description]
+
+
+def rows_response(columns, rows, fmt='objects', page_size=None):
+    """
+    JSON response for tuple rows fetched with a metrics.TimedCursor, whose
+    column names (column_names(cursor)) come separately.
+
+    'objects' is the usual list of {column: value}; 'columns' names the
+    columns once, {"columns": [...], "rows": [[...], ...]}. With page_size,
+    rows holds one extra row (as streaming.ListingRequest.sql_limit asks for)
+    and the body is a keyset page, like streaming.page_response.
+    """
+    next_token = None
+    if page_size is not None:
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if has_more:
+            last = rows[-1]
+            next_token = encode_token(last[columns.index('popularity')], last[columns.index('spotify_id')])
+
+    if fmt == 'columns':
+        body = {'columns': columns, 'rows': rows}
+    else:
+        body = [dict(zip(columns, row)) for row in rows]
+    if page_size is not None:
+        body = {'results': body, 'next': next_token}
+    return jsonify(body)
+
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' or None for an Accept-Encoding header (q=0 means refused)"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    wildcard = accepted.get('*', 0.0)
+    if brotli is not None and accepted.get('br', wildcard) > 0:
+        return 'br'
+    if accepted.get('gzip', wildcard) > 0:
+        return 'gzip'
+    return None
+
+
+def compress_response(response, accept_encoding, min_bytes=1024, gzip_level=5, brotli_quality=4):
+    """Compress a finished response in place when the client accepts it and it is big enough"""
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 304) or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return response
+    encoding = choose_encoding(accept_encoding or '')
+    if encoding is None:
+        return response
+    with phase('compress'):
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=gzip_level, mtime=0)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,111 @@
+# serialization_benchmark.py
+# Micro-benchmark of response encoding cost per 1,000 rows, old path vs new:
+#
+#   before:  RealDictRow per row (as RealDictCursor builds them) + Flask's default JSON provider
+#   after:   plain tuples + FastJSONProvider, as list of objects and as the columnar format
+#
+# plus gzip/brotli time and size on the resulting body. Rows are synthetic but shaped
+# like the playlist routes (text, REAL features, ints, a ROUND(...)::numeric Decimal).
+#
+#   python3 backend/serialization_benchmark.py --rows 1000 --repeat 200
+
+import argparse
+import gzip
+import random
+import time
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from psycopg2.extras import RealDictRow
+
+import serialization
+from config import COMPRESSION_CONFIG
+from serialization import FastJSONProvider
+
+COLUMNS = ['spotify_id', 'track_name', 'artist_name', 'genre_name', 'tempo', 'energy',
+           'danceability', 'popularity', 'avg_popularity']
+
+
+def make_rows(count, seed):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        rows.append((
+            f'{rng.getrandbits(64):022x}',
+            f'Track {i} ' + rng.choice(['Love', 'Night', 'Dance', 'Fire', 'Rain']),
+            rng.choice(['Drake', 'Adele', 'Queen', 'Bad Bunny', 'Beyoncé']),
+            rng.choice(['Pop', 'Rock', 'Hip-Hop', 'Dance', 'Jazz']),
+            round(rng.uniform(60, 200), 3),
+            round(rng.random(), 3),
+            round(rng.random(), 3),
+            rng.randrange(100),
+            Decimal(f'{rng.uniform(0, 100):.2f}'),
+        ))
+    return rows
+
+
+def timed(func, repeat):
+    """Best-of-three mean seconds per call"""
+    best = None
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            result = func()
+        seconds = (time.perf_counter() - started) / repeat
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time response serialization per 1k rows, before and after')
+    parser.add_argument('--rows', type=int, default=1000, help='rows per response')
+    parser.add_argument('--repeat', type=int, default=200, help='calls per timing run')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, args.seed)
+    app = Flask(__name__)
+    before_provider = DefaultJSONProvider(app)
+    after_provider = FastJSONProvider(app)
+
+    def before():
+        dict_rows = [RealDictRow(zip(COLUMNS, row)) for row in rows]
+        return before_provider.response(dict_rows).get_data()
+
+    def after_objects():
+        return after_provider.response([dict(zip(COLUMNS, row)) for row in rows]).get_data()
+
+    def after_columns():
+        return after_provider.response({'columns': COLUMNS, 'rows': rows}).get_data()
+
+    per_k = 1000 / max(args.rows, 1)
+    print(f"{args.rows} rows per response, orjson {'on' if serialization.orjson else 'not installed'}, "
+          f"brotli {'on' if serialization.brotli else 'not installed'}")
+    print(f"\n{'encoding':<28}{'ms / 1k rows':>14}{'bytes / 1k rows':>18}")
+    bodies = {}
+    baseline = None
+    for name, func in [('before (RealDictRow + json)', before),
+                       ('after: objects', after_objects),
+                       ('after: columns', after_columns)]:
+        seconds, body = timed(func, args.repeat)
+        bodies[name] = body
+        baseline = baseline or seconds
+        print(f"{name:<28}{seconds * 1000 * per_k:>14.3f}{len(body) * per_k:>18.0f}"
+              f"   x{baseline / seconds:.1f}")
+
+    print(f"\n{'compression':<28}{'ms / 1k rows':>14}{'bytes / 1k rows':>18}")
+    level, quality = COMPRESSION_CONFIG['gzip_level'], COMPRESSION_CONFIG['brotli_quality']
+    compressors = [('gzip', lambda body: gzip.compress(body, compresslevel=level, mtime=0))]
+    if serialization.brotli is not None:
+        compressors.append(('br', lambda body: serialization.brotli.compress(body, quality=quality)))
+    for name in ('after: objects', 'after: columns'):
+        for encoding, compress in compressors:
+            body = bodies[name]
+            seconds, compressed = timed(lambda: compress(body), args.repeat)
+            label = f"{name.split(': ')[1]} + {encoding}"
+            print(f"{label:<28}{seconds * 1000 * per_k:>14.3f}{len(compressed) * per_k:>18.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+# slow_queries.py
+# Slow-query log: statements over a time threshold are recorded with their
+# route, parameters (SELECTs only by default), row count and timing; a sample
+# of them is re-run under EXPLAIN (ANALYZE, BUFFERS) in the background and the
+# plan stored alongside
+
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class SlowQueryLog:
+    """
+    Keeps the most recent slow statements in memory and appends every one to
+    a JSON-lines file in directory. The file rotates at max_file_bytes
+    (slow_queries.jsonl -> .1 -> .2 ...), keeping max_files old files.
+
+    Only SELECT/WITH statements are ever explained, on a separate pooled
+    connection whose transaction is rolled back, so EXPLAIN ANALYZE can never
+    change data and the slow request itself is not delayed.
+
+    log_params decides whose bound parameters are kept: 'select' (reads only,
+    so the names and emails written by the /api/user routes never reach the
+    log), 'all' or 'none'. Redacted entries have params None.
+    """
+
+    FILE_NAME = 'slow_queries.jsonl'
+    LOG_PARAMS = ('select', 'all', 'none')
+
+    def __init__(self, pool, directory, threshold_ms=250.0, explain_sample_rate=0.2,
+                 max_file_bytes=5 * 1024 * 1024, max_files=5, memory_entries=500, enabled=True,
+                 log_params='select'):
+        if log_params not in self.LOG_PARAMS:
+            raise ValueError(f"log_params must be one of {', '.join(self.LOG_PARAMS)}")
+        self.pool = pool
+        self.log_params = log_params
+        self.enabled = enabled
+        self.directory = directory
+        self.threshold = threshold_ms / 1000.0
+        self.explain_sample_rate = explain_sample_rate
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self._entries = deque(maxlen=memory_entries)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='explain')
+        self._logged = 0
+        self._explained = 0
+        self._explain_failures = 0
+        self._load_recent()
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, self.FILE_NAME)
+
+    def _load_recent(self):
+        """Pick up entries written before a restart so the admin endpoint shows them"""
+        try:
+            with open(self.path) as f:
+                lines = deque(f, maxlen=self._entries.maxlen)
+        except OSError:
+            return
+        for line in lines:
+            try:
+                self._entries.append(json.loads(line))
+            except ValueError:
+                continue
+        if self._entries:
+            last_id = max(entry.get('id', 0) for entry in self._entries)
+            self._ids = itertools.count(last_id + 1)
+
+    def observe(self, route, query, params, rows, seconds, explain_query=None):
+        """
+        Called after every timed execute. explain_query is the SQL to re-run
+        for the plan when query itself cannot be explained (e.g. EXECUTE name).
+        """
+        if not self.enabled or seconds < self.threshold:
+            return
+        text = explain_query or query
+        if isinstance(text, bytes):
+            text = text.decode()
+        statement = _WHITESPACE.sub(' ', text).strip()
+        explainable = statement.upper().startswith(('SELECT', 'WITH'))
+        keep_params = self.log_params == 'all' or (self.log_params == 'select' and explainable)
+        entry = {
+            'id': next(self._ids),
+            'logged_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'route': route,
+            'query': statement,
+            'params': _jsonable(params) if keep_params else None,
+            'rows': rows,
+            'duration_ms': round(seconds * 1000, 3),
+            'plan': None,
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self._logged += 1
+
+        if explainable and random.random() < self.explain_sample_rate:
+            self._explainer.submit(self._explain_and_write, entry, text, params)
+        else:
+            self._write(entry)
+
+    def _explain_and_write(self, entry, query, params):
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + query, params)
+                    plan = cursor.fetchone()[0]
+                finally:
+                    cursor.close()
+                    conn.rollback()
+            entry['plan'] = json.loads(plan) if isinstance(plan, str) else plan
+            with self._lock:
+                self._explained += 1
+        except Exception as e:
+            entry['plan_error'] = str(e).strip()
+            with self._lock:
+                self._explain_failures += 1
+        self._write(entry)
+
+    def _write(self, entry):
+        line = json.dumps(entry, default=str) + '\n'
+        with self._lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_file_bytes:
+                    self._rotate()
+                with open(self.path, 'a') as f:
+                    f.write(line)
+            except OSError as e:
+                print(f"Slow query log write failed: {e}")
+
+    def _rotate(self):
+        for i in range(self.max_files - 1, 0, -1):
+            older = f'{self.path}.{i}'
+            if os.path.exists(older):
+                os.replace(older, f'{self.path}.{i + 1}')
+        os.replace(self.path, f'{self.path}.1')
+        stale = f'{self.path}.{self.max_files + 1}'
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    def entries(self, limit=50, route=None, min_ms=None):
+        """Most recent first, without plans"""
+        with self._lock:
+            entries = list(self._entries)
+        result = []
+        for entry in reversed(entries):
+            if route is not None and entry['route'] != route:
+                continue
+            if min_ms is not None and entry['duration_ms'] < min_ms:
+                continue
+            summary = {key: value for key, value in entry.items() if key != 'plan'}
+            summary['has_plan'] = entry.get('plan') is not None
+            result.append(summary)
+            if len(result) == limit:
+                break
+        return result
+
+    def get(self, entry_id):
+        with self._lock:
+            for entry in self._entries:
+                if entry['id'] == entry_id:
+                    return entry
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'threshold_ms': round(self.threshold * 1000, 3),
+                'explain_sample_rate': self.explain_sample_rate,
+                'log_params': self.log_params,
+                'logged': self._logged,
+                'explained': self._explained,
+                'explain_failures': self._explain_failures,
+                'in_memory': len(self._entries),
+                'file': self.path,
+            }
+
+
+def _jsonable(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {str(k): _jsonable_value(v) for k, v in params.items()}
+    return [_jsonable_value(v) for v in params]
+
+
+def _jsonable_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable_value(v) for v in value]
+    return str(value)
@@ -0,0 +1,145 @@
+# streaming.py
+# Streaming responses over server-side cursors, and keyset pagination tokens
+# for routes ordered by (popularity, spotify_id)
+
+import base64
+import json
+from uuid import uuid4
+
+from flask import Response
+from psycopg2.extras import RealDictCursor
+
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+# Buffered body shapes: a list of row objects, or column names once plus row arrays
+ROW_FORMATS = ('objects', 'columns')
+
+
+def encode_token(popularity, spotify_id):
+    """Opaque page token for the row a page ended on"""
+    raw = json.dumps([popularity, spotify_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def columns_body(records):
+    """Row dicts in the compact format: {"columns": [...], "rows": [[...], ...]}"""
+    columns = list(records[0]) if records else []
+    return {'columns': columns, 'rows': [list(record.values()) for record in records]}
+
+
+def decode_token(token):
+    """(popularity, spotify_id) from encode_token(); raises ValueError on a bad token"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        popularity, spotify_id = json.loads(raw)
+    except Exception:
+        raise ValueError('invalid page token')
+    if not isinstance(popularity, int) or not isinstance(spotify_id, str):
+        raise ValueError('invalid page token')
+    return popularity, spotify_id
+
+
+class ListingRequest:
+    """
+    How a list route was asked to return its rows, parsed from the query string:
+    stream=ndjson|json streams everything through a named cursor, page_size
+    (with after=<token>) returns one keyset page, and neither keeps the plain
+    buffered list. format=columns sends buffered rows in the compact
+    columnar shape. Routes not ordered by (popularity, spotify_id) pass
+    pageable=False. Raises ValueError for invalid combinations.
+    """
+
+    def __init__(self, args, default_limit, config, pageable=True):
+        self.stream = args.get('stream', type=str)
+        self.page_size = args.get('page_size', type=int)
+        after = args.get('after', type=str)
+        self.after = decode_token(after) if after else None
+        self.limit = args.get('limit', default=None if self.stream else default_limit, type=int)
+        self.format = args.get('format', default='objects', type=str)
+
+        if not pageable and (self.page_size is not None or self.after is not None):
+            raise ValueError('this route does not support page_size/after pagination')
+        if self.stream is not None and self.stream not in STREAM_FORMATS:
+            raise ValueError(f"stream must be one of {', '.join(STREAM_FORMATS)}")
+        if self.stream and self.page_size is not None:
+            raise ValueError('page_size cannot be combined with stream')
+        if self.format not in ROW_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(ROW_FORMATS)}")
+        if self.stream and self.format != 'objects':
+            raise ValueError('format=columns cannot be combined with stream')
+        if self.page_size is not None and not 0 < self.page_size <= config['max_page_size']:
+            raise ValueError(f"page_size must be between 1 and {config['max_page_size']}")
+        if not self.stream and self.page_size is None and self.limit is not None \
+                and self.limit > config['max_buffered_limit']:
+            raise ValueError(f"limit above {config['max_buffered_limit']} needs stream=ndjson "
+                             "or page_size pagination")
+
+    @property
+    def sql_limit(self):
+        # One extra row tells a page whether another one follows
+        if self.page_size is not None:
+            return self.page_size + 1
+        return self.limit
+
+    def body(self, rows):
+        """Buffered response body: a keyset page when page_size was given, else the plain list"""
+        if self.page_size is not None:
+            page = page_response(rows, self.page_size)
+            if self.format == 'columns':
+                page['results'] = columns_body(page['results'])
+            return page
+        return columns_body(rows) if self.format == 'columns' else rows
+
+    def keyset(self, popularity_column, id_column):
+        """SQL fragment and params restricting rows to those after the page token"""
+        if self.after is None:
+            return '', []
+        return f'AND ({popularity_column}, {id_column}) < (%s, %s)', list(self.after)
+
+
+def page_response(rows, page_size):
+    """Body of a keyset page: the rows plus the token for the next page (None on the last one)"""
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    last = rows[-1] if rows else None
+    return {
+        'results': rows,
+        'next': encode_token(last['popularity'], last['spotify_id']) if has_more else None,
+    }
+
+
+def stream_response(pool, query, params, fmt, dumps, fetch_size=2000):
+    """
+    Stream query results as NDJSON lines or as a chunked JSON array.
+
+    The rows come through a server-side (named) cursor fetch_size at a time on
+    a connection the generator checks out itself - the request's own
+    connection is handed back at teardown, before the body has been sent -
+    so memory stays flat however many rows the query returns.
+    The query runs before this returns, so its errors still reach the route.
+    """
+    def generate():
+        with pool.connection() as conn:
+            cursor = conn.cursor(name=f'stream_{uuid4().hex}', cursor_factory=RealDictCursor)
+            cursor.itersize = fetch_size
+            cursor.execute(query, params)
+            # Parked here until the body is sent; closing the response closes the generator,
+            # which hands the connection back even if the client disconnects mid-stream
+            yield ''
+            if fmt == 'ndjson':
+                for row in cursor:
+                    yield dumps(row) + '\n'
+            else:
+                yield '['
+                for i, row in enumerate(cursor):
+                    yield (',' if i else '') + dumps(row)
+                yield ']'
+            cursor.close()
+            conn.rollback()
+
+    body = generate()
+    next(body)
+    return Response(body, mimetype=STREAM_FORMATS[fmt])
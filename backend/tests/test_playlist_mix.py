@@ -0,0 +1,63 @@
+# test_playlist_mix.py
+# parse_mix_spec / check_mix_counts: no database needed
+
+import pytest
+
+from playlist_mix import check_mix_counts, parse_mix_spec
+
+
+def test_counts():
+    assert parse_mix_spec('hits:15,gems:10') == [('hits', 15), ('gems', 10)]
+
+
+def test_proportions_scale_to_size():
+    parts = parse_mix_spec('hits:1,gems:1,workout:1', size=10)
+    assert sum(count for _, count in parts) == 10
+    assert all(count in (3, 4) for _, count in parts)
+
+
+@pytest.mark.parametrize('spec', ['hits:inf', 'hits:-inf', 'hits:nan', 'hits:10,gems:inf'])
+def test_non_finite_amounts_rejected(spec):
+    with pytest.raises(ValueError):
+        parse_mix_spec(spec)
+    with pytest.raises(ValueError):
+        parse_mix_spec(spec, size=10)
+
+
+def test_huge_proportions_rejected():
+    with pytest.raises(ValueError):
+        parse_mix_spec('hits:1e308,gems:1e308', size=10)
+
+
+@pytest.mark.parametrize('size', [0, -5])
+def test_size_below_one_rejected(size):
+    with pytest.raises(ValueError):
+        parse_mix_spec('hits:1,gems:2', size=size)
+
+
+def test_size_capped():
+    assert sum(count for _, count in parse_mix_spec('hits:1', size=5000, max_tracks=5000)) == 5000
+    with pytest.raises(ValueError):
+        parse_mix_spec('hits:1', size=5001, max_tracks=5000)
+
+
+def test_total_count_capped():
+    with pytest.raises(ValueError):
+        parse_mix_spec('hits:1e12', max_tracks=5000)
+    with pytest.raises(ValueError):
+        parse_mix_spec('hits:3000,gems:3000', max_tracks=5000)
+    assert parse_mix_spec('hits:2500,gems:2500', max_tracks=5000) == [('hits', 2500), ('gems', 2500)]
+
+
+@pytest.mark.parametrize('spec', ['hits:-1', 'hits:abc', 'hits', 'nope:5', 'hits:1,hits:2'])
+def test_malformed_specs_rejected(spec):
+    with pytest.raises(ValueError):
+        parse_mix_spec(spec)
+
+
+def test_check_mix_counts():
+    assert check_mix_counts([('hits', 15), ('gems', 15)], max_tracks=5000) == [('hits', 15), ('gems', 15)]
+    with pytest.raises(ValueError):
+        check_mix_counts([('hits', -5), ('gems', 15)])
+    with pytest.raises(ValueError):
+        check_mix_counts([('hits', 5000), ('gems', 1)], max_tracks=5000)
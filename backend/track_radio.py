@@ -0,0 +1,337 @@
+# track_radio.py
+# "Track radio": nearest tracks to one or more seed tracks in z-scored audio-feature
+# space, through an inverted-file (IVF) index trained offline by k-means
+#
+#   python3 backend/track_radio.py --output backend/radio_index.npz --evaluate
+#
+# The server loads the file when the feature store loads; tracks added since the
+# build are assigned to their nearest list, so the file only needs rebuilding when
+# the feature distribution shifts.
+
+import argparse
+import os
+import time
+
+import numpy as np
+from psycopg2.extensions import parse_dsn
+
+from config import DB_CONFIG, FEATURE_STORE_CONFIG
+from db_pool import ConnectionPool
+from feature_store import FEATURE_COLUMNS, FEATURE_INDEX, FeatureStore, to_json_float
+
+CHARTED_QUERY = "SELECT DISTINCT spotify_id FROM song_join;"
+
+# Rows per block when computing distances to every centroid
+ASSIGN_BLOCK = 4096
+
+# Features echoed back with each radio track
+RESULT_COLUMNS = ['tempo', 'energy', 'danceability', 'valence']
+
+
+def nearest_centroids(vectors, centroids):
+    """Index of the closest centroid for every row of vectors"""
+    assign = np.empty(len(vectors), dtype=np.int32)
+    norms = np.einsum('ij,ij->i', centroids, centroids)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        block = vectors[start:start + ASSIGN_BLOCK]
+        # |x - c|^2 without the |x|^2 term, which is the same for every centroid
+        assign[start:start + len(block)] = np.argmin(norms - 2 * block @ centroids.T, axis=1)
+    return assign
+
+
+def kmeans(vectors, n_lists, iterations, rng, sample_per_list=256):
+    """Lloyd's k-means on a sample of vectors; empty clusters are reseeded from the sample"""
+    sample = vectors
+    if len(vectors) > n_lists * sample_per_list:
+        sample = vectors[rng.choice(len(vectors), n_lists * sample_per_list, replace=False)]
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assign = nearest_centroids(sample, centroids)
+        counts = np.bincount(assign, minlength=n_lists)
+        sums = np.stack([np.bincount(assign, weights=sample[:, d], minlength=n_lists)
+                         for d in range(sample.shape[1])], axis=1)
+        empty = counts == 0
+        centroids[~empty] = (sums[~empty] / counts[~empty, None]).astype(np.float32)
+        if empty.any():
+            centroids[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    """
+    The offline part: normalization, k-means centroids and which tracks
+    (by spotify_id) sit in each centroid's list. Saved as a .npz file.
+    """
+
+    def __init__(self, mean, scale, centroids, list_offsets, spotify_ids, built_at=None):
+        self.mean = mean
+        self.scale = scale
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.spotify_ids = spotify_ids
+        self.built_at = built_at
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    def normalize(self, features):
+        """z-scored float32 copy of an n x 9 feature matrix; NULL features sit at the mean"""
+        vectors = ((features - self.mean) / self.scale).astype(np.float32)
+        vectors[np.isnan(vectors)] = 0.0
+        return vectors
+
+    @classmethod
+    def build(cls, data, n_lists=None, iterations=20, seed=0):
+        """Train on every track of a FeatureData snapshot"""
+        features = data.features.astype(np.float64)
+        mean = np.nanmean(features, axis=0)
+        scale = np.nanstd(features, axis=0)
+        scale[~(scale > 0)] = 1.0
+        # About 4 * sqrt(n) lists keeps lists short while the centroid scan stays cheap
+        n_lists = min(n_lists or max(1, int(4 * np.sqrt(data.size))), max(data.size, 1))
+        index = cls(mean, scale, None, None, None, built_at=time.time())
+        vectors = index.normalize(data.features)
+        rng = np.random.default_rng(seed)
+        index.centroids = kmeans(vectors, n_lists, iterations, rng)
+        assign = nearest_centroids(vectors, index.centroids)
+        order = np.argsort(assign, kind='stable')
+        index.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=n_lists))))
+        index.spotify_ids = data.spotify_ids[order].astype(str)
+        return index
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez(f, mean=self.mean, scale=self.scale, centroids=self.centroids,
+                     list_offsets=self.list_offsets, spotify_ids=self.spotify_ids,
+                     columns=np.array(FEATURE_COLUMNS), built_at=np.array(self.built_at))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as f:
+            if f['columns'].tolist() != FEATURE_COLUMNS:
+                raise ValueError(f'{path} was built over different feature columns')
+            return cls(f['mean'], f['scale'], f['centroids'], f['list_offsets'], f['spotify_ids'],
+                       built_at=float(f['built_at']))
+
+
+class RadioIndex:
+    """
+    An IVFIndex bound to the current FeatureData: each list as row numbers,
+    with the normalized vectors, genre codes and charted flags copied into
+    list order so that probing a list reads contiguous memory.
+    """
+
+    def __init__(self, ivf, data, charted_ids):
+        self.ivf = ivf
+        self.data = data
+        self.vectors = ivf.normalize(data.features)
+
+        # Keep the offline list membership; tracks the file has not seen go to their nearest list
+        assign = np.full(data.size, -1, dtype=np.int32)
+        list_of = np.repeat(np.arange(ivf.n_lists, dtype=np.int32), np.diff(ivf.list_offsets))
+        for spotify_id, list_no in zip(ivf.spotify_ids.tolist(), list_of.tolist()):
+            row = data.row_of.get(spotify_id)
+            if row is not None:
+                assign[row] = list_no
+        unseen = np.flatnonzero(assign < 0)
+        if len(unseen):
+            assign[unseen] = nearest_centroids(self.vectors[unseen], ivf.centroids)
+        self.unseen = len(unseen)
+
+        self.rows = np.argsort(assign, kind='stable')
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=ivf.n_lists))))
+        self.list_vectors = np.ascontiguousarray(self.vectors[self.rows])
+        self.list_genres = data.genre_codes[self.rows]
+        charted = np.zeros(data.size, dtype=bool)
+        rows = [data.row_of[sid] for sid in charted_ids if sid in data.row_of]
+        charted[rows] = True
+        self.charted = charted
+        self.list_charted = charted[self.rows]
+
+    def search(self, seed_rows, k, n_probe, genre_code=None, charted=None):
+        """
+        The k tracks nearest the mean of the seeds' vectors, as (rows, distances,
+        {'lists_probed', 'candidates'}).
+        Lists are probed nearest-centroid first: n_probe of them, or more if the
+        filters left fewer than k candidates. Genre/charted filters are checked
+        per list before any distance is computed, so a narrow filter widens the
+        probe instead of returning a short result.
+        """
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0), {'lists_probed': 0, 'candidates': 0}
+        query = self.vectors[seed_rows].mean(axis=0)
+        gaps = self.ivf.centroids - query
+        list_order = np.argsort(np.einsum('ij,ij->i', gaps, gaps))
+        seeds = np.unique(np.asarray(seed_rows, dtype=np.int64))
+
+        positions = []
+        found = 0
+        probed = 0
+        for list_no in list_order.tolist():
+            if probed >= n_probe and found >= k:
+                break
+            probed += 1
+            start, end = int(self.offsets[list_no]), int(self.offsets[list_no + 1])
+            if start == end:
+                continue
+            keep = np.ones(end - start, dtype=bool)
+            if genre_code is not None:
+                keep &= self.list_genres[start:end] == genre_code
+            if charted is not None:
+                keep &= self.list_charted[start:end] == charted
+            keep &= ~np.isin(self.rows[start:end], seeds)
+            chosen = np.flatnonzero(keep) + start
+            positions.append(chosen)
+            found += len(chosen)
+
+        positions = np.concatenate(positions) if positions else np.empty(0, dtype=np.int64)
+        diff = self.list_vectors[positions] - query
+        dists = np.einsum('ij,ij->i', diff, diff)
+        if len(positions) > k:
+            best = np.argpartition(dists, k - 1)[:k]
+            positions, dists = positions[best], dists[best]
+        order = np.lexsort((self.rows[positions], dists))
+        return self.rows[positions[order]], np.sqrt(dists[order]), {'lists_probed': probed, 'candidates': found}
+
+    def exact(self, seed_rows, k):
+        """Brute-force neighbours over every track, for measuring recall"""
+        query = self.vectors[seed_rows].mean(axis=0)
+        diff = self.vectors - query
+        dists = np.einsum('ij,ij->i', diff, diff)
+        dists[seed_rows] = np.inf
+        best = np.argpartition(dists, k - 1)[:k] if len(dists) > k else np.arange(len(dists))
+        return best[np.lexsort((best, dists[best]))]
+
+    def track(self, row, distance=None):
+        data = self.data
+        result = {
+            'spotify_id': data.spotify_ids[row],
+            'track_name': data.track_names[row],
+            'artist_name': data.artist_names[int(data.artist_ids[row])],
+            'genre_name': data.genre_name(row),
+            'popularity': int(data.popularity[row]),
+            'charted': bool(self.charted[row]),
+        }
+        for column in RESULT_COLUMNS:
+            result[column] = to_json_float(data.features[row, FEATURE_INDEX[column]])
+        if distance is not None:
+            result['distance'] = round(float(distance), 4)
+        return result
+
+    def status(self):
+        return {
+            'lists': self.ivf.n_lists,
+            'tracks': int(self.offsets[-1]),
+            'unseen_tracks': self.unseen,
+            'built_at': self.ivf.built_at,
+        }
+
+
+class RadioStore:
+    """
+    Holds the current RadioIndex, rebuilt from the offline file whenever the
+    feature store reloads. Without a file it trains one in memory (slower start).
+    """
+
+    def __init__(self, pool, path, n_lists=None):
+        self.pool = pool
+        self.path = path
+        self.n_lists = n_lists
+        self.index = None
+        self.source = None
+        self.last_error = None
+
+    def rebuild(self, data):
+        # A broken index file must not take the feature store down with it
+        try:
+            if os.path.exists(self.path):
+                ivf = IVFIndex.load(self.path)
+                source = self.path
+            else:
+                print(f"No radio index at {self.path}; training one in memory "
+                      "(build it offline with track_radio.py)")
+                ivf = IVFIndex.build(data, self.n_lists)
+                source = 'memory'
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(CHARTED_QUERY)
+                charted_ids = [row[0] for row in cursor.fetchall()]
+                cursor.close()
+                conn.commit()
+            self.index = RadioIndex(ivf, data, charted_ids)
+            self.source = source
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Radio index build failed: {e}")
+        return self.index
+
+    def status(self):
+        index = self.index
+        status = index.status() if index is not None else {}
+        status.update(ready=index is not None, source=self.source, last_error=self.last_error)
+        return status
+
+
+def evaluate(index, k, probes, queries, rng):
+    """Recall@k and mean latency against brute force, for each n_probe"""
+    seeds = rng.choice(index.data.size, min(queries, index.data.size), replace=False)
+    truth = [set(index.exact([seed], k).tolist()) for seed in seeds]
+    results = []
+    for n_probe in probes:
+        hits = 0
+        started = time.perf_counter()
+        for seed, expected in zip(seeds, truth):
+            rows, _, _ = index.search([seed], k, n_probe)
+            hits += len(expected.intersection(rows.tolist()))
+        seconds = time.perf_counter() - started
+        results.append({
+            'n_probe': n_probe,
+            'recall': round(hits / max(sum(len(t) for t in truth), 1), 4),
+            'mean_ms': round(seconds * 1000 / len(seeds), 3),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the track radio IVF index from the database')
+    parser.add_argument('--dsn', help='libpq connection string (default: DB_CONFIG)')
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                         'radio_index.npz'),
+                        help='where to write the index (default backend/radio_index.npz)')
+    parser.add_argument('--lists', type=int, help='number of IVF lists (default about 4 * sqrt(tracks))')
+    parser.add_argument('--iterations', type=int, default=20, help='k-means iterations')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--evaluate', action='store_true', help='report recall and latency per n_probe')
+    parser.add_argument('--k', type=int, default=25, help='neighbours per query when evaluating')
+    parser.add_argument('--queries', type=int, default=200, help='random seed tracks when evaluating')
+    parser.add_argument('--probes', default='1,2,4,8,16,32,64', help='n_probe values to evaluate')
+    args = parser.parse_args()
+
+    pool = ConnectionPool(parse_dsn(args.dsn) if args.dsn else DB_CONFIG, min_size=0, max_size=1)
+    try:
+        store = FeatureStore(fetch_size=FEATURE_STORE_CONFIG['fetch_size'])
+        data = store.load(pool)
+        print(f"Loaded {data.size} tracks in {store.load_seconds:.2f}s")
+
+        started = time.perf_counter()
+        ivf = IVFIndex.build(data, args.lists, args.iterations, args.seed)
+        sizes = np.diff(ivf.list_offsets)
+        print(f"Trained {ivf.n_lists} lists in {time.perf_counter() - started:.2f}s "
+              f"(list sizes: median {int(np.median(sizes))}, max {int(sizes.max())})")
+        ivf.save(args.output)
+        print(f"Index written to {args.output}")
+
+        if args.evaluate:
+            index = RadioIndex(ivf, data, [])
+            probes = [int(p) for p in args.probes.split(',')]
+            print(f"\n{'n_probe':>8} {'recall@' + str(args.k):>10} {'mean ms':>9}")
+            for result in evaluate(index, args.k, probes, args.queries, np.random.default_rng(args.seed)):
+                print(f"{result['n_probe']:>8} {result['recall']:>10} {result['mean_ms']:>9}")
+    finally:
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,151 +1,830 @@
-import pandas as pd
-import numpy as np
+import argparse
+import json
+import os
 import re
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
-# Load data
-print("Loading datasets")
-spotify = pd.read_csv('SpotifyFeatures.csv')
-billboard = pd.read_csv('charts.csv')
-
-def normalize_text(text):
-    if pd.isna(text):
-        return ""
-    text = str(text).lower().strip()
-    text = re.sub(r'\([^)]*\)', '', text)
-    text = re.sub(r'\b(feat|ft|featuring)\.?\b.*', '', text, flags=re.IGNORECASE)
-    text = re.sub(r'[^\w\s]', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+import pandas as pd
+import numpy as np
 
-# Clean Spotify 
-print("Cleaning Spotify data")
-spotify = spotify.dropna(subset=['track_id', 'track_name', 'artist_name'])  # Remove rows with missing essential fields
-spotify = spotify.drop_duplicates(subset=['track_id'])
-spotify['normalized_track_name'] = spotify['track_name'].apply(normalize_text)
-spotify['normalized_artist_name'] = spotify['artist_name'].apply(normalize_text)
-spotify['popularity'] = spotify['popularity'].fillna(0).astype(int)
-spotify['duration_ms'] = spotify['duration_ms'].fillna(0).astype(int)
-spotify['explicit'] = False
-
-# Fill numeric audio feature NaNs with 0
-audio_cols = ['tempo', 'danceability', 'energy', 'loudness', 'valence', 
+AUDIO_COLS = ['tempo', 'danceability', 'energy', 'loudness', 'valence',
               'acousticness', 'speechiness', 'instrumentalness', 'liveness']
-for col in audio_cols:
-    spotify[col] = spotify[col].fillna(0)
 
-# Clean Billboard
-print("Cleaning Billboard data...")
-billboard = billboard.rename(columns={
+BILLBOARD_RENAMES = {
     'date': 'chart_date',
     'rank': 'chart_rank',
     'last-week': 'last_week',
     'peak-rank': 'peak_rank',
     'weeks-on-board': 'weeks_on_board'
-})
-billboard['chart_date'] = pd.to_datetime(billboard['chart_date'], errors='coerce')
-billboard = billboard.dropna(subset=['chart_date'])  # Remove rows with invalid dates
-billboard['normalized_song'] = billboard['song'].apply(normalize_text)
-billboard['normalized_artist'] = billboard['artist'].apply(normalize_text)
-billboard['last_week'] = pd.to_numeric(billboard['last_week'], errors='coerce').fillna(0).astype(int)
-billboard['peak_rank'] = pd.to_numeric(billboard['peak_rank'], errors='coerce').fillna(0).astype(int)
-billboard['weeks_on_board'] = pd.to_numeric(billboard['weeks_on_board'], errors='coerce').fillna(0).astype(int)
-billboard['chart_rank'] = pd.to_numeric(billboard['chart_rank'], errors='coerce').fillna(0).astype(int)
-
-# Create output directory
-import os
-os.makedirs('cleaned_data', exist_ok=True)
-
-# Artists
-print("Creating Artists table...")
-artists = spotify[['artist_name', 'normalized_artist_name']].drop_duplicates()
-artists = artists.reset_index(drop=True)
-artists['artist_id'] = artists.index + 1
-artists = artists[['artist_id', 'artist_name', 'normalized_artist_name']]
-artists.to_csv('cleaned_data/artists.csv', index=False)
-
-# Tracks (with artist_id)
-print("Creating Tracks table...")
-spotify_with_id = spotify.merge(artists[['artist_name', 'artist_id']], on='artist_name', how='left')
-tracks = spotify_with_id[['track_id', 'track_name', 'normalized_track_name', 
-                           'artist_id', 'popularity', 'duration_ms', 'explicit']].copy()
-tracks = tracks.rename(columns={'track_id': 'spotify_id'})
-tracks.to_csv('cleaned_data/tracks.csv', index=False)
-
-# Get valid spotify_ids for foreign key references
-valid_spotify_ids = set(tracks['spotify_id'].values)
-
-# Audio Features (only for valid spotify_ids)
-print("Creating Audio_Features table...")
-audio_features = spotify_with_id[['track_id'] + audio_cols].copy()
-audio_features = audio_features.rename(columns={'track_id': 'spotify_id'})
-audio_features = audio_features[audio_features['spotify_id'].isin(valid_spotify_ids)]  # Only valid IDs
-audio_features.to_csv('cleaned_data/audio_features.csv', index=False)
-
-# Genres
-print("Creating Genres table...")
-genres = pd.DataFrame({
-    'genre_id': range(1, len(spotify['genre'].dropna().unique()) + 1),
-    'genre_name': spotify['genre'].dropna().unique()
-})
-genres.to_csv('cleaned_data/genres.csv', index=False)
-
-# Track Genres (only for valid spotify_ids)
-print("Creating Track_Genres table...")
-genre_lookup = dict(zip(genres['genre_name'], genres['genre_id']))
-track_genres_list = []
-for idx, row in spotify_with_id.iterrows():
-    if pd.notna(row['genre']) and row['track_id'] in valid_spotify_ids:
-        track_genres_list.append({
-            'track_genre_id': len(track_genres_list) + 1,
-            'spotify_id': row['track_id'],
-            'genre_id': genre_lookup[row['genre']]
+}
+
+# Column order of every output table (matches the \copy lines in setup.sql)
+TABLE_COLUMNS = {
+    'artists': ['artist_id', 'artist_name', 'normalized_artist_name'],
+    'tracks': ['spotify_id', 'track_name', 'normalized_track_name', 'artist_id', 'popularity', 'duration_ms', 'explicit'],
+    'audio_features': ['spotify_id'] + AUDIO_COLS,
+    'genres': ['genre_id', 'genre_name'],
+    'track_genres': ['track_genre_id', 'spotify_id', 'genre_id'],
+    'billboard_charts': ['chart_id', 'chart_date', 'chart_rank', 'song_title', 'artist_name', 'last_week', 'peak_rank', 'weeks_on_board'],
+    'song_join': ['join_id', 'spotify_id', 'chart_id', 'clean_song_title', 'clean_artist_name', 'match_score'],
+    'track_chart_summary': ['spotify_id', 'best_rank', 'total_weeks', 'max_weeks_on_board',
+                            'first_chart_date', 'last_chart_date', 'charted_years'],
+    'track_chart_years': ['spotify_id', 'chart_year', 'best_rank', 'weeks'],
+    'users': ['user_id', 'username', 'email'],
+    'playlists': ['playlist_id', 'user_id', 'name', 'created_at'],
+    'playlist_tracks': ['playlist_track_id', 'playlist_id', 'spotify_id', 'position', 'added_at'],
+}
+
+# Compact dtypes for --chunked mode; only the columns the tables need are read
+SPOTIFY_DTYPES = {
+    'genre': 'category',
+    'artist_name': 'category',
+    'track_name': object,
+    'track_id': object,
+    'popularity': 'float32',
+    'duration_ms': 'float64',
+    **{col: 'float32' for col in AUDIO_COLS}
+}
+CHARTS_DTYPES = {
+    'date': object,
+    'rank': 'float32',
+    'song': object,
+    'artist': object,
+    'last-week': 'float32',
+    'peak-rank': 'float32',
+    'weeks-on-board': 'float32'
+}
+
+
+class StageTimer:
+    """Collects wall-clock time per ETL stage and prints a report at the end"""
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        print(f"{name}...")
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - started))
+
+    def report(self):
+        total = sum(seconds for _, seconds in self.stages)
+        width = max([len(name) for name, _ in self.stages] + [5])
+        print("\nTiming report")
+        for name, seconds in self.stages:
+            share = 100 * seconds / total if total else 0
+            print(f"  {name:<{width}}  {seconds:8.2f}s  {share:5.1f}%")
+        print(f"  {'total':<{width}}  {total:8.2f}s")
+
+    def to_dict(self):
+        return {name: round(seconds, 4) for name, seconds in self.stages}
+
+
+class CsvTableWriter:
+    """Appends DataFrame chunks to one CSV file, writing the header once"""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.rows = 0
+        pd.DataFrame(columns=columns).to_csv(path, index=False)
+
+    def write(self, df):
+        df[self.columns].to_csv(self.path, mode='a', header=False, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        pass
+
+
+class CsvSink:
+    """Writes each output table to <out_dir>/<table>.csv"""
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+
+    def open_table(self, table):
+        return CsvTableWriter(f'{self.out_dir}/{table}.csv', TABLE_COLUMNS[table])
+
+    def write_table(self, table, df):
+        df[TABLE_COLUMNS[table]].to_csv(f'{self.out_dir}/{table}.csv', index=False)
+
+    def close(self):
+        pass
+
+
+def make_sink(args):
+    """CSV files, direct Postgres COPY, or both, depending on --output"""
+    sinks = []
+    if args.output in ('csv', 'both'):
+        sinks.append(CsvSink(args.out_dir))
+    if args.output in ('postgres', 'both'):
+        from db_load import PostgresSink
+        sinks.append(PostgresSink(args.dsn, TABLE_COLUMNS, truncate=not args.append,
+                                  workers=args.load_workers, schema_file=args.apply_schema))
+    if len(sinks) == 1:
+        return sinks[0]
+    from db_load import MultiSink
+    return MultiSink(sinks)
+
+
+def finish_output(sink, args, timer):
+    with timer.stage("Finishing output"):
+        sink.close()
+    if args.output != 'csv' and args.notify_url:
+        from db_load import notify_backend
+        notify_backend(args.notify_url)
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (Linux /proc, else peak RSS)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux and bytes on macOS
+    return peak / 2 ** 20 if peak > 2 ** 32 else peak / 2 ** 10
+
+
+class ChunkSizer:
+    """
+    Picks the rows-per-chunk for --chunked mode. The size is halved whenever
+    the process RSS goes over the memory budget after a chunk, and doubled
+    again (up to the starting size) once RSS is comfortably below it.
+
+    Part of the RSS does not depend on the chunk size: the interpreter, the
+    id lookups, and heap the allocator keeps after a large chunk. If a halving
+    does not bring RSS down, the budget is below that fixed footprint.
+    Shrinking further would then only cost time, so the size goes back to
+    where it was, and a warning is printed once.
+    """
+
+    BYTES_PER_ROW = 2048    # rough in-memory cost of one row through all cleaning steps
+    MIN_ROWS = 1000
+    GROW_BELOW = 0.75       # grow back once RSS is under this fraction of the budget
+
+    def __init__(self, budget_mb, rows=None):
+        self.budget_mb = budget_mb
+        if rows is None:
+            # A quarter of the budget for the chunk itself; the rest covers the
+            # interpreter, lookup tables and pandas temporaries
+            rows = int(budget_mb * 2 ** 20 / 4 / self.BYTES_PER_ROW)
+        self.rows = self.max_rows = max(self.MIN_ROWS, rows)
+        self.peak_mb = 0.0
+        self.fixed_footprint = False
+        self._shrunk = None     # (rows before, RSS) of the last halving
+        start_mb = current_rss_mb()
+        if start_mb >= budget_mb:
+            self._over_footprint(f"RSS is {start_mb:.0f} MB before the first chunk")
+
+    def _over_footprint(self, reason):
+        self.fixed_footprint = True
+        print(f"  Warning: {reason}; the {self.budget_mb} MB budget is below the fixed footprint, "
+              f"continuing at {self.rows} rows per chunk")
+
+    def after_chunk(self):
+        rss = current_rss_mb()
+        self.peak_mb = max(self.peak_mb, rss)
+        if rss > self.budget_mb:
+            if self.fixed_footprint:
+                return
+            if self._shrunk is not None and rss >= self._shrunk[1]:
+                self.rows = self._shrunk[0]
+                self._shrunk = None
+                self._over_footprint(f"RSS {rss:.0f} MB does not come down with smaller chunks")
+            elif self.rows > self.MIN_ROWS:
+                self._shrunk = (self.rows, rss)
+                self.rows = max(self.MIN_ROWS, self.rows // 2)
+                print(f"  RSS {rss:.0f} MB is over the {self.budget_mb} MB budget, chunk size now {self.rows} rows")
+        else:
+            self._shrunk = None
+            if rss < self.budget_mb * self.GROW_BELOW and self.rows < self.max_rows:
+                self.rows = min(self.max_rows, self.rows * 2)
+
+
+def read_chunks(path, sizer, **kwargs):
+    """Yield DataFrame chunks whose size follows sizer.rows as it adapts"""
+    with pd.read_csv(path, iterator=True, **kwargs) as reader:
+        while True:
+            try:
+                chunk = reader.get_chunk(sizer.rows)
+            except StopIteration:
+                return
+            yield chunk
+            sizer.after_chunk()
+
+
+# Normalizer memo size in --chunked mode (distinct strings, about 200 bytes each)
+CHUNKED_MEMO_ENTRIES = 100_000
+
+
+# Text normalization
+_PARENS = re.compile(r'\([^)]*\)')
+_FEAT = re.compile(r'\b(feat|ft|featuring)\.?\b.*', flags=re.IGNORECASE)
+_PUNCT = re.compile(r'[^\w\s]')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    if pd.isna(text):
+        return ""
+    text = str(text).lower().strip()
+    text = _PARENS.sub('', text)
+    text = _FEAT.sub('', text)
+    text = _PUNCT.sub('', text)
+    text = _SPACES.sub(' ', text).strip()
+    return text
+
+
+def normalize_strings(values):
+    """Vectorized normalize_text over a Series of non-null values"""
+    text = values.astype(str).str.lower().str.strip()
+    text = text.str.replace(_PARENS, '', regex=True)
+    text = text.str.replace(_FEAT, '', regex=True)
+    text = text.str.replace(_PUNCT, '', regex=True)
+    text = text.str.replace(_SPACES, ' ', regex=True).str.strip()
+    return text
+
+
+class Normalizer:
+    """
+    Normalizes each distinct string once. Columns are factorized, only the
+    uniques not seen before are normalized, and results are mapped back by code.
+    With max_entries the memo is emptied whenever it would grow past that many
+    strings, so it stays bounded however large the input is.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self.memo = {}
+
+    def clear(self):
+        self.memo = {}
+
+    def __call__(self, series):
+        codes, uniques = pd.factorize(series)
+        uniques = uniques.tolist()
+        missing = [value for value in uniques if value not in self.memo]
+        if self.max_entries is not None and len(self.memo) + len(missing) > self.max_entries:
+            self.clear()
+            missing = uniques
+        if missing:
+            missing = pd.Series(missing, dtype=object)
+            self.memo.update(zip(missing.tolist(), normalize_strings(missing).tolist()))
+        normalized = np.array([self.memo[value] for value in uniques] + [""], dtype=object)
+        # factorize marks NaN with code -1, which picks the trailing "" above
+        return pd.Series(normalized[codes], index=series.index)
+
+
+def legacy_normalize(series):
+    """Original row-by-row normalization, kept for --legacy timing comparisons"""
+    return series.apply(normalize_text)
+
+
+# Cleaning
+def clean_spotify(spotify, normalize):
+    spotify = spotify.dropna(subset=['track_id', 'track_name', 'artist_name'])  # Remove rows with missing essential fields
+    spotify = spotify.drop_duplicates(subset=['track_id'])
+    spotify['normalized_track_name'] = normalize(spotify['track_name'])
+    spotify['normalized_artist_name'] = normalize(spotify['artist_name'])
+    spotify['popularity'] = spotify['popularity'].fillna(0).astype(int)
+    spotify['duration_ms'] = spotify['duration_ms'].fillna(0).astype(int)
+    spotify['explicit'] = False
+
+    # Fill numeric audio feature NaNs with 0
+    for col in AUDIO_COLS:
+        spotify[col] = spotify[col].fillna(0)
+    return spotify
+
+
+def clean_billboard(billboard, normalize):
+    billboard = billboard.rename(columns=BILLBOARD_RENAMES)
+    billboard['chart_date'] = pd.to_datetime(billboard['chart_date'], errors='coerce')
+    billboard = billboard.dropna(subset=['chart_date'])  # Remove rows with invalid dates
+    billboard['normalized_song'] = normalize(billboard['song'])
+    billboard['normalized_artist'] = normalize(billboard['artist'])
+    for col in ['last_week', 'peak_rank', 'weeks_on_board', 'chart_rank']:
+        billboard[col] = pd.to_numeric(billboard[col], errors='coerce').fillna(0).astype(int)
+    return billboard
+
+
+# Table builders
+def build_artists(spotify):
+    artists = spotify[['artist_name', 'normalized_artist_name']].drop_duplicates()
+    artists = artists.reset_index(drop=True)
+    artists['artist_id'] = artists.index + 1
+    return artists[['artist_id', 'artist_name', 'normalized_artist_name']]
+
+
+def build_tracks(spotify, artists):
+    spotify_with_id = spotify.merge(artists[['artist_name', 'artist_id']], on='artist_name', how='left')
+    tracks = spotify_with_id[['track_id', 'track_name', 'normalized_track_name',
+                               'artist_id', 'popularity', 'duration_ms', 'explicit']].copy()
+    tracks = tracks.rename(columns={'track_id': 'spotify_id'})
+    return spotify_with_id, tracks
+
+
+def build_audio_features(spotify_with_id, valid_spotify_ids):
+    audio_features = spotify_with_id[['track_id'] + AUDIO_COLS].copy()
+    audio_features = audio_features.rename(columns={'track_id': 'spotify_id'})
+    return audio_features[audio_features['spotify_id'].isin(valid_spotify_ids)]  # Only valid IDs
+
+
+def build_genres(spotify):
+    genre_names = spotify['genre'].dropna().unique()
+    return pd.DataFrame({
+        'genre_id': range(1, len(genre_names) + 1),
+        'genre_name': genre_names
+    })
+
+
+def build_track_genres(spotify_with_id, genres, valid_spotify_ids):
+    genre_lookup = pd.Series(genres['genre_id'].values, index=genres['genre_name'].values)
+    keep = spotify_with_id['genre'].notna() & spotify_with_id['track_id'].isin(valid_spotify_ids)
+    linked = spotify_with_id.loc[keep, ['track_id', 'genre']]
+    return pd.DataFrame({
+        'track_genre_id': np.arange(1, len(linked) + 1),
+        'spotify_id': linked['track_id'].values,
+        'genre_id': genre_lookup.reindex(linked['genre'].values).values
+    })
+
+
+def legacy_build_track_genres(spotify_with_id, genres, valid_spotify_ids):
+    """Original iterrows() construction, kept for --legacy timing comparisons"""
+    genre_lookup = dict(zip(genres['genre_name'], genres['genre_id']))
+    track_genres_list = []
+    for idx, row in spotify_with_id.iterrows():
+        if pd.notna(row['genre']) and row['track_id'] in valid_spotify_ids:
+            track_genres_list.append({
+                'track_genre_id': len(track_genres_list) + 1,
+                'spotify_id': row['track_id'],
+                'genre_id': genre_lookup[row['genre']]
+            })
+    return pd.DataFrame(track_genres_list)
+
+
+def build_billboard_charts(billboard):
+    billboard_charts = billboard[['chart_date', 'chart_rank', 'song', 'artist',
+                                   'last_week', 'peak_rank', 'weeks_on_board']].copy()
+    billboard_charts = billboard_charts.rename(columns={'song': 'song_title', 'artist': 'artist_name'})
+    billboard_charts.insert(0, 'chart_id', range(1, len(billboard_charts) + 1))
+    return billboard_charts
+
+
+def build_song_join(billboard, spotify_with_id, valid_spotify_ids):
+    billboard = billboard.assign(chart_id=range(1, len(billboard) + 1))
+
+    song_join = billboard[['chart_id', 'normalized_song', 'normalized_artist']].merge(
+        spotify_with_id[['track_id', 'normalized_track_name', 'normalized_artist_name']],
+        left_on=['normalized_song', 'normalized_artist'],
+        right_on=['normalized_track_name', 'normalized_artist_name'],
+        how='inner'
+    )
+
+    # Filter to only valid spotify_ids
+    song_join = song_join[song_join['track_id'].isin(valid_spotify_ids)]
+
+    song_join = song_join[['chart_id', 'track_id', 'normalized_song', 'normalized_artist']].rename(columns={
+        'track_id': 'spotify_id',
+        'normalized_song': 'clean_song_title',
+        'normalized_artist': 'clean_artist_name'
+    })
+    song_join.insert(0, 'join_id', range(1, len(song_join) + 1))
+    song_join['match_score'] = 1.0  # exact match
+    return song_join[TABLE_COLUMNS['song_join']]
+
+
+def build_track_chart_summary(matched_charts):
+    """
+    Per-track chart history, precomputed so the chart routes skip the song_join x
+    billboard_charts join. matched_charts has one row per song_join match with
+    spotify_id, chart_date, chart_rank and weeks_on_board.
+    Returns (track_chart_summary, track_chart_years).
+    """
+    matched_charts = matched_charts.assign(chart_year=matched_charts['chart_date'].dt.year.astype(int))
+
+    years = matched_charts.groupby(['spotify_id', 'chart_year'], sort=True).agg(
+        best_rank=('chart_rank', 'min'),
+        weeks=('chart_date', 'nunique')
+    ).reset_index()
+
+    summary = matched_charts.groupby('spotify_id', sort=True).agg(
+        best_rank=('chart_rank', 'min'),
+        total_weeks=('chart_date', 'nunique'),
+        max_weeks_on_board=('weeks_on_board', 'max'),
+        first_chart_date=('chart_date', 'min'),
+        last_chart_date=('chart_date', 'max')
+    ).reset_index()
+    # Postgres array literal, e.g. {1998,1999}
+    charted_years = years.groupby('spotify_id', sort=True)['chart_year'].agg(
+        lambda y: '{' + ','.join(map(str, y)) + '}')
+    summary['charted_years'] = charted_years.values
+    return summary[TABLE_COLUMNS['track_chart_summary']], years[TABLE_COLUMNS['track_chart_years']]
+
+
+def write_empty_tables(sink):
+    for table in ['users', 'playlists', 'playlist_tracks']:
+        sink.write_table(table, pd.DataFrame(columns=TABLE_COLUMNS[table]))
+
+
+def run(args):
+    timer = StageTimer()
+    normalize = legacy_normalize if args.legacy else Normalizer()
+
+    # Load data
+    with timer.stage("Loading datasets"):
+        spotify = pd.read_csv(args.spotify)
+        billboard = pd.read_csv(args.charts)
+
+    # Clean Spotify
+    with timer.stage("Cleaning Spotify data"):
+        spotify = clean_spotify(spotify, normalize)
+
+    # Clean Billboard
+    with timer.stage("Cleaning Billboard data"):
+        billboard = clean_billboard(billboard, normalize)
+
+    # Output target (cleaned_data/ CSVs and/or Postgres)
+    sink = make_sink(args)
+
+    with timer.stage("Creating Artists table"):
+        artists = build_artists(spotify)
+        sink.write_table('artists', artists)
+
+    with timer.stage("Creating Tracks table"):
+        spotify_with_id, tracks = build_tracks(spotify, artists)
+        sink.write_table('tracks', tracks)
+
+    # Get valid spotify_ids for foreign key references
+    valid_spotify_ids = set(tracks['spotify_id'].values)
+
+    with timer.stage("Creating Audio_Features table"):
+        audio_features = build_audio_features(spotify_with_id, valid_spotify_ids)
+        sink.write_table('audio_features', audio_features)
+
+    with timer.stage("Creating Genres table"):
+        genres = build_genres(spotify)
+        sink.write_table('genres', genres)
+
+    with timer.stage("Creating Track_Genres table"):
+        build = legacy_build_track_genres if args.legacy else build_track_genres
+        track_genres = build(spotify_with_id, genres, valid_spotify_ids)
+        sink.write_table('track_genres', track_genres)
+
+    with timer.stage("Creating Billboard_Charts table"):
+        billboard_charts = build_billboard_charts(billboard)
+        sink.write_table('billboard_charts', billboard_charts)
+
+    with timer.stage("Creating Song_Join table"):
+        song_join = build_song_join(billboard, spotify_with_id, valid_spotify_ids)
+
+    fuzzy_report = None
+    if args.fuzzy:
+        with timer.stage("Fuzzy matching Spotify-Billboard"):
+            from fuzzy_match import fuzzy_song_join
+            song_join, fuzzy_report = fuzzy_song_join(
+                billboard.assign(chart_id=range(1, len(billboard) + 1)),
+                spotify_with_id[spotify_with_id['track_id'].isin(valid_spotify_ids)],
+                song_join, threshold=args.fuzzy_threshold, workers=args.fuzzy_workers)
+    sink.write_table('song_join', song_join)
+
+    with timer.stage("Creating Track_Chart_Summary table"):
+        track_chart_summary, track_chart_years = build_track_chart_summary(
+            song_join[['spotify_id', 'chart_id']].merge(
+                billboard_charts[['chart_id', 'chart_date', 'chart_rank', 'weeks_on_board']], on='chart_id'))
+        sink.write_table('track_chart_summary', track_chart_summary)
+        sink.write_table('track_chart_years', track_chart_years)
+
+    # Empty tables for users/playlists
+    with timer.stage("Creating empty tables"):
+        write_empty_tables(sink)
+    finish_output(sink, args, timer)
+
+    print(f"\nDone!")
+    print(f"Created {len(artists)} artists")
+    print(f"Created {len(tracks)} tracks")
+    print(f"Created {len(audio_features)} audio features")
+    print(f"Created {len(genres)} genres")
+    print(f"Created {len(track_genres)} track-genre links")
+    print(f"Created {len(billboard_charts)} billboard entries")
+    print(f"Created {len(song_join)} Spotify-Billboard matches")
+    print(f"Created {len(track_chart_summary)} track chart summaries")
+
+    if fuzzy_report is not None:
+        from fuzzy_match import print_report
+        print_report(fuzzy_report)
+
+    timer.report()
+    if args.timing_json:
+        with open(args.timing_json, 'w') as f:
+            json.dump({
+                'mode': 'legacy' if args.legacy else 'vectorized',
+                'finished_at': datetime.now().isoformat(timespec='seconds'),
+                'stages': timer.to_dict(),
+                'fuzzy_matching': fuzzy_report
+            }, f, indent=2)
+
+
+# Chunked mode keeps per-track state as 64-bit hashes in sorted numpy arrays
+# rather than as Python strings. Two distinct keys sharing a hash is about a
+# 1 in 10^8 event at millions of tracks.
+def string_hashes(*columns):
+    """uint64 hash per row of one or more string columns"""
+    frame = pd.DataFrame({i: np.asarray(column, dtype=object) for i, column in enumerate(columns)})
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def sorted_lookup(sorted_hashes, hashes):
+    """(first, last) positions of each of hashes in sorted_hashes; last - first matches each"""
+    return (np.searchsorted(sorted_hashes, hashes, side='left'),
+            np.searchsorted(sorted_hashes, hashes, side='right'))
+
+
+class SeenHashes:
+    """Set of strings (track ids) kept as a sorted uint64 array, 8 bytes each"""
+
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def add_new(self, values):
+        """Mask of values not seen before (values must be unique); they are added"""
+        hashes = string_hashes(values)
+        first, last = sorted_lookup(self.hashes, hashes)
+        new = last == first
+        added = np.sort(hashes[new])
+        self.hashes = np.insert(self.hashes, np.searchsorted(self.hashes, added), added)
+        return new
+
+
+class MatchIndex:
+    """
+    (normalized track name, normalized artist name) -> spotify_id for matching
+    chart rows, built once from the Spotify chunks. Keys are kept as sorted
+    hashes next to fixed-width ids, about 30 bytes per track. Each Billboard
+    chunk is matched by binary search instead of a merge against every track.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self.hashes = None
+        self.ids = None
+
+    def add(self, spotify_ids, track_names, artist_names):
+        self._parts.append((string_hashes(track_names, artist_names),
+                            np.array(pd.Series(spotify_ids).str.encode('utf-8').tolist(), dtype='S')))
+
+    def freeze(self):
+        hashes = np.concatenate([h for h, _ in self._parts]) if self._parts else np.empty(0, dtype=np.uint64)
+        ids = np.concatenate([i for _, i in self._parts]) if self._parts else np.empty(0, dtype='S1')
+        self._parts = None
+        order = np.argsort(hashes, kind='stable')
+        self.hashes, self.ids = hashes[order], ids[order]
+
+    def match(self, songs, artists):
+        """(row in the chunk, position in the index) for every chart row x track match"""
+        first, last = sorted_lookup(self.hashes, string_hashes(songs, artists))
+        counts = last - first
+        rows = np.repeat(np.arange(len(counts)), counts)
+        # Each matched row covers positions first..last-1 of the sorted index
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return rows, np.repeat(first, counts) + offsets
+
+    def spotify_ids(self, positions):
+        return np.char.decode(self.ids[positions], 'utf-8').astype(object)
+
+
+def run_chunked(args):
+    """
+    Streaming variant of run(): both inputs are read in chunks with compact
+    dtypes and every table is written as it is produced. What stays in memory
+    is small per row and independent of the chunk size: the artist and genre
+    id lookups, hashes of the seen track ids, the MatchIndex, and the matched
+    chart rows (for the chart summary) as numpy columns.
+    """
+    timer = StageTimer()
+    # Track names rarely repeat, so an unbounded memo would hold every one of them
+    normalize = Normalizer(max_entries=CHUNKED_MEMO_ENTRIES)
+    sizer = ChunkSizer(args.memory_budget_mb, args.chunk_rows)
+    sink = make_sink(args)
+    print(f"Chunked mode: {sizer.rows} rows per chunk, {args.memory_budget_mb} MB budget")
+
+    artist_ids = {}         # artist_name -> artist_id
+    genre_ids = {}          # genre_name -> genre_id
+    seen_track_ids = SeenHashes()
+    match_index = MatchIndex()
+    track_genre_count = 0
+
+    with timer.stage("Streaming Spotify data"):
+        artists_out = sink.open_table('artists')
+        tracks_out = sink.open_table('tracks')
+        audio_out = sink.open_table('audio_features')
+        genres_out = sink.open_table('genres')
+        track_genres_out = sink.open_table('track_genres')
+
+        for chunk in read_chunks(args.spotify, sizer, usecols=list(SPOTIFY_DTYPES), dtype=SPOTIFY_DTYPES):
+            chunk = chunk.dropna(subset=['track_id', 'track_name', 'artist_name'])
+            chunk = chunk.drop_duplicates(subset=['track_id'])
+            chunk = chunk[seen_track_ids.add_new(chunk['track_id'])]
+            if chunk.empty:
+                continue
+
+            artist_names = chunk['artist_name'].astype(object)
+            chunk = chunk.assign(
+                artist_name=artist_names,
+                normalized_track_name=normalize(chunk['track_name']),
+                normalized_artist_name=normalize(artist_names),
+                popularity=chunk['popularity'].fillna(0).astype('int16'),
+                duration_ms=chunk['duration_ms'].fillna(0).astype('int32'),
+                explicit=False,
+                **{col: chunk[col].fillna(0) for col in AUDIO_COLS}
+            )
+
+            # Artists seen for the first time get the next ids, in file order
+            new_artists = chunk.drop_duplicates(subset=['artist_name'])
+            new_artists = new_artists[~new_artists['artist_name'].isin(artist_ids.keys())]
+            if len(new_artists):
+                first_id = len(artist_ids) + 1
+                new_artists = new_artists[['artist_name', 'normalized_artist_name']].assign(
+                    artist_id=np.arange(first_id, first_id + len(new_artists), dtype='int32'))
+                artist_ids.update(zip(new_artists['artist_name'], new_artists['artist_id'].tolist()))
+                artists_out.write(new_artists)
+
+            chunk['artist_id'] = chunk['artist_name'].map(artist_ids).astype('int32')
+            chunk = chunk.rename(columns={'track_id': 'spotify_id'})
+            tracks_out.write(chunk)
+            audio_out.write(chunk)
+
+            genres = chunk['genre'].astype(object)
+            new_genres = [name for name in genres.dropna().unique() if name not in genre_ids]
+            if new_genres:
+                first_id = len(genre_ids) + 1
+                genre_ids.update((name, first_id + i) for i, name in enumerate(new_genres))
+                genres_out.write(pd.DataFrame({
+                    'genre_id': range(first_id, first_id + len(new_genres)),
+                    'genre_name': new_genres
+                }))
+            linked = chunk.loc[genres.notna(), ['spotify_id']].assign(
+                genre_id=genres.dropna().map(genre_ids).astype('int16'))
+            linked.insert(0, 'track_genre_id',
+                          np.arange(track_genre_count + 1, track_genre_count + len(linked) + 1))
+            track_genre_count += len(linked)
+            track_genres_out.write(linked)
+
+            match_index.add(chunk['spotify_id'], chunk['normalized_track_name'], chunk['normalized_artist_name'])
+
+        for writer in (artists_out, tracks_out, audio_out, genres_out, track_genres_out):
+            writer.close()
+        seen_track_ids = None
+
+    with timer.stage("Streaming Billboard data"):
+        match_index.freeze()
+        normalize.clear()       # chart titles share little with track names
+        charts_out = sink.open_table('billboard_charts')
+        song_join_out = sink.open_table('song_join')
+        chart_count = 0
+        matched_charts = []     # (index position, chart_date, rank, weeks) arrays per chunk, for track_chart_summary
+
+        for chunk in read_chunks(args.charts, sizer, dtype=CHARTS_DTYPES):
+            chunk = chunk.rename(columns=BILLBOARD_RENAMES)
+            chunk['chart_date'] = pd.to_datetime(chunk['chart_date'], errors='coerce')
+            chunk = chunk.dropna(subset=['chart_date'])  # Remove rows with invalid dates
+            if chunk.empty:
+                continue
+            for col in ['last_week', 'peak_rank', 'weeks_on_board', 'chart_rank']:
+                chunk[col] = pd.to_numeric(chunk[col], errors='coerce').fillna(0).astype('int16')
+            chunk['chart_id'] = np.arange(chart_count + 1, chart_count + len(chunk) + 1)
+            chart_count += len(chunk)
+            charts_out.write(chunk.rename(columns={'song': 'song_title', 'artist': 'artist_name'}))
+
+            clean_song_title = normalize(chunk['song'])
+            clean_artist_name = normalize(chunk['artist'])
+            rows, positions = match_index.match(clean_song_title, clean_artist_name)
+            matched = pd.DataFrame({
+                'join_id': np.arange(song_join_out.rows + 1, song_join_out.rows + len(rows) + 1),
+                'spotify_id': match_index.spotify_ids(positions),
+                'chart_id': chunk['chart_id'].to_numpy()[rows],
+                'clean_song_title': clean_song_title.to_numpy()[rows],
+                'clean_artist_name': clean_artist_name.to_numpy()[rows],
+                'match_score': 1.0,
+            })
+            song_join_out.write(matched)
+            matched_charts.append((positions, chunk['chart_date'].to_numpy()[rows],
+                                   chunk['chart_rank'].to_numpy()[rows], chunk['weeks_on_board'].to_numpy()[rows]))
+
+        charts_out.close()
+        song_join_out.close()
+        normalize.clear()
+
+    with timer.stage("Creating Track_Chart_Summary table"):
+        columns = [np.concatenate(parts) for parts in zip(*matched_charts)] if matched_charts else \
+            [np.empty(0, dtype=np.int64), np.empty(0, dtype='datetime64[ns]'),
+             np.empty(0, dtype='int16'), np.empty(0, dtype='int16')]
+        matched_charts = None
+        # Grouped by index position (one per track) rather than by id string;
+        # only the summary rows get their spotify_id, then the id order build_track_chart_summary gives
+        matched_charts = pd.DataFrame({
+            'spotify_id': columns[0],
+            'chart_date': columns[1],
+            'chart_rank': columns[2],
+            'weeks_on_board': columns[3],
         })
-track_genres = pd.DataFrame(track_genres_list)
-track_genres.to_csv('cleaned_data/track_genres.csv', index=False)
-
-# Billboard Charts
-print("Creating Billboard_Charts table...")
-billboard_charts = billboard[['chart_date', 'chart_rank', 'song', 'artist', 
-                               'last_week', 'peak_rank', 'weeks_on_board']].copy()
-billboard_charts = billboard_charts.rename(columns={'song': 'song_title', 'artist': 'artist_name'})
-billboard_charts.insert(0, 'chart_id', range(1, len(billboard_charts) + 1))
-billboard_charts.to_csv('cleaned_data/billboard_charts.csv', index=False)
-
-# Song Join 
-print("Creating Song_Join table...")
-billboard['chart_id'] = range(1, len(billboard) + 1)
-
-song_join = billboard[['chart_id', 'normalized_song', 'normalized_artist']].merge(
-    spotify_with_id[['track_id', 'normalized_track_name', 'normalized_artist_name']],
-    left_on=['normalized_song', 'normalized_artist'],
-    right_on=['normalized_track_name', 'normalized_artist_name'],
-    how='inner'
-)
-
-# Filter to only valid spotify_ids
-song_join = song_join[song_join['track_id'].isin(valid_spotify_ids)]
-
-song_join = song_join[['chart_id', 'track_id', 'normalized_song', 'normalized_artist']].rename(columns={
-    'track_id': 'spotify_id',
-    'normalized_song': 'clean_song_title',
-    'normalized_artist': 'clean_artist_name'
-})
-song_join.insert(0, 'join_id', range(1, len(song_join) + 1))
-song_join = song_join[['join_id', 'spotify_id', 'chart_id', 'clean_song_title', 'clean_artist_name']]
-song_join.to_csv('cleaned_data/song_join.csv', index=False)
-
-# Empty tables for users/playlists
-print("Creating empty tables...")
-pd.DataFrame(columns=['user_id', 'username', 'email']).to_csv('cleaned_data/users.csv', index=False)
-pd.DataFrame(columns=['playlist_id', 'user_id', 'name', 'created_at']).to_csv('cleaned_data/playlists.csv', index=False)
-pd.DataFrame(columns=['playlist_track_id', 'playlist_id', 'spotify_id', 'position', 'added_at']).to_csv('cleaned_data/playlist_tracks.csv', index=False)
-
-print(f"\nDone!")
-print(f"Created {len(artists)} artists")
-print(f"Created {len(tracks)} tracks") 
-print(f"Created {len(audio_features)} audio features")
-print(f"Created {len(genres)} genres")
-print(f"Created {len(track_genres)} track-genre links")
-print(f"Created {len(billboard_charts)} billboard entries")
-print(f"Created {len(song_join)} Spotify-Billboard matches")
\ No newline at end of file
+        columns = None
+        track_chart_summary, track_chart_years = build_track_chart_summary(matched_charts)
+        matched_charts = None
+        track_chart_summary = track_chart_summary.assign(
+            spotify_id=match_index.spotify_ids(track_chart_summary['spotify_id'].to_numpy())
+        ).sort_values('spotify_id', kind='stable', ignore_index=True)
+        track_chart_years = track_chart_years.assign(
+            spotify_id=match_index.spotify_ids(track_chart_years['spotify_id'].to_numpy())
+        ).sort_values(['spotify_id', 'chart_year'], kind='stable', ignore_index=True)
+        sink.write_table('track_chart_summary', track_chart_summary)
+        sink.write_table('track_chart_years', track_chart_years)
+
+    with timer.stage("Creating empty tables"):
+        write_empty_tables(sink)
+    finish_output(sink, args, timer)
+
+    print(f"\nDone!")
+    print(f"Created {artists_out.rows} artists")
+    print(f"Created {tracks_out.rows} tracks")
+    print(f"Created {audio_out.rows} audio features")
+    print(f"Created {len(genre_ids)} genres")
+    print(f"Created {track_genres_out.rows} track-genre links")
+    print(f"Created {charts_out.rows} billboard entries")
+    print(f"Created {song_join_out.rows} Spotify-Billboard matches")
+    print(f"Created {len(track_chart_summary)} track chart summaries")
+    print(f"Peak RSS {max(sizer.peak_mb, peak_rss_mb()):.0f} MB (budget {args.memory_budget_mb} MB)")
+
+    timer.report()
+    if args.timing_json:
+        with open(args.timing_json, 'w') as f:
+            json.dump({
+                'mode': 'chunked',
+                'finished_at': datetime.now().isoformat(timespec='seconds'),
+                'peak_rss_mb': round(max(sizer.peak_mb, peak_rss_mb()), 1),
+                'memory_budget_mb': args.memory_budget_mb,
+                'stages': timer.to_dict()
+            }, f, indent=2)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Clean the Spotify and Billboard datasets into the database tables')
+    parser.add_argument('--spotify', default='SpotifyFeatures.csv', help='path to SpotifyFeatures.csv')
+    parser.add_argument('--charts', default='charts.csv', help='path to the Billboard charts.csv')
+    parser.add_argument('--out-dir', default='cleaned_data', help='directory for the cleaned CSVs')
+    parser.add_argument('--legacy', action='store_true',
+                        help='use the original row-by-row normalization and iterrows() genre links (for timing comparisons)')
+    parser.add_argument('--timing-json', help='also write the per-stage timings to this JSON file')
+    parser.add_argument('--output', choices=['csv', 'postgres', 'both'], default='csv',
+                        help='write cleaned_data/ CSVs, COPY straight into Postgres, or both (default csv)')
+    parser.add_argument('--dsn', default='',
+                        help='libpq connection string for --output postgres (default: PG* environment variables)')
+    parser.add_argument('--apply-schema', metavar='SCHEMA_SQL',
+                        help='run this schema file (e.g. schema.sql) before loading')
+    parser.add_argument('--append', action='store_true',
+                        help='do not TRUNCATE the tables before loading')
+    parser.add_argument('--load-workers', type=int, default=4,
+                        help='concurrent COPY connections for independent tables (default 4)')
+    parser.add_argument('--notify-url',
+                        help='POST here after loading, e.g. http://localhost:8080/api/admin/reload '
+                             '(sends $ADMIN_TOKEN as X-Admin-Token)')
+    parser.add_argument('--fuzzy', action='store_true',
+                        help='add fuzzy Spotify-Billboard matches (with a match_score) on top of the exact join')
+    parser.add_argument('--fuzzy-threshold', type=float, default=0.9,
+                        help='minimum match score for a fuzzy match (default 0.9)')
+    parser.add_argument('--fuzzy-workers', type=int,
+                        help='processes for fuzzy matching (default: one per CPU)')
+    parser.add_argument('--chunked', action='store_true',
+                        help='stream the inputs in chunks with compact dtypes to bound peak memory')
+    parser.add_argument('--memory-budget-mb', type=int, default=512,
+                        help='target peak RSS for --chunked mode (default 512)')
+    parser.add_argument('--chunk-rows', type=int,
+                        help='starting rows per chunk for --chunked mode (default: derived from the budget)')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.chunked and args.fuzzy:
+        raise SystemExit('--fuzzy needs the full datasets in memory and cannot be combined with --chunked')
+    if args.chunked:
+        run_chunked(args)
+    else:
+        run(args)
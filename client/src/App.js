@@ -3,6 +3,20 @@ import CONFIG from "./config";
 
 const BACKEND = CONFIG.BACKEND_URL;
 
+// Several GET routes in one /api/batch round trip; resolves to { id: { status, body } }
+async function fetchBatch(requests) {
+  const res = await fetch(`${BACKEND}/api/batch`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ requests }),
+  });
+  if (!res.ok) throw new Error("Batch request failed");
+  const data = await res.json();
+  const byId = {};
+  for (const result of data.results) byId[result.id] = result;
+  return byId;
+}
+
 function App() {
   const [activeTab, setActiveTab] = useState("genre");
   const [genres, setGenres] = useState([]);
@@ -10,31 +24,27 @@ function App() {
   const [globalError, setGlobalError] = useState("");
 
   useEffect(() => {
-    const loadGenres = async () => {
+    // Genres and the DB check arrive in one round trip
+    const loadStartup = async () => {
       try {
-        const res = await fetch(`${BACKEND}/api/genres`);
-        if (!res.ok) throw new Error("Failed to load genres");
-        const data = await res.json();
-        setGenres(data);
+        const results = await fetchBatch([
+          { id: "genres", route: "/api/genres" },
+          { id: "db", route: "/api/test-db" },
+        ]);
+        if (results.genres.status !== 200) {
+          setGlobalError("Could not load genres from backend");
+        } else {
+          setGenres(results.genres.body);
+        }
+        setDbStatus(results.db.body);
       } catch (err) {
         console.error(err);
         setGlobalError("Could not load genres from backend");
-      }
-    };
-
-    const pingDb = async () => {
-      try {
-        const res = await fetch(`${BACKEND}/api/test-db`);
-        const data = await res.json();
-        setDbStatus(data);
-      } catch (err) {
-        console.error(err);
         setDbStatus(null);
       }
     };
 
-    loadGenres();
-    pingDb();
+    loadStartup();
   }, []);
 
   return (
@@ -728,25 +738,37 @@ function MoodPanels() {
   const [endYear, setEndYear] = useState(1999);
   const [decade, setDecade] = useState([]);
 
+  const workoutParams = () => ({
+    min_energy: minEnergy,
+    min_danceability: minDance,
+    tempo_min: 130,
+    tempo_max: 180,
+    limit: 30,
+  });
+
+  const happyParams = () => ({
+    min_valence: minValence,
+    min_energy: 0.6,
+    limit: 25,
+  });
+
+  const decadeParams = () => ({
+    start_year: startYear,
+    end_year: endYear,
+    min_energy: 0.5,
+    max_energy: 0.8,
+    limit: 30,
+  });
+
   const loadWorkout = async () => {
-    const params = new URLSearchParams({
-      min_energy: minEnergy,
-      min_danceability: minDance,
-      tempo_min: 130,
-      tempo_max: 180,
-      limit: 30,
-    });
+    const params = new URLSearchParams(workoutParams());
     const res = await fetch(`${BACKEND}/api/playlist/workout?${params}`);
     const data = await res.json();
     setWorkout(data);
   };
 
   const loadHappy = async () => {
-    const params = new URLSearchParams({
-      min_valence: minValence,
-      min_energy: 0.6,
-      limit: 25,
-    });
+    const params = new URLSearchParams(happyParams());
     const res = await fetch(`${BACKEND}/api/playlist/mood/happy?${params}`);
     const data = await res.json();
     setHappy(data);
@@ -754,18 +776,27 @@ function MoodPanels() {
 
   const loadDecade = async () => {
     if (!startYear || !endYear) return;
-    const params = new URLSearchParams({
-      start_year: startYear,
-      end_year: endYear,
-      min_energy: 0.5,
-      max_energy: 0.8,
-      limit: 30,
-    });
+    const params = new URLSearchParams(decadeParams());
     const res = await fetch(`${BACKEND}/api/playlist/decade?${params}`);
     const data = await res.json();
     setDecade(data);
   };
 
+  // All three playlists in one /api/batch round trip
+  const loadAll = async () => {
+    const requests = [
+      { id: "workout", route: "/api/playlist/workout", params: workoutParams() },
+      { id: "happy", route: "/api/playlist/mood/happy", params: happyParams() },
+    ];
+    if (startYear && endYear) {
+      requests.push({ id: "decade", route: "/api/playlist/decade", params: decadeParams() });
+    }
+    const results = await fetchBatch(requests);
+    setWorkout(results.workout.body);
+    setHappy(results.happy.body);
+    if (results.decade) setDecade(results.decade.body);
+  };
+
   return (
     <section
       style={{
@@ -778,6 +809,21 @@ function MoodPanels() {
       <h2 style={{ marginTop: 0, marginBottom: "0.4rem", fontSize: "1.2rem" }}>
         Workout / Happy / Throwback
       </h2>
+      <button
+        onClick={loadAll}
+        style={{
+          marginBottom: "0.8rem",
+          padding: "0.4rem 0.9rem",
+          borderRadius: 10,
+          border: "1px solid #4b5563",
+          backgroundColor: "#111827",
+          color: "#e5e7eb",
+          cursor: "pointer",
+          fontSize: "0.9rem",
+        }}
+      >
+        Generate all three
+      </button>
 
       <div style={{ marginBottom: "1rem" }}>
         <h3 style={{ marginBottom: "0.3rem", fontSize: "1rem" }}>Workout Playlist</h3>
@@ -0,0 +1,236 @@
+# db_load.py
+# Loads cleaned tables straight into PostgreSQL with COPY FROM STDIN, so
+# clean_data.py --output postgres skips the CSV round trip through disk
+
+import io
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+# Foreign-key parents of each table; a table is loaded once its parents are committed
+TABLE_PARENTS = {
+    'artists': [],
+    'genres': [],
+    'billboard_charts': [],
+    'users': [],
+    'tracks': ['artists'],
+    'audio_features': ['tracks'],
+    'track_genres': ['tracks', 'genres'],
+    'song_join': ['tracks', 'billboard_charts'],
+    'track_chart_summary': ['tracks'],
+    'track_chart_years': ['tracks'],
+    'playlists': ['users'],
+    'playlist_tracks': ['playlists', 'tracks'],
+}
+
+# SERIAL columns whose sequences must follow the explicit ids we load
+SERIAL_COLUMNS = {
+    'artists': 'artist_id',
+    'genres': 'genre_id',
+    'track_genres': 'track_genre_id',
+    'billboard_charts': 'chart_id',
+    'song_join': 'join_id',
+    'users': 'user_id',
+    'playlists': 'playlist_id',
+    'playlist_tracks': 'playlist_track_id',
+}
+
+COPY_BATCH_ROWS = 50000
+
+
+def copy_dataframe(cursor, table, columns, df, batch_rows=COPY_BATCH_ROWS):
+    """COPY a DataFrame into table through an in-memory CSV buffer, batch_rows at a time"""
+    column_list = ', '.join(columns)
+    statement = f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)"
+    for start in range(0, len(df), batch_rows):
+        buffer = io.StringIO()
+        df.iloc[start:start + batch_rows][columns].to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        cursor.copy_expert(statement, buffer)
+
+
+def reset_sequences(conn, tables):
+    """Point each SERIAL sequence past the highest loaded id (what setup.sql does by hand)"""
+    cursor = conn.cursor()
+    for table in tables:
+        column = SERIAL_COLUMNS.get(table)
+        if column is None:
+            continue
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(MAX({column}), 1), MAX({column}) IS NOT NULL) "
+            f"FROM {table};",
+            (table, column)
+        )
+    conn.commit()
+    cursor.close()
+
+
+def notify_backend(url, token=None):
+    """
+    POST to the backend's reload hook so it rebuilds its caches. The admin
+    token comes from token or the ADMIN_TOKEN environment variable.
+    """
+    token = token or os.environ.get('ADMIN_TOKEN')
+    headers = {'X-Admin-Token': token} if token else {}
+    try:
+        request = urllib.request.Request(url, data=b'', headers=headers, method='POST')
+        with urllib.request.urlopen(request, timeout=120) as response:
+            print(f"Backend reload: HTTP {response.status}")
+    except Exception as e:
+        print(f"Backend reload failed ({url}): {e}")
+
+
+class PostgresTableWriter:
+    """
+    Streams chunks of one table into Postgres on a dedicated connection.
+    on_close runs once when the writer closes (PostgresSink marks the table done).
+    """
+
+    def __init__(self, dsn, table, columns, on_close=None):
+        self.table = table
+        self.columns = columns
+        self.rows = 0
+        self.on_close = on_close
+        self.conn = psycopg2.connect(dsn)
+
+    def write(self, df):
+        # Committed per chunk so child tables written next can see these rows
+        cursor = self.conn.cursor()
+        copy_dataframe(cursor, self.table, self.columns, df)
+        cursor.close()
+        self.conn.commit()
+        self.rows += len(df)
+
+    def close(self):
+        if self.conn.closed:
+            return
+        try:
+            self.conn.close()
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+
+
+class PostgresSink:
+    """
+    Output target for clean_data.py that loads tables into Postgres.
+
+    write_table() hands a finished DataFrame to a worker thread; the worker
+    waits for the table's foreign-key parents, then COPYs it on its own
+    connection. close() waits for every load and resets the sequences.
+    """
+
+    def __init__(self, dsn, table_columns, truncate=True, workers=4, schema_file=None):
+        self.dsn = dsn
+        self.table_columns = table_columns
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='copy')
+        self.done = {table: threading.Event() for table in TABLE_PARENTS}
+        self.futures = []
+        self.loaded = []
+        self.timings = {}
+        self.writers = []
+
+        if schema_file:
+            conn = psycopg2.connect(dsn)
+            cursor = conn.cursor()
+            with open(schema_file) as f:
+                cursor.execute(f.read())
+            conn.commit()
+            conn.close()
+        elif truncate:
+            # Truncate everything up front, children included, before any load starts
+            conn = psycopg2.connect(dsn)
+            cursor = conn.cursor()
+            cursor.execute(f"TRUNCATE {', '.join(TABLE_PARENTS)} CASCADE;")
+            conn.commit()
+            conn.close()
+
+    def _load(self, table, df):
+        try:
+            for parent in TABLE_PARENTS.get(table, []):
+                self.done[parent].wait()
+            started = time.perf_counter()
+            conn = psycopg2.connect(self.dsn)
+            try:
+                cursor = conn.cursor()
+                copy_dataframe(cursor, table, self.table_columns[table], df)
+                conn.commit()
+                cursor.close()
+            finally:
+                conn.close()
+            seconds = time.perf_counter() - started
+            self.timings[table] = seconds
+            self.loaded.append(table)
+            print(f"  COPY {table}: {len(df)} rows in {seconds:.2f}s")
+        finally:
+            # Set even on failure so dependants do not hang; their FK errors surface instead
+            self.done[table].set()
+
+    def write_table(self, table, df):
+        self.futures.append(self.executor.submit(self._load, table, df))
+
+    def open_table(self, table):
+        # Every chunk is committed as it is written, so dependants may start once the writer closes
+        writer = PostgresTableWriter(self.dsn, table, self.table_columns[table], on_close=self.done[table].set)
+        self.writers.append(writer)
+        self.loaded.append(table)
+        return writer
+
+    def close(self):
+        # Streamed tables first: queued loads may be waiting on them as parents
+        for writer in self.writers:
+            writer.close()
+        errors = []
+        for future in self.futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+        self.executor.shutdown()
+        if errors:
+            raise errors[0]
+
+        conn = psycopg2.connect(self.dsn)
+        try:
+            reset_sequences(conn, sorted(set(self.loaded)))
+        finally:
+            conn.close()
+
+
+class MultiSink:
+    """Fans every table out to several sinks (e.g. CSV files and Postgres)"""
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    def write_table(self, table, df):
+        for sink in self.sinks:
+            sink.write_table(table, df)
+
+    def open_table(self, table):
+        return _MultiWriter([sink.open_table(table) for sink in self.sinks])
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+class _MultiWriter:
+    def __init__(self, writers):
+        self.writers = writers
+
+    @property
+    def rows(self):
+        return self.writers[0].rows
+
+    def write(self, df):
+        for writer in self.writers:
+            writer.write(df)
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
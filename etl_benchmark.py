@@ -0,0 +1,250 @@
+# etl_benchmark.py
+# Times the ETL at several dataset sizes: generates synthetic inputs with
+# synth_data.py, runs clean_data.py on them (per-stage timings and peak
+# memory) and, given a database, the two load paths - COPY straight from
+# clean_data.py (once per mode, so the chunked writers' streamed load is
+# exercised too), and schema.sql + setup.sql through psql.
+#
+#   python3 etl_benchmark.py --scales 0.1,1,10 --modes vectorized,chunked \
+#       --dsn "dbname=bench" --output results/etl.json
+#
+# Each clean_data.py run is its own process, so peak RSS is per run.
+# Generated inputs are kept in --work-dir and reused by later runs with the same seed.
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import synth_data
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Tables whose on-disk size is reported after a load
+SIZED_TABLES = ['artists', 'tracks', 'audio_features', 'genres', 'track_genres', 'billboard_charts',
+                'song_join', 'track_chart_summary', 'track_chart_years']
+
+MODE_FLAGS = {
+    'vectorized': [],
+    'chunked': ['--chunked'],
+    'legacy': ['--legacy'],
+}
+
+
+def run_process(command, cwd=None, timeout=None):
+    """
+    Run command; returns (exit status, wall seconds, peak RSS in MB of that process).
+    A run still going after timeout seconds is killed and reports a negative status.
+    """
+    print(f"  $ {' '.join(command)}")
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=cwd)
+    killer = threading.Timer(timeout, process.kill) if timeout else None
+    if killer is not None:
+        killer.start()
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    finally:
+        if killer is not None:
+            killer.cancel()
+    process.returncode = os.waitstatus_to_exitcode(status)
+    seconds = time.perf_counter() - started
+    # ru_maxrss is KB on Linux and bytes on macOS
+    peak = usage.ru_maxrss / 2 ** 20 if sys.platform == 'darwin' else usage.ru_maxrss / 2 ** 10
+    return process.returncode, seconds, peak
+
+
+def dataset(work_dir, scale, seed):
+    """Synthetic inputs for scale, generated unless a previous run left them in work_dir"""
+    directory = os.path.join(work_dir, f'scale-{scale:g}-seed-{seed}')
+    info_path = os.path.join(directory, 'dataset.json')
+    if os.path.exists(info_path):
+        with open(info_path) as f:
+            info = json.load(f)
+        print(f"Reusing {directory}")
+    else:
+        print(f"Generating scale {scale:g} into {directory} ...")
+        info = synth_data.generate(directory, scale, seed)
+        with open(info_path, 'w') as f:
+            json.dump(info, f, indent=2)
+    info['spotify_mb'] = round(os.path.getsize(os.path.join(directory, 'SpotifyFeatures.csv')) / 2 ** 20, 1)
+    info['charts_mb'] = round(os.path.getsize(os.path.join(directory, 'charts.csv')) / 2 ** 20, 1)
+    return directory, info
+
+
+def clean(directory, mode, extra_args, output_args, label, timeout=None):
+    """One clean_data.py run; returns its timings report plus wall time and peak RSS"""
+    timing_path = os.path.join(directory, f'timing-{label}.json')
+    command = [sys.executable, os.path.join(HERE, 'clean_data.py'),
+               '--spotify', os.path.join(directory, 'SpotifyFeatures.csv'),
+               '--charts', os.path.join(directory, 'charts.csv'),
+               '--out-dir', os.path.join(directory, 'cleaned_data'),
+               '--timing-json', timing_path] + MODE_FLAGS[mode] + extra_args + output_args
+    status, seconds, peak = run_process(command, timeout=timeout)
+    result = {'exit_status': status, 'wall_seconds': round(seconds, 2), 'peak_rss_mb': round(peak, 1)}
+    if status == 0:
+        with open(timing_path) as f:
+            result['stages'] = json.load(f)['stages']
+    return result
+
+
+def psql_load(directory, dsn):
+    """schema.sql then setup.sql through psql, timed separately"""
+    steps = {}
+    for name, script, cwd in [('schema.sql', os.path.join(HERE, 'schema.sql'), HERE),
+                              ('setup.sql', os.path.join(HERE, 'setup.sql'), directory)]:
+        # setup.sql's \copy paths are relative to the directory holding cleaned_data/
+        status, seconds, _ = run_process(['psql', '-X', '-q', '-v', 'ON_ERROR_STOP=1', '-d', dsn, '-f', script],
+                                         cwd=cwd)
+        steps[name] = {'exit_status': status, 'wall_seconds': round(seconds, 2)}
+        if status != 0:
+            break
+    return steps
+
+
+def table_sizes(dsn):
+    import psycopg2
+    conn = psycopg2.connect(dsn)
+    try:
+        cursor = conn.cursor()
+        started = time.perf_counter()
+        cursor.execute('ANALYZE;')
+        conn.commit()
+        analyze_seconds = time.perf_counter() - started
+        sizes = {}
+        for table in SIZED_TABLES:
+            cursor.execute('SELECT COUNT(*), pg_total_relation_size(%s), pg_indexes_size(%s) FROM ' + table,
+                           (table, table))
+            rows, total, indexes = cursor.fetchone()
+            sizes[table] = {'rows': rows, 'total_mb': round(total / 2 ** 20, 1),
+                            'index_mb': round(indexes / 2 ** 20, 1)}
+        cursor.close()
+    finally:
+        conn.close()
+    return round(analyze_seconds, 2), sizes
+
+
+def run(args):
+    scales = [float(value) for value in args.scales.split(',')]
+    modes = args.modes.split(',')
+    for mode in modes:
+        if mode not in MODE_FLAGS:
+            raise SystemExit(f"Unknown mode '{mode}' (choose from {', '.join(MODE_FLAGS)})")
+    if args.psql and not shutil.which('psql'):
+        raise SystemExit('--psql needs psql on the PATH')
+    extra_args = ['--memory-budget-mb', str(args.memory_budget_mb)] if 'chunked' in modes else []
+
+    results = []
+    for scale in scales:
+        directory, info = dataset(args.work_dir, scale, args.seed)
+        entry = {'dataset': info, 'clean': {}, 'load': {}}
+        for mode in modes:
+            print(f"clean_data.py ({mode}) at scale {scale:g}")
+            flags = extra_args if mode == 'chunked' else []
+            entry['clean'][mode] = clean(directory, mode, flags, [], mode)
+
+        if args.dsn:
+            # Every mode loads: chunked streams its tables through PostgresSink.open_table
+            # rather than handing over whole frames, and that path needs checking as well
+            entry['load']['copy'] = {}
+            for mode in modes:
+                print(f"Loading scale {scale:g} with COPY ({mode})")
+                flags = extra_args if mode == 'chunked' else []
+                copy_run = clean(directory, mode, flags,
+                                 ['--output', 'postgres', '--dsn', args.dsn,
+                                  '--apply-schema', os.path.join(HERE, 'schema.sql')],
+                                 f'{mode}-copy', timeout=args.load_timeout)
+                entry['load']['copy'][mode] = copy_run
+                if copy_run['exit_status'] == 0:
+                    entry['load']['analyze_seconds'], entry['load']['tables'] = table_sizes(args.dsn)
+            if args.psql:
+                print(f"Loading scale {scale:g} with psql schema.sql + setup.sql")
+                entry['load']['psql'] = psql_load(directory, args.dsn)
+
+        if not args.keep_outputs:
+            shutil.rmtree(os.path.join(directory, 'cleaned_data'), ignore_errors=True)
+        results.append(entry)
+
+    return {
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+        'seed': args.seed,
+        'modes': modes,
+        'results': results,
+    }
+
+
+def print_summary(report):
+    scales = [entry['dataset']['scale'] for entry in report['results']]
+    print('\nclean_data.py wall time (s) / peak RSS (MB)')
+    print(f"  {'mode':<12}" + ''.join(f"{f'x{scale:g}':>20}" for scale in scales))
+    for mode in report['modes']:
+        cells = []
+        for entry in report['results']:
+            run = entry['clean'][mode]
+            cells.append(f"{run['wall_seconds']:.1f}s / {run['peak_rss_mb']:.0f}MB" if run['exit_status'] == 0
+                         else 'failed')
+        print(f"  {mode:<12}" + ''.join(f'{cell:>20}' for cell in cells))
+
+    # Stage by stage for the first mode, to see which ones grow faster than the input
+    mode = report['modes'][0]
+    stages = []
+    for entry in report['results']:
+        for stage in entry['clean'][mode].get('stages', {}):
+            if stage not in stages:
+                stages.append(stage)
+    print(f'\nStages ({mode}), seconds')
+    width = max([len(stage) for stage in stages] + [5])
+    for stage in stages:
+        values = [entry['clean'][mode].get('stages', {}).get(stage) for entry in report['results']]
+        print(f'  {stage:<{width}}' + ''.join(f"{value if value is not None else '-':>12}" for value in values))
+
+    for entry in report['results']:
+        load = entry['load']
+        if not load:
+            continue
+        print(f"\nLoad at x{entry['dataset']['scale']:g}")
+        for mode, result in load.get('copy', {}).items():
+            outcome = f"{result['wall_seconds']}s" if result['exit_status'] == 0 \
+                else f"failed (exit {result['exit_status']})"
+            print(f"  clean_data.py --output postgres ({mode}): {outcome}")
+        for step, result in load.get('psql', {}).items():
+            print(f"  psql {step}: {result['wall_seconds']}s")
+        for table, size in load.get('tables', {}).items():
+            print(f"  {table:<22}{size['rows']:>12} rows {size['total_mb']:>10} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the ETL and database load at several dataset scales')
+    parser.add_argument('--scales', default='0.1,1,10', help='comma-separated scale factors (default 0.1,1,10)')
+    parser.add_argument('--modes', default='vectorized,chunked',
+                        help=f"clean_data.py modes to time: {', '.join(MODE_FLAGS)} (default vectorized,chunked)")
+    parser.add_argument('--seed', type=int, default=0, help='seed for the synthetic data')
+    parser.add_argument('--work-dir', default='synthetic', help='where generated inputs and outputs go')
+    parser.add_argument('--memory-budget-mb', type=int, default=512, help='--memory-budget-mb for chunked runs')
+    parser.add_argument('--dsn', help='also time loading each scale into this (scratch!) database')
+    parser.add_argument('--psql', action='store_true',
+                        help='with --dsn, also time schema.sql + setup.sql through psql')
+    parser.add_argument('--load-timeout', type=float, default=3600,
+                        help='with --dsn, kill a COPY load still running after this many seconds (default 3600)')
+    parser.add_argument('--keep-outputs', action='store_true', help='keep each scale\'s cleaned_data/')
+    parser.add_argument('--output', help='write the report here as JSON')
+    args = parser.parse_args()
+    if args.psql and not args.dsn:
+        parser.error('--psql needs --dsn')
+
+    report = run(args)
+    print_summary(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+# fuzzy_match.py
+# Blocking-based fuzzy matching of Billboard chart entries to Spotify tracks.
+#
+# The exact song_join in clean_data.py only links rows whose normalized song
+# and artist are identical, which misses remix tags, "&" vs "and", and typos.
+# Comparing every Billboard key with every Spotify key is intractable, so keys
+# are first grouped into blocks (shared rarest artist token, or shared rarest
+# song token + artist initial) and only pairs inside a block are scored.
+# Blocks are scored in parallel across a process pool.
+
+import difflib
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+try:
+    from rapidfuzz import fuzz as _rapidfuzz
+except ImportError:
+    _rapidfuzz = None
+
+# Tokens that carry no identity for matching
+STOPWORDS = {'the', 'a', 'an', 'and', 'n', 'x', 'with', 'vs', 'versus'}
+# Version tags that Billboard drops but Spotify keeps (or the other way round)
+VERSION_TOKENS = {'remix', 'remastered', 'remaster', 'version', 'edit', 'mix', 'mono', 'stereo',
+                  'single', 'radio', 'live', 'acoustic', 'extended', 'original'}
+
+SONG_WEIGHT = 0.65
+ARTIST_WEIGHT = 0.35
+DEFAULT_THRESHOLD = 0.9
+BLOCKS_PER_TASK = 200
+# Blocks bigger than this are too unspecific to be worth scoring
+MAX_BLOCK_SIZE = 2000
+
+
+def canonical_tokens(text, drop_versions=False):
+    tokens = [t for t in str(text).split() if t not in STOPWORDS]
+    if drop_versions:
+        tokens = [t for t in tokens if t not in VERSION_TOKENS]
+    return tokens
+
+
+def similarity(a, b):
+    """Edit-distance style similarity in [0, 1], order-insensitive over tokens"""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    sorted_a = ' '.join(sorted(a.split()))
+    sorted_b = ' '.join(sorted(b.split()))
+    if _rapidfuzz is not None:
+        return max(_rapidfuzz.ratio(a, b), _rapidfuzz.ratio(sorted_a, sorted_b)) / 100.0
+    best = 0.0
+    for x, y in ((a, b), (sorted_a, sorted_b)):
+        matcher = difflib.SequenceMatcher(None, x, y, autojunk=False)
+        # real_quick_ratio/quick_ratio are cheap upper bounds; skip the full ratio when they cannot win
+        if matcher.real_quick_ratio() > best and matcher.quick_ratio() > best:
+            best = max(best, matcher.ratio())
+    return best
+
+
+def rarest(tokens, frequency):
+    return min(tokens, key=lambda t: (frequency.get(t, 0), t))
+
+
+def block_keys(song_tokens, artist_tokens, song_freq, artist_freq):
+    """
+    Blocking keys for one (song, artist) pair. Using the rarest token (by Spotify
+    document frequency) keeps blocks small: "lil" or "love" alone would not.
+    """
+    keys = []
+    if artist_tokens:
+        keys.append('a:' + rarest(artist_tokens, artist_freq))
+        if song_tokens:
+            keys.append('s:' + rarest(song_tokens, song_freq) + '|' + artist_tokens[0][0])
+    return keys
+
+
+class SpotifyBlocks:
+    """Spotify (song, artist) keys grouped by blocking key"""
+
+    def __init__(self, spotify_keys):
+        # spotify_keys: DataFrame of unique normalized_track_name / normalized_artist_name
+        tokenized = [(canonical_tokens(song, drop_versions=True), canonical_tokens(artist))
+                     for song, artist in spotify_keys.itertuples(index=False, name=None)]
+        self.song_freq = defaultdict(int)
+        self.artist_freq = defaultdict(int)
+        for song_tokens, artist_tokens in tokenized:
+            for t in set(song_tokens):
+                self.song_freq[t] += 1
+            for t in set(artist_tokens):
+                self.artist_freq[t] += 1
+
+        self.songs = [' '.join(song_tokens) for song_tokens, _ in tokenized]
+        self.artists = [' '.join(artist_tokens) for _, artist_tokens in tokenized]
+        blocks = defaultdict(list)
+        for idx, (song_tokens, artist_tokens) in enumerate(tokenized):
+            for key in self.keys_for(song_tokens, artist_tokens):
+                blocks[key].append(idx)
+        self.oversized = sum(1 for members in blocks.values() if len(members) > MAX_BLOCK_SIZE)
+        self.blocks = {key: members for key, members in blocks.items() if len(members) <= MAX_BLOCK_SIZE}
+
+    def keys_for(self, song_tokens, artist_tokens):
+        return block_keys(song_tokens, artist_tokens, self.song_freq, self.artist_freq)
+
+
+_worker_blocks = None
+
+
+def _init_worker(blocks):
+    global _worker_blocks
+    _worker_blocks = blocks
+
+
+def _score_task(task):
+    """Score a batch of Billboard keys against their candidate blocks; returns (matches, pairs scored)"""
+    billboard_keys, threshold = task
+    blocks = _worker_blocks
+    matches = []
+    pairs = 0
+    for bb_idx, song, artist in billboard_keys:
+        song_tokens = canonical_tokens(song, drop_versions=True)
+        artist_tokens = canonical_tokens(artist)
+        song_c = ' '.join(song_tokens)
+        artist_c = ' '.join(artist_tokens)
+
+        candidates = set()
+        for key in blocks.keys_for(song_tokens, artist_tokens):
+            candidates.update(blocks.blocks.get(key, ()))
+
+        best_score, best = 0.0, []
+        for sp_idx in candidates:
+            pairs += 1
+            artist_score = similarity(artist_c, blocks.artists[sp_idx])
+            # The song must carry the score: bail out when even a perfect song match cannot reach threshold
+            if SONG_WEIGHT + ARTIST_WEIGHT * artist_score < threshold:
+                continue
+            score = SONG_WEIGHT * similarity(song_c, blocks.songs[sp_idx]) + ARTIST_WEIGHT * artist_score
+            if score > best_score + 1e-9:
+                best_score, best = score, [sp_idx]
+            elif abs(score - best_score) <= 1e-9:
+                best.append(sp_idx)
+        if best_score >= threshold:
+            matches.extend((bb_idx, sp_idx, round(best_score, 4)) for sp_idx in best)
+    return matches, pairs
+
+
+def match_keys(billboard_keys, spotify_keys, threshold=DEFAULT_THRESHOLD, workers=None):
+    """
+    Fuzzy-match unique Billboard keys to unique Spotify keys.
+    Both inputs are two-column DataFrames (normalized song, normalized artist).
+    Returns (DataFrame of bb_idx / sp_idx / match_score, stats dict).
+    """
+    started = time.perf_counter()
+    blocks = SpotifyBlocks(spotify_keys)
+
+    # Group Billboard keys by their first blocking key so a task touches few blocks
+    grouped = defaultdict(list)
+    for bb_idx, (song, artist) in enumerate(billboard_keys.itertuples(index=False, name=None)):
+        keys = blocks.keys_for(canonical_tokens(song, True), canonical_tokens(artist))
+        grouped[keys[0] if keys else ''].append((bb_idx, song, artist))
+    groups = list(grouped.values())
+    tasks = []
+    for start in range(0, len(groups), BLOCKS_PER_TASK):
+        batch = [key for group in groups[start:start + BLOCKS_PER_TASK] for key in group]
+        tasks.append((batch, threshold))
+
+    matches, pairs = [], 0
+    if workers == 1:
+        _init_worker(blocks)
+        results = map(_score_task, tasks)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(blocks,))
+        results = executor.map(_score_task, tasks, chunksize=4)
+    for task_matches, task_pairs in results:
+        matches.extend(task_matches)
+        pairs += task_pairs
+    if workers != 1:
+        executor.shutdown()
+
+    seconds = time.perf_counter() - started
+    stats = {
+        'billboard_keys': len(billboard_keys),
+        'spotify_keys': len(spotify_keys),
+        'blocks': len(blocks.blocks),
+        'oversized_blocks_skipped': blocks.oversized,
+        'pairs_scored': pairs,
+        'naive_pairs': len(billboard_keys) * len(spotify_keys),
+        'seconds': round(seconds, 3),
+        'keys_per_second': round(len(billboard_keys) / seconds, 1) if seconds else 0.0,
+        'pairs_per_second': round(pairs / seconds, 1) if seconds else 0.0,
+    }
+    return pd.DataFrame(matches, columns=['bb_idx', 'sp_idx', 'match_score']), stats
+
+
+def fuzzy_song_join(billboard, spotify_with_id, exact_song_join, threshold=DEFAULT_THRESHOLD, workers=None):
+    """
+    Extend the exact song_join with fuzzy matches.
+
+    billboard needs chart_id / normalized_song / normalized_artist; spotify_with_id
+    needs track_id / normalized_track_name / normalized_artist_name. Exact rows
+    keep match_score 1.0, fuzzy rows get their score. Returns (song_join, report).
+    """
+    bb_keys = billboard[['normalized_song', 'normalized_artist']].drop_duplicates().reset_index(drop=True)
+    sp_keys = spotify_with_id[['normalized_track_name', 'normalized_artist_name']].drop_duplicates().reset_index(drop=True)
+    pairs, stats = match_keys(bb_keys, sp_keys, threshold, workers)
+
+    key_pairs = pd.DataFrame({
+        'normalized_song': bb_keys['normalized_song'].values[pairs['bb_idx'].values],
+        'normalized_artist': bb_keys['normalized_artist'].values[pairs['bb_idx'].values],
+        'normalized_track_name': sp_keys['normalized_track_name'].values[pairs['sp_idx'].values],
+        'normalized_artist_name': sp_keys['normalized_artist_name'].values[pairs['sp_idx'].values],
+        'match_score': pairs['match_score'].values,
+    })
+
+    # Recall vs the exact join: share of exactly-equal key pairs the fuzzy matcher also found
+    exact_keys = set(exact_song_join[['clean_song_title', 'clean_artist_name']].drop_duplicates()
+                     .itertuples(index=False, name=None))
+    found_exact = key_pairs[(key_pairs['normalized_song'] == key_pairs['normalized_track_name']) &
+                            (key_pairs['normalized_artist'] == key_pairs['normalized_artist_name'])]
+    found_exact = set(found_exact[['normalized_song', 'normalized_artist']].itertuples(index=False, name=None))
+
+    # Only keys with no exact match contribute new rows
+    fuzzy_pairs = key_pairs[[key not in exact_keys for key in
+                             key_pairs[['normalized_song', 'normalized_artist']].itertuples(index=False, name=None)]]
+    fuzzy = billboard[['chart_id', 'normalized_song', 'normalized_artist']].merge(
+        fuzzy_pairs, on=['normalized_song', 'normalized_artist'], how='inner'
+    ).merge(
+        spotify_with_id[['track_id', 'normalized_track_name', 'normalized_artist_name']],
+        on=['normalized_track_name', 'normalized_artist_name'], how='inner'
+    )
+    fuzzy = fuzzy.rename(columns={
+        'track_id': 'spotify_id',
+        'normalized_song': 'clean_song_title',
+        'normalized_artist': 'clean_artist_name'
+    })[['spotify_id', 'chart_id', 'clean_song_title', 'clean_artist_name', 'match_score']]
+
+    exact = exact_song_join.drop(columns=['join_id']).assign(match_score=1.0)
+    song_join = pd.concat([exact, fuzzy], ignore_index=True)
+    song_join = song_join.drop_duplicates(subset=['spotify_id', 'chart_id'])
+    song_join.insert(0, 'join_id', range(1, len(song_join) + 1))
+
+    matched_exact = exact_song_join['chart_id'].nunique()
+    matched_total = song_join['chart_id'].nunique()
+    report = dict(stats)
+    report.update({
+        'threshold': threshold,
+        'exact_key_pairs': len(exact_keys),
+        'recall_vs_exact': round(len(found_exact & exact_keys) / len(exact_keys), 4) if exact_keys else 1.0,
+        'exact_rows': len(exact_song_join),
+        'fuzzy_rows': len(song_join) - len(exact_song_join),
+        'chart_rows_matched_exact': int(matched_exact),
+        'chart_rows_matched_total': int(matched_total),
+        'backend': 'rapidfuzz' if _rapidfuzz is not None else 'difflib',
+    })
+    return song_join, report
+
+
+def print_report(report):
+    print("\nFuzzy matching report")
+    for key, value in report.items():
+        print(f"  {key:<26} {value}")
@@ -0,0 +1,277 @@
+# ingest_weekly.py
+# Incremental ingestion of new Billboard chart weeks (and new Spotify tracks)
+# into an already-loaded database, without re-running the full clean_data.py.
+#
+#   python3 ingest_weekly.py --charts new_weeks.csv [--spotify new_tracks.csv] --dsn "dbname=..."
+#
+# New rows take their ids from the existing SERIAL sequences, and song_join
+# matches are computed only for the new chart rows, so the cost scales with
+# the size of the delta rather than with the historical tables. (New tracks
+# are therefore matched against chart weeks ingested from then on; historical
+# chart rows are not re-scanned - that still needs a full clean_data.py run.)
+# track_chart_summary is refreshed for just the tracks the new weeks matched.
+
+import argparse
+import time
+
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+
+from clean_data import AUDIO_COLS, Normalizer, clean_billboard, clean_spotify
+
+PAGE_SIZE = 1000
+
+# Recompute track_chart_summary / track_chart_years rows for the tracks in %(ids)s
+# from their full chart history; exact, and cheap because song_join is indexed by spotify_id
+REFRESH_SUMMARY_SQL = """
+INSERT INTO track_chart_summary (spotify_id, best_rank, total_weeks, max_weeks_on_board,
+                                 first_chart_date, last_chart_date, charted_years)
+SELECT
+    sj.spotify_id,
+    MIN(bc.chart_rank),
+    COUNT(DISTINCT bc.chart_date),
+    MAX(bc.weeks_on_board),
+    MIN(bc.chart_date),
+    MAX(bc.chart_date),
+    ARRAY_AGG(DISTINCT EXTRACT(YEAR FROM bc.chart_date)::int ORDER BY EXTRACT(YEAR FROM bc.chart_date)::int)
+FROM song_join sj
+JOIN billboard_charts bc ON sj.chart_id = bc.chart_id
+WHERE sj.spotify_id = ANY(%(ids)s)
+GROUP BY sj.spotify_id
+ON CONFLICT (spotify_id) DO UPDATE SET
+    best_rank = EXCLUDED.best_rank,
+    total_weeks = EXCLUDED.total_weeks,
+    max_weeks_on_board = EXCLUDED.max_weeks_on_board,
+    first_chart_date = EXCLUDED.first_chart_date,
+    last_chart_date = EXCLUDED.last_chart_date,
+    charted_years = EXCLUDED.charted_years;
+
+DELETE FROM track_chart_years WHERE spotify_id = ANY(%(ids)s);
+INSERT INTO track_chart_years (spotify_id, chart_year, best_rank, weeks)
+SELECT sj.spotify_id, EXTRACT(YEAR FROM bc.chart_date)::int, MIN(bc.chart_rank), COUNT(DISTINCT bc.chart_date)
+FROM song_join sj
+JOIN billboard_charts bc ON sj.chart_id = bc.chart_id
+WHERE sj.spotify_id = ANY(%(ids)s)
+GROUP BY 1, 2;
+"""
+
+
+def records(df):
+    """DataFrame rows as tuples of plain Python values (NaN -> None) that psycopg2 can adapt"""
+    df = df.astype(object)
+    return list(df.where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def fetch_lookup(cursor, query, keys):
+    """Run a `... = ANY(%s)` lookup for just these keys and return a dict of the two columns"""
+    if not keys:
+        return {}
+    cursor.execute(query, (list(keys),))
+    return dict(cursor.fetchall())
+
+
+def ingest_spotify(cursor, spotify, normalize):
+    """Upsert new Spotify tracks; returns the number of tracks that were not in the database"""
+    spotify = clean_spotify(spotify, normalize)
+    known = fetch_lookup(cursor, "SELECT spotify_id, 1 FROM tracks WHERE spotify_id = ANY(%s);",
+                         spotify['track_id'].unique().tolist())
+    new_count = int((~spotify['track_id'].isin(known.keys())).sum())
+
+    # Artists: reuse existing ids, new names get the next value of artists_artist_id_seq
+    names = spotify.drop_duplicates(subset=['artist_name'])[['artist_name', 'normalized_artist_name']]
+    artist_ids = fetch_lookup(cursor, "SELECT artist_name, MIN(artist_id) FROM artists "
+                                      "WHERE artist_name = ANY(%s) GROUP BY artist_name;",
+                              names['artist_name'].tolist())
+    missing = names[~names['artist_name'].isin(artist_ids.keys())]
+    if len(missing):
+        rows = execute_values(
+            cursor,
+            "INSERT INTO artists (artist_name, normalized_artist_name) VALUES %s RETURNING artist_name, artist_id;",
+            records(missing), page_size=PAGE_SIZE, fetch=True)
+        artist_ids.update(rows)
+    spotify['artist_id'] = spotify['artist_name'].map(artist_ids)
+
+    execute_values(cursor, """
+        INSERT INTO tracks (spotify_id, track_name, normalized_track_name, artist_id, popularity, duration_ms, explicit)
+        VALUES %s
+        ON CONFLICT (spotify_id) DO UPDATE SET
+            track_name = EXCLUDED.track_name,
+            normalized_track_name = EXCLUDED.normalized_track_name,
+            artist_id = EXCLUDED.artist_id,
+            popularity = EXCLUDED.popularity,
+            duration_ms = EXCLUDED.duration_ms;
+        """,
+        records(spotify[['track_id', 'track_name', 'normalized_track_name', 'artist_id',
+                         'popularity', 'duration_ms', 'explicit']]),
+        page_size=PAGE_SIZE)
+
+    set_features = ', '.join(f'{col} = EXCLUDED.{col}' for col in AUDIO_COLS)
+    execute_values(cursor, f"""
+        INSERT INTO audio_features (spotify_id, {', '.join(AUDIO_COLS)})
+        VALUES %s
+        ON CONFLICT (spotify_id) DO UPDATE SET {set_features};
+        """,
+        records(spotify[['track_id'] + AUDIO_COLS]),
+        page_size=PAGE_SIZE)
+
+    # Genres: ON CONFLICT on the UNIQUE genre_name keeps this idempotent
+    genre_names = spotify['genre'].dropna().unique().tolist()
+    if genre_names:
+        execute_values(cursor, "INSERT INTO genres (genre_name) VALUES %s ON CONFLICT (genre_name) DO NOTHING;",
+                       [(name,) for name in genre_names])
+        genre_ids = fetch_lookup(cursor, "SELECT genre_name, genre_id FROM genres WHERE genre_name = ANY(%s);",
+                                 genre_names)
+        linked = spotify[spotify['genre'].notna()]
+        execute_values(cursor,
+                       "INSERT INTO track_genres (spotify_id, genre_id) VALUES %s "
+                       "ON CONFLICT (spotify_id, genre_id) DO NOTHING;",
+                       records(pd.DataFrame({'spotify_id': linked['track_id'],
+                                             'genre_id': linked['genre'].map(genre_ids)})),
+                       page_size=PAGE_SIZE)
+    return new_count
+
+
+def ingest_charts(cursor, billboard, normalize, skip_loaded_weeks=True):
+    """
+    Insert new chart rows and their song_join matches.
+    Returns (chart rows inserted, matches inserted, list of new chart ids).
+    """
+    billboard = clean_billboard(billboard, normalize)
+
+    if skip_loaded_weeks and len(billboard):
+        # Whole weeks already in billboard_charts are skipped, so re-running is harmless
+        cursor.execute("SELECT DISTINCT chart_date FROM billboard_charts WHERE chart_date = ANY(%s);",
+                       (sorted({d.date() for d in billboard['chart_date']}),))
+        loaded = {row[0] for row in cursor.fetchall()}
+        billboard = billboard[~billboard['chart_date'].dt.date.isin(loaded)]
+    if billboard.empty:
+        return 0, 0, []
+
+    # A week has one song per rank; (chart_date, chart_rank) is the key the new ids are joined back on
+    billboard = billboard.drop_duplicates(subset=['chart_date', 'chart_rank'])
+    rows = records(billboard[['chart_date', 'chart_rank', 'song', 'artist',
+                              'last_week', 'peak_rank', 'weeks_on_board']].assign(
+        chart_date=billboard['chart_date'].dt.date))
+    # RETURNING order is not guaranteed to follow VALUES, so each id comes back with its key
+    inserted = execute_values(cursor, """
+        INSERT INTO billboard_charts (chart_date, chart_rank, song_title, artist_name, last_week, peak_rank, weeks_on_board)
+        VALUES %s RETURNING chart_id, chart_date, chart_rank;
+        """, rows, page_size=PAGE_SIZE, fetch=True)
+    chart_ids = pd.DataFrame(inserted, columns=['chart_id', 'chart_date', 'chart_rank'])
+    chart_ids['chart_date'] = pd.to_datetime(chart_ids['chart_date'])
+    billboard = billboard.merge(chart_ids, on=['chart_date', 'chart_rank'], how='inner', validate='one_to_one')
+
+    # Match only the new rows' normalized keys against the existing tracks
+    keys = billboard[['normalized_song', 'normalized_artist']].drop_duplicates()
+    cursor.execute("""
+        SELECT t.spotify_id, t.normalized_track_name, a.normalized_artist_name
+        FROM tracks t
+        JOIN artists a ON t.artist_id = a.artist_id
+        JOIN unnest(%s::text[], %s::text[]) AS k(song, artist)
+            ON t.normalized_track_name = k.song AND a.normalized_artist_name = k.artist;
+        """, (keys['normalized_song'].tolist(), keys['normalized_artist'].tolist()))
+    tracks = pd.DataFrame(cursor.fetchall(),
+                          columns=['spotify_id', 'normalized_track_name', 'normalized_artist_name'])
+
+    matches = billboard[['chart_id', 'normalized_song', 'normalized_artist']].merge(
+        tracks,
+        left_on=['normalized_song', 'normalized_artist'],
+        right_on=['normalized_track_name', 'normalized_artist_name'],
+        how='inner'
+    )
+    if len(matches):
+        execute_values(cursor, """
+            INSERT INTO song_join (spotify_id, chart_id, clean_song_title, clean_artist_name)
+            VALUES %s ON CONFLICT (spotify_id, chart_id) DO NOTHING;
+            """,
+            records(matches[['spotify_id', 'chart_id', 'normalized_song', 'normalized_artist']]),
+            page_size=PAGE_SIZE)
+    return len(billboard), len(matches), billboard['chart_id'].tolist()
+
+
+def refresh_chart_summary(cursor, chart_ids=None):
+    """
+    Bring track_chart_summary up to date for the tracks matched by chart_ids
+    (e.g. the ids ingest_charts just inserted). chart_ids=None rebuilds every
+    track, for databases loaded before the summary tables existed.
+    Returns the number of tracks refreshed.
+    """
+    if chart_ids is None:
+        cursor.execute("TRUNCATE track_chart_summary, track_chart_years;")
+        cursor.execute("SELECT DISTINCT spotify_id FROM song_join;")
+    else:
+        if not chart_ids:
+            return 0
+        cursor.execute("SELECT DISTINCT spotify_id FROM song_join WHERE chart_id = ANY(%s);", (list(chart_ids),))
+    spotify_ids = [row[0] for row in cursor.fetchall()]
+    if spotify_ids:
+        cursor.execute(REFRESH_SUMMARY_SQL, {'ids': spotify_ids})
+    return len(spotify_ids)
+
+
+def run(args):
+    started = time.perf_counter()
+    normalize = Normalizer()
+    conn = psycopg2.connect(args.dsn)
+    try:
+        cursor = conn.cursor()
+        new_tracks = 0
+        if args.spotify:
+            print("Ingesting Spotify tracks...")
+            new_tracks = ingest_spotify(cursor, pd.read_csv(args.spotify), normalize)
+
+        chart_rows, matches, refreshed = 0, 0, 0
+        if args.charts:
+            print("Ingesting Billboard chart rows...")
+            chart_rows, matches, chart_ids = ingest_charts(cursor, pd.read_csv(args.charts), normalize,
+                                                           skip_loaded_weeks=not args.allow_duplicate_weeks)
+            if not args.rebuild_chart_summary:
+                refreshed = refresh_chart_summary(cursor, chart_ids)
+        if args.rebuild_chart_summary:
+            print("Rebuilding track_chart_summary...")
+            refreshed = refresh_chart_summary(cursor)
+
+        if args.dry_run:
+            conn.rollback()
+            print("Dry run - rolled back")
+        else:
+            conn.commit()
+        cursor.close()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    print(f"\nDone in {time.perf_counter() - started:.2f}s")
+    print(f"New tracks: {new_tracks}")
+    print(f"New billboard entries: {chart_rows}")
+    print(f"New Spotify-Billboard matches: {matches}")
+    print(f"Track chart summaries refreshed: {refreshed}")
+
+    if args.notify_url and not args.dry_run:
+        from db_load import notify_backend
+        notify_backend(args.notify_url)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Add new chart weeks / Spotify tracks to a loaded database')
+    parser.add_argument('--charts', help='CSV with new chart rows (same columns as charts.csv)')
+    parser.add_argument('--spotify', help='CSV with new tracks (same columns as SpotifyFeatures.csv)')
+    parser.add_argument('--dsn', default='', help='libpq connection string (default: PG* environment variables)')
+    parser.add_argument('--allow-duplicate-weeks', action='store_true',
+                        help='insert chart rows even for weeks that are already loaded')
+    parser.add_argument('--rebuild-chart-summary', action='store_true',
+                        help='recompute track_chart_summary for every matched track, not just the new weeks')
+    parser.add_argument('--dry-run', action='store_true', help='do everything, then roll back')
+    parser.add_argument('--notify-url', help='POST here afterwards, e.g. http://localhost:8080/api/admin/reload '
+                                             '(sends $ADMIN_TOKEN as X-Admin-Token)')
+    args = parser.parse_args(argv)
+    if not args.charts and not args.spotify and not args.rebuild_chart_summary:
+        parser.error('nothing to ingest: pass --charts and/or --spotify')
+    return args
+
+
+if __name__ == '__main__':
+    run(parse_args())
@@ -3,6 +3,8 @@
 DROP TABLE IF EXISTS playlist_tracks CASCADE;
 DROP TABLE IF EXISTS playlists CASCADE;
 DROP TABLE IF EXISTS users CASCADE;
+DROP TABLE IF EXISTS track_chart_years CASCADE;
+DROP TABLE IF EXISTS track_chart_summary CASCADE;
 DROP TABLE IF EXISTS song_join CASCADE;
 DROP TABLE IF EXISTS billboard_charts CASCADE;
 DROP TABLE IF EXISTS track_genres CASCADE;
@@ -76,9 +78,31 @@ CREATE TABLE song_join (
     chart_id INT REFERENCES billboard_charts(chart_id) ON DELETE CASCADE,
     clean_song_title TEXT,
     clean_artist_name TEXT,
+    match_score REAL DEFAULT 1.0,  -- 1.0 for exact matches, lower for fuzzy ones
     UNIQUE(spotify_id, chart_id)
 );
 
+-- Per-track chart history, precomputed from song_join + billboard_charts
+-- (built by clean_data.py, refreshed by ingest_weekly.py)
+CREATE TABLE track_chart_summary (
+    spotify_id TEXT PRIMARY KEY REFERENCES tracks(spotify_id) ON DELETE CASCADE,
+    best_rank INT,
+    total_weeks INT,
+    max_weeks_on_board INT,
+    first_chart_date DATE,
+    last_chart_date DATE,
+    charted_years INT[]
+);
+
+-- Best rank per track and chart year, for year-range (decade) queries
+CREATE TABLE track_chart_years (
+    spotify_id TEXT REFERENCES tracks(spotify_id) ON DELETE CASCADE,
+    chart_year INT,
+    best_rank INT,
+    weeks INT,
+    PRIMARY KEY (spotify_id, chart_year)
+);
+
 -- User accounts
 CREATE TABLE users (
     user_id SERIAL PRIMARY KEY,
@@ -107,7 +131,8 @@ CREATE TABLE playlist_tracks (
 -- Indexes
 CREATE INDEX idx_artists_name ON artists(artist_name);
 CREATE INDEX idx_tracks_artist ON tracks(artist_id);
-CREATE INDEX idx_tracks_popularity ON tracks(popularity);
+-- (popularity, spotify_id) also serves keyset pagination on popularity DESC, spotify_id DESC
+CREATE INDEX idx_tracks_popularity ON tracks(popularity, spotify_id);
 CREATE INDEX idx_audio_tempo ON audio_features(tempo);
 CREATE INDEX idx_audio_danceability ON audio_features(danceability);
 CREATE INDEX idx_billboard_date ON billboard_charts(chart_date);
@@ -117,4 +142,11 @@ CREATE INDEX idx_song_join_spotify ON song_join(spotify_id);
 CREATE INDEX idx_audio_energy ON audio_features(energy);
 CREATE INDEX idx_song_join_chart ON song_join(chart_id);
 CREATE INDEX idx_track_genres_spotify ON track_genres(spotify_id);
-CREATE INDEX idx_track_genres_genre ON track_genres(genre_id);
\ No newline at end of file
+CREATE INDEX idx_track_genres_genre ON track_genres(genre_id);
+CREATE INDEX idx_tracks_normalized_name ON tracks(normalized_track_name);
+CREATE INDEX idx_chart_summary_best_rank ON track_chart_summary(best_rank);
+CREATE INDEX idx_chart_years_year_rank ON track_chart_years(chart_year, best_rank);
+-- Trigram indexes so ILIKE '%term%' searches can use an index
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX idx_tracks_name_trgm ON tracks USING gin (track_name gin_trgm_ops);
+CREATE INDEX idx_artists_name_trgm ON artists USING gin (artist_name gin_trgm_ops);
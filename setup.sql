@@ -7,11 +7,15 @@
 --    - Billboard: https://www.opendatabay.com/data/consumer/18d0d9c9-c6f8-40b2-bd88-693fd5786ffd
 -- 2. Place SpotifyFeatures.csv and charts.csv in the same directory as clean_data.py
 -- 3. Run: python3 clean_data.py
---    This will create a cleaned_data/ folder with 10 CSV files
+--    This will create a cleaned_data/ folder with 12 CSV files
 -- 4. Create database: CREATE DATABASE your_db_name;
 -- 5. Connect: \c your_db_name
 -- 6. Run schema: \i schema.sql
 -- 7. Run this file from the directory containing cleaned_data/: \i setup.sql
+--    (Or skip steps 3 and 7: python3 clean_data.py --output postgres --dsn "dbname=your_db_name"
+--     loads the tables directly with COPY and resets the sequences below.)
+-- 8. If the backend is already running, refresh its in-memory stores and cache:
+--    curl -X POST http://localhost:8080/api/admin/reload
 
 -- LOAD DATA
 -- Note: Run this script from the directory that contains the cleaned_data/ folder
@@ -23,7 +27,9 @@
 \copy genres(genre_id, genre_name) FROM 'cleaned_data/genres.csv'                                       WITH (FORMAT csv, HEADER true);
 \copy track_genres(track_genre_id, spotify_id, genre_id) FROM 'cleaned_data/track_genres.csv'           WITH (FORMAT csv, HEADER true);
 \copy billboard_charts(chart_id, chart_date, chart_rank, song_title, artist_name, last_week, peak_rank, weeks_on_board) FROM 'cleaned_data/billboard_charts.csv' WITH (FORMAT csv, HEADER true);
-\copy song_join(join_id, spotify_id, chart_id, clean_song_title, clean_artist_name) FROM 'cleaned_data/song_join.csv'  WITH (FORMAT csv, HEADER true);
+\copy song_join(join_id, spotify_id, chart_id, clean_song_title, clean_artist_name, match_score) FROM 'cleaned_data/song_join.csv'  WITH (FORMAT csv, HEADER true);
+\copy track_chart_summary(spotify_id, best_rank, total_weeks, max_weeks_on_board, first_chart_date, last_chart_date, charted_years) FROM 'cleaned_data/track_chart_summary.csv' WITH (FORMAT csv, HEADER true);
+\copy track_chart_years(spotify_id, chart_year, best_rank, weeks) FROM 'cleaned_data/track_chart_years.csv' WITH (FORMAT csv, HEADER true);
 \copy users(user_id, username, email) FROM 'cleaned_data/users.csv'                                     WITH (FORMAT csv, HEADER true);
 \copy playlists(playlist_id, user_id, name, created_at) FROM 'cleaned_data/playlists.csv'               WITH (FORMAT csv, HEADER true);
 \copy playlist_tracks(playlist_track_id, playlist_id, spotify_id, position, added_at) FROM 'cleaned_data/playlist_tracks.csv' WITH (FORMAT csv, HEADER true);
@@ -45,6 +51,7 @@ UNION ALL SELECT 'genres',           COUNT(*) FROM genres
 UNION ALL SELECT 'track_genres',     COUNT(*) FROM track_genres
 UNION ALL SELECT 'billboard_charts', COUNT(*) FROM billboard_charts
 UNION ALL SELECT 'song_join',        COUNT(*) FROM song_join
+UNION ALL SELECT 'track_chart_summary', COUNT(*) FROM track_chart_summary
 UNION ALL SELECT 'users',            COUNT(*) FROM users
 UNION ALL SELECT 'playlists',        COUNT(*) FROM playlists
 UNION ALL SELECT 'playlist_tracks',  COUNT(*) FROM playlist_tracks;
\ No newline at end of file
@@ -0,0 +1,387 @@
+# synth_data.py
+# Generates synthetic SpotifyFeatures.csv and charts.csv at a chosen multiple
+# of the real datasets' size, for benchmarking clean_data.py, the database load
+# and the route queries beyond the 177k tracks / 330k chart rows we have.
+#
+#   python3 synth_data.py --scale 10 --out-dir synthetic/x10
+#
+# The files have the same columns as the originals and roughly their shape:
+#  - the 27 Spotify genres in their real proportions and popularity levels,
+#    with about a third of the tracks listed under a second genre
+#  - skewed artist track counts (a few artists with thousands of tracks, a
+#    long tail with a handful), and a finite name space so different artists
+#    and songs share names
+#  - "(feat. X)", "(Remastered)" and "- Live" title variants and
+#    "X Featuring Y" / "X & Y" chart artists that exercise normalize_text
+#  - weekly charts with real churn: entries climb and fall, drop out with age,
+#    and last-week / peak-rank / weeks-on-board follow from that history;
+#    about 60% of chart entries are songs that exist in the Spotify file
+# Scale > 1 keeps the real number of chart weeks (since 1958) and widens each
+# chart instead (a "Hot 1000" at 10x); scale < 1 keeps 100 ranks and fewer weeks.
+#
+# Names and ids are pure functions of a track's index, so the chart
+# generator can refer to Spotify tracks without keeping them in memory and
+# the same --seed always produces the same files.
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Real dataset sizes (scale 1)
+TRACKS = 176774
+ARTISTS = 14564
+CHART_WEEKS = 3280
+CHART_WIDTH = 100
+FIRST_CHART_DATE = '1958-08-04'
+
+SECOND_GENRE_SHARE = 0.316      # 232725 rows for 176774 distinct track ids
+CHART_FROM_SPOTIFY = 0.6        # share of new chart entries that are Spotify tracks
+CHUNK_TRACKS = 200000
+CHUNK_WEEKS = 250
+
+# (genre, share of rows, mean popularity), from the Kaggle SpotifyFeatures.csv
+GENRES = [
+    ('Comedy', 9681, 21), ('Soundtrack', 9646, 34), ('Indie', 9543, 54), ('Jazz', 9441, 40),
+    ('Pop', 9386, 66), ('Electronic', 9377, 38), ('Children’s Music', 9353, 4), ('Folk', 9299, 49),
+    ('Hip-Hop', 9295, 58), ('Rock', 9272, 59), ('Alternative', 9263, 50), ('Classical', 9256, 29),
+    ('Rap', 9232, 60), ('World', 9096, 35), ('Soul', 9089, 47), ('Blues', 9023, 34),
+    ('R&B', 8992, 52), ('Anime', 8936, 24), ('Reggaeton', 8927, 37), ('Ska', 8874, 28),
+    ('Reggae', 8771, 35), ('Dance', 8701, 57), ('Country', 8664, 46), ('Opera', 8280, 13),
+    ('Movie', 7806, 12), ("Children's Music", 5403, 54), ('A Capella', 119, 9),
+]
+
+KEYS = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+TIME_SIGNATURES = ['4/4', '3/4', '5/4', '1/4', '0/4']
+TIME_SIGNATURE_SHARES = [0.86, 0.11, 0.02, 0.008, 0.002]
+
+SPOTIFY_COLUMNS = ['genre', 'artist_name', 'track_name', 'track_id', 'popularity', 'acousticness',
+                   'danceability', 'duration_ms', 'energy', 'instrumentalness', 'key', 'liveness',
+                   'loudness', 'mode', 'speechiness', 'tempo', 'time_signature', 'valence']
+CHART_COLUMNS = ['date', 'rank', 'song', 'artist', 'last-week', 'peak-rank', 'weeks-on-board']
+
+TITLE_WORDS = np.array("""
+Love Heart Night Baby Girl Boy Time Dance Life World Dream Fire Rain Sun Home Blue Man Day Light Gold
+Summer Winter River Road City Star Moon Sky Ocean Storm Wild Young Forever Tonight Yesterday Tomorrow
+Crazy Lonely Sweet Broken Happy Sad Little Big Golden Silver Midnight Morning Paradise Heaven Angel
+Devil Magic Memory Story Secret Promise Kiss Touch Feel Hold Run Fall Rise Shine Burn Cry Smile
+Believe Remember Forget Need Want Hurt Hold Lose Find Stay Leave Come Back Away Again Alone Together
+Everything Nothing Something Somebody Nobody Everybody Hello Goodbye Yeah Oh Mama Papa Honey Sugar
+Candy Cherry Rose Diamond Highway Train Car Radio Party Club Street Window Door Mirror Shadow Ghost
+Wolf Tiger Bird Butterfly Thunder Lightning Echo Rhythm Melody Song Blues Soul Groove Funk Fever
+Freedom Glory Mercy Grace Trouble Danger Money Power Crown King Queen Prince Heroes Lovers Strangers
+""".split())
+FIRST_NAMES = np.array("""
+James John Robert Michael William David Richard Joseph Thomas Charles Mary Patricia Jennifer Linda
+Elizabeth Barbara Susan Jessica Sarah Karen Nancy Lisa Betty Margaret Sandra Ashley Kimberly Emily
+Donna Michelle Carol Amanda Melissa Deborah Stephanie Rebecca Laura Sharon Cynthia Kathleen Amy
+Angela Shirley Anna Brenda Pamela Nicole Emma Samantha Katherine Christine Debra Rachel Carolyn Janet
+Maria Heather Diane Julie Joyce Victoria Kelly Christina Lauren Joan Evelyn Olivia Judith Megan
+Cheryl Martha Andrea Frank Scott Eric Stephen Andrew Raymond Gregory Joshua Jerry Dennis Walter
+Patrick Peter Harold Douglas Henry Carl Arthur Ryan Roger Juan Jack Albert Jonathan Justin Terry
+Gerald Keith Samuel Willie Ralph Lawrence Nicholas Roy Benjamin Bruce Brandon Adam Harry Fred Wayne
+Billy Steve Louis Jeremy Aaron Randy Howard Eugene Carlos Russell Bobby Victor Martin Ernest Phillip
+Todd Jesse Craig Alan Shawn Clarence Sean Philip Chris Johnny Earl Jimmy Antonio Danny Bryan Tony
+""".split())
+LAST_NAMES = np.array("""
+Smith Johnson Williams Brown Jones Garcia Miller Davis Rodriguez Martinez Hernandez Lopez Gonzalez
+Wilson Anderson Thomas Taylor Moore Jackson Martin Lee Perez Thompson White Harris Sanchez Clark
+Ramirez Lewis Robinson Walker Young Allen King Wright Scott Torres Nguyen Hill Flores Green Adams
+Nelson Baker Hall Rivera Campbell Mitchell Carter Roberts Gomez Phillips Evans Turner Diaz Parker
+Cruz Edwards Collins Reyes Stewart Morris Morales Murphy Cook Rogers Gutierrez Ortiz Morgan Cooper
+Peterson Bailey Reed Kelly Howard Ramos Kim Cox Ward Richardson Watson Brooks Chavez Wood James
+Bennett Gray Mendoza Ruiz Hughes Price Alvarez Castillo Sanders Patel Myers Long Ross Foster Jimenez
+Powell Jenkins Perry Russell Sullivan Bell Coleman Butler Henderson Barnes Gonzales Fisher Vasquez
+Simmons Romero Jordan Patterson Alexander Hamilton Graham Reynolds Griffin Wallace Moreno West Cole
+Hayes Bryant Herrera Gibson Ellis Tran Medina Aguilar Stevens Murray Ford Castro Marshall Owens
+""".split())
+BAND_ADJECTIVES = np.array("""
+Black White Red Blue Green Silver Golden Electric Velvet Crystal Neon Cosmic Midnight Rolling Flying
+Broken Wild Young Lonely Happy Crazy Little Big Strange Sacred Savage Gentle Hollow Burning Frozen
+Lost Hidden Northern Southern Eastern Western Modern Ancient Royal Secret Silent Screaming Dancing
+Sleeping Smashing Killing Weeping Howling Shining Fallen Rising Wandering Dead Living Drunken Arctic
+""".split())
+BAND_NOUNS = np.array("""
+Keys Stones Kings Queens Wolves Tigers Lions Bears Foxes Crows Ravens Doves Eagles Hawks Owls Hearts
+Souls Ghosts Angels Devils Saints Sinners Brothers Sisters Sons Daughters Lovers Strangers Heroes
+Pilots Drivers Riders Seekers Dreamers Shadows Echoes Mirrors Machines Robots Rockets Satellites
+Planets Comets Stars Moons Suns Rivers Oceans Mountains Forests Gardens Roses Lilies Bells Drums
+""".split())
+INITIALS = np.array(list('ABCDEFGHIJKLMNOPRSTW'))
+VERSION_SUFFIXES = np.array([' - Remastered', ' - Live', ' - Radio Edit', ' (Remastered 2011)', ' (Acoustic)'])
+ALPHABET = np.frombuffer(b'0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz', dtype=np.uint8)
+
+
+def _mix(values, salt, seed):
+    """splitmix64 of (values, salt, seed): a well-spread uint64 hash per element"""
+    with np.errstate(over='ignore'):
+        x = np.asarray(values).astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        x += np.uint64((salt * 0x632BE59BD9B4E5 + seed * 0xD1342543DE82EF95) & 0xFFFFFFFFFFFFFFFF)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def _pick(words, h, shift):
+    return words[((h >> np.uint64(shift)) % np.uint64(len(words))).astype(np.int64)]
+
+
+def _join(*parts):
+    """Element-wise string concatenation of arrays and constant strings"""
+    n = next(len(part) for part in parts if isinstance(part, np.ndarray))
+    result = np.full(n, '', dtype=object)
+    for part in parts:
+        result = result + (part.astype(object) if isinstance(part, np.ndarray) else part)
+    return result
+
+
+def _uniform(h):
+    return (h >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def track_ids(index, seed):
+    """22-character base62 ids like Spotify's"""
+    digits = np.empty((len(index), 22), dtype=np.uint8)
+    for half, salt in enumerate((11, 12)):
+        h = _mix(index, salt, seed)
+        for i in range(11):
+            digits[:, half * 11 + i] = ALPHABET[(h % np.uint64(62)).astype(np.int64)]
+            h //= np.uint64(62)
+    return digits.view('S22').ravel().astype(str)
+
+
+def track_titles(index, seed, salt=1):
+    """One to three title words; the word list is small, so titles collide across artists"""
+    h = _mix(index, salt, seed)
+    words = (h % np.uint64(3)).astype(np.int64) + 1
+    first = _pick(TITLE_WORDS, h, 8)
+    second = _pick(TITLE_WORDS, h, 20)
+    third = _pick(TITLE_WORDS, h, 32)
+    titles = first.astype(object)
+    titles = np.where(words >= 2, _join(first, ' ', second), titles)
+    titles = np.where(words == 3, _join(first, ' ', second, ' ', third), titles)
+    return titles
+
+
+def track_artists(index, n_artists, seed):
+    """Artist id of each track, skewed so that low ids have far more tracks"""
+    u = _uniform(_mix(index, 2, seed))
+    return np.minimum((n_artists * u ** 2).astype(np.int64), n_artists - 1)
+
+
+def artist_names(artist, seed):
+    """Person names (some with a middle initial), "The <adjective> <noun>" bands and one-word acts"""
+    h = _mix(artist, 3, seed)
+    kind = (h % np.uint64(10)).astype(np.int64)
+    person = _join(_pick(FIRST_NAMES, h, 8), ' ', _pick(LAST_NAMES, h, 20))
+    initial = _join(_pick(FIRST_NAMES, h, 8), ' ', _pick(INITIALS, h, 32), '. ', _pick(LAST_NAMES, h, 20))
+    band = _join('The ', _pick(BAND_ADJECTIVES, h, 8), ' ', _pick(BAND_NOUNS, h, 20))
+    single = _pick(LAST_NAMES, h, 44).astype(object)
+    return np.select([kind < 4, kind < 7, kind < 9], [person, initial, band], single)
+
+
+def _spotify_chunk(start, stop, n_artists, seed, chunk_no):
+    rng = np.random.default_rng([seed, 1, chunk_no])
+    index = np.arange(start, stop, dtype=np.int64)
+    n = len(index)
+
+    titles = track_titles(index, seed)
+    artists = track_artists(index, n_artists, seed)
+    names = artist_names(artists, seed)
+    # Title variants: featured artists and remaster/live versions
+    variant = rng.random(n)
+    featured = artist_names(rng.integers(0, n_artists, n), seed)
+    titles = np.where(variant < 0.06, _join(titles, ' (feat. ', featured, ')'), titles)
+    titles = np.where((variant >= 0.06) & (variant < 0.09), _join(titles, ' feat. ', featured), titles)
+    suffix = VERSION_SUFFIXES[rng.integers(0, len(VERSION_SUFFIXES), n)]
+    titles = np.where((variant >= 0.09) & (variant < 0.14), _join(titles, suffix), titles)
+
+    shares = np.array([share for _, share, _ in GENRES], dtype=np.float64)
+    genre = rng.choice(len(GENRES), n, p=shares / shares.sum())
+    popularity_mean = np.array([mean for _, _, mean in GENRES], dtype=np.float64)
+    popularity = np.clip(rng.normal(popularity_mean[genre], 12), 0, 100).astype(np.int64)
+
+    tracks = pd.DataFrame({
+        'genre': np.array([name for name, _, _ in GENRES], dtype=object)[genre],
+        'artist_name': names,
+        'track_name': titles,
+        'track_id': track_ids(index, seed),
+        'popularity': popularity,
+        'acousticness': np.round(rng.beta(0.5, 0.8, n), 6),
+        'danceability': np.round(rng.beta(5, 3.5, n), 3),
+        'duration_ms': np.clip(rng.lognormal(12.3, 0.35, n), 15000, 5000000).astype(np.int64),
+        'energy': np.round(rng.beta(2.5, 1.7, n), 3),
+        'instrumentalness': np.where(rng.random(n) < 0.55, 0.0, np.round(rng.beta(0.4, 1.2, n), 6)),
+        'key': np.array(KEYS, dtype=object)[rng.integers(0, len(KEYS), n)],
+        'liveness': np.round(rng.beta(1.5, 7, n), 4),
+        'loudness': np.round(np.clip(rng.normal(-9.5, 6, n), -52, 3), 3),
+        'mode': np.where(rng.random(n) < 0.65, 'Major', 'Minor'),
+        'speechiness': np.round(rng.beta(0.8, 8, n), 4),
+        'tempo': np.round(np.clip(rng.normal(118, 30, n), 30, 240), 3),
+        'time_signature': np.array(TIME_SIGNATURES, dtype=object)[
+            rng.choice(len(TIME_SIGNATURES), n, p=TIME_SIGNATURE_SHARES)],
+        'valence': np.round(rng.beta(2, 2, n), 3),
+    }, columns=SPOTIFY_COLUMNS)
+
+    # A second row under another genre for about a third of the tracks (same id and features)
+    again = tracks[rng.random(n) < SECOND_GENRE_SHARE].copy()
+    other = (genre[again.index] + rng.integers(1, len(GENRES), len(again))) % len(GENRES)
+    again['genre'] = np.array([name for name, _, _ in GENRES], dtype=object)[other]
+    return pd.concat([tracks, again]).sort_index(kind='stable')
+
+
+def generate_spotify(path, n_tracks, n_artists, seed):
+    rows = 0
+    header = True
+    for chunk_no, start in enumerate(range(0, n_tracks, CHUNK_TRACKS)):
+        chunk = _spotify_chunk(start, min(start + CHUNK_TRACKS, n_tracks), n_artists, seed, chunk_no)
+        chunk.to_csv(path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        rows += len(chunk)
+    return rows
+
+
+class ChartSimulator:
+    """
+    Week-by-week chart with churn. Each week entries move by a noisy amount
+    (older ones drift down), low and long-running entries drop out, and the
+    free places go to debuts. Positive song keys are Spotify track indexes,
+    negative ones songs that only exist on the charts.
+    """
+
+    def __init__(self, width, n_tracks, seed):
+        self.width = width
+        self.n_tracks = n_tracks
+        self.rng = np.random.default_rng([seed, 2])
+        self.next_chart_only = 1
+        self.song = np.empty(0, dtype=np.int64)
+        self.rank = np.empty(0, dtype=np.int64)
+        self.peak = np.empty(0, dtype=np.int64)
+        self.weeks = np.empty(0, dtype=np.int64)
+
+    def _debuts(self, n):
+        from_spotify = self.rng.random(n) < CHART_FROM_SPOTIFY
+        songs = self.rng.integers(0, self.n_tracks, n)
+        chart_only = np.arange(self.next_chart_only, self.next_chart_only + n)
+        self.next_chart_only += n
+        return np.where(from_spotify, songs, -chart_only)
+
+    def week(self):
+        width = self.width
+        rng = self.rng
+        position = self.rank / width
+        drop = 0.03 + 0.25 * position ** 3 + np.where((self.weeks > 20) & (position > 0.5), 0.6, 0.0)
+        keep = rng.random(len(self.song)) >= drop
+
+        score = (self.rank[keep] + rng.normal(0, 0.06 * width, keep.sum())
+                 + 0.015 * width * np.minimum(self.weeks[keep], 30) / 10)
+        n_new = width - keep.sum()
+        new_score = rng.uniform(0.15, 1.0, n_new) * width
+        song = np.concatenate([self.song[keep], self._debuts(n_new)])
+        last_week = np.concatenate([self.rank[keep], np.zeros(n_new, dtype=np.int64)])
+        peak = np.concatenate([self.peak[keep], np.full(n_new, width + 1, dtype=np.int64)])
+        weeks = np.concatenate([self.weeks[keep], np.zeros(n_new, dtype=np.int64)]) + 1
+
+        order = np.argsort(np.concatenate([score, new_score]), kind='stable')
+        self.song = song[order]
+        self.rank = np.arange(1, width + 1, dtype=np.int64)
+        self.peak = np.minimum(peak[order], self.rank)
+        self.weeks = weeks[order]
+        return self.song, self.rank, last_week[order], self.peak, self.weeks
+
+
+def _chart_names(songs, n_artists, seed):
+    """Title and artist as Billboard prints them for a batch of song keys"""
+    spotify = songs >= 0
+    index = np.abs(songs)
+    titles = np.where(spotify, track_titles(index, seed), track_titles(index, seed, salt=4))
+    artist_ids = np.where(spotify, track_artists(index, n_artists, seed),
+                          track_artists(index + (1 << 40), n_artists, seed))
+    artists = artist_names(artist_ids, seed)
+    # The same song keeps its credit from week to week, so the variant comes from the key
+    variant = _uniform(_mix(songs, 5, seed))
+    other = artist_names(track_artists(index + (1 << 41), n_artists, seed), seed)
+    artists = np.where(variant < 0.12, _join(artists, ' Featuring ', other), artists)
+    artists = np.where((variant >= 0.12) & (variant < 0.17), _join(artists, ' & ', other), artists)
+    titles = np.where((variant >= 0.17) & (variant < 0.2), _join(titles, ' (From "', other, '")'), titles)
+    return titles, artists
+
+
+def generate_charts(path, n_weeks, width, n_tracks, n_artists, seed):
+    simulator = ChartSimulator(width, n_tracks, seed)
+    dates = pd.date_range(FIRST_CHART_DATE, periods=n_weeks, freq='7D').strftime('%Y-%m-%d')
+    rows = 0
+    header = True
+    for start in range(0, n_weeks, CHUNK_WEEKS):
+        weeks = [(dates[w],) + tuple(a.copy() for a in simulator.week())
+                 for w in range(start, min(start + CHUNK_WEEKS, n_weeks))]
+        songs = np.concatenate([w[1] for w in weeks])
+        titles, artists = _chart_names(songs, n_artists, seed)
+        last_week = np.concatenate([w[3] for w in weeks]).astype(object)
+        last_week[last_week == 0] = ''    # debuts have no last-week value, as in the original file
+        chart = pd.DataFrame({
+            'date': np.repeat([w[0] for w in weeks], width),
+            'rank': np.concatenate([w[2] for w in weeks]),
+            'song': titles,
+            'artist': artists,
+            'last-week': last_week,
+            'peak-rank': np.concatenate([w[4] for w in weeks]),
+            'weeks-on-board': np.concatenate([w[5] for w in weeks]),
+        }, columns=CHART_COLUMNS)
+        chart.to_csv(path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        rows += len(chart)
+    return rows
+
+
+def dataset_size(scale):
+    """(tracks, artists, chart weeks, chart width) for a scale factor"""
+    return (max(1, round(TRACKS * scale)), max(1, round(ARTISTS * scale)),
+            max(1, round(CHART_WEEKS * min(scale, 1))), max(1, round(CHART_WIDTH * max(scale, 1))))
+
+
+def generate(out_dir, scale, seed=0):
+    """Write SpotifyFeatures.csv and charts.csv to out_dir; returns a dict describing them"""
+    os.makedirs(out_dir, exist_ok=True)
+    n_tracks, n_artists, n_weeks, width = dataset_size(scale)
+    started = time.perf_counter()
+    spotify_rows = generate_spotify(os.path.join(out_dir, 'SpotifyFeatures.csv'), n_tracks, n_artists, seed)
+    spotify_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    chart_rows = generate_charts(os.path.join(out_dir, 'charts.csv'), n_weeks, width, n_tracks, n_artists, seed)
+    chart_seconds = time.perf_counter() - started
+    return {
+        'scale': scale,
+        'seed': seed,
+        'tracks': n_tracks,
+        'spotify_rows': spotify_rows,
+        'artists': n_artists,
+        'chart_weeks': n_weeks,
+        'chart_width': width,
+        'chart_rows': chart_rows,
+        'spotify_seconds': round(spotify_seconds, 2),
+        'charts_seconds': round(chart_seconds, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic SpotifyFeatures.csv and charts.csv')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='size relative to the real datasets, e.g. 0.1, 10 or 100 (default 1)')
+    parser.add_argument('--out-dir', default='synthetic', help='directory for the two CSV files')
+    parser.add_argument('--seed', type=int, default=0, help='same seed, same files')
+    args = parser.parse_args()
+    if args.scale <= 0:
+        parser.error('--scale must be positive')
+
+    info = generate(args.out_dir, args.scale, args.seed)
+    print(f"SpotifyFeatures.csv: {info['spotify_rows']} rows, {info['tracks']} tracks "
+          f"({info['spotify_seconds']}s)")
+    print(f"charts.csv: {info['chart_rows']} rows, {info['chart_weeks']} weeks x {info['chart_width']} "
+          f"({info['charts_seconds']}s)")
+
+
+if __name__ == '__main__':
+    main()